@@ -2,7 +2,7 @@ from django import forms
 from django.contrib.auth.forms import UserCreationForm
 from datetime import date
 from .models import User
-from admissions.models import AdmissionSession  # ✅ to get open classes dynamically
+from admissions.config import get_config  # ✅ to get open classes dynamically
 
 
 # --- Step 1 Form ---
@@ -17,10 +17,10 @@ class ClassSelectionForm(forms.Form):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
 
-        # 🧠 Fetch open classes dynamically from AdmissionSession
-        open_classes = AdmissionSession.objects.filter(is_open=True).values_list('class_name', flat=True)
+        # 🧠 Open classes from the cached AdmissionSession rows
+        open_classes = get_config().open_classes
 
-        if open_classes.exists():
+        if open_classes:
             self.fields['class_applied'].choices = [
                 (c, f"Class {c.upper()}") for c in open_classes
             ]
@@ -9,6 +9,7 @@ urlpatterns = [
     path('signup/', views.signup_step1, name='signup_step1'),
     path('signup/details/', views.signup_step2, name='signup_step2'),
     path('verify-email/', views.verify_email, name='verify_email'),
+    path('verify-email/status/', views.verification_status, name='verification_status'),
     path('resend-code/', views.resend_code, name='resend_code'),
 
     # ✅ Login/Logout
@@ -6,7 +6,8 @@ from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth import authenticate, get_backends, login
 from django.contrib.auth.views import LoginView, LogoutView
-from django.core.mail import send_mail
+from django.core.mail import EmailMessage
+from django.http import JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
 from django.urls import reverse_lazy
 from django.utils import timezone
@@ -31,9 +32,10 @@ def calculate_age_on(dob, ref_date):
 # --------------------------
 def signup_step1(request):
     """Step 1 - Select class and DOB (only open classes are shown)."""
-    from admissions.models import AdmissionSession, FormFieldVisibility
+    from admissions.config import get_config
 
-    open_classes = list(AdmissionSession.objects.filter(is_open=True).values_list('class_name', flat=True))
+    config = get_config()
+    open_classes = config.open_classes
 
     if not open_classes:
         messages.warning(request, "⚠️ Currently, no class admissions are open.")
@@ -107,9 +109,7 @@ def signup_step1(request):
     else:
         form = ClassSelectionForm()
 
-        visible_fields = list(
-            FormFieldVisibility.objects.filter(is_visible=True).values_list('field_name', flat=True)
-        )
+        visible_fields = config.visible_fields
 
         if 'class_applied' in form.fields:
             form.fields['class_applied'].choices = [
@@ -147,7 +147,7 @@ def signup_step2(request):
             request.session['pending_class_applied'] = class_applied
 
             send_verification_email(user)
-            messages.info(request, "📩 A verification code has been sent to your email.")
+            messages.info(request, "📩 A verification code is on its way to your email.")
             return redirect('accounts:verify_email')
     else:
         form = StudentSignupForm()
@@ -158,17 +158,47 @@ def signup_step2(request):
 # --------------------------
 # EMAIL VERIFICATION LOGIC
 # --------------------------
-def send_verification_email(user):
+def send_verification_email(user, subject='Verify your MCM Admission account',
+                            intro='Your email verification code is'):
+    """
+    Create a fresh code and queue it for delivery. Sending happens in the
+    background (admissions.outbox), so signup never waits on SMTP.
+    """
+    from admissions.outbox import queue_emails
+
     code = str(random.randint(100000, 999999))
     EmailVerification.objects.create(user=user, code=code)
 
-    send_mail(
-        subject='Verify your MCM Admission account',
-        message=f'Your email verification code is: {code}\n\nFor any queries, contact mcm.admission.portal@gmail.com | Phone: 051-3752010.',
+    email = EmailMessage(
+        subject=subject,
+        body=f'{intro}: {code}\n\nFor any queries, contact mcm.admission.portal@gmail.com | Phone: 051-3752010.',
         from_email=settings.DEFAULT_FROM_EMAIL,
-        recipient_list=[user.email],
-        fail_silently=False,
+        to=[user.email],
+    )
+    queue_emails([(user.id, email)], category='verification_code', urgent=True)
+
+
+# Outbox status -> what the verify page shows
+DELIVERY_STATES = {
+    'pending': ('sending', "Sending your code…"),
+    'sending': ('sending', "Sending your code…"),
+    'retrying': ('delayed', "Email delivery is delayed, we are retrying. Please wait a moment."),
+    'sent': ('sent', "Code sent. Check your inbox (and spam folder)."),
+    'dead': ('failed', "We could not deliver your code. Please use Resend Code or contact support."),
+}
+
+
+def verification_delivery_status(email):
+    from admissions.models import EmailOutbox
+
+    status = (
+        EmailOutbox.objects.filter(to_email=email, category='verification_code')
+        .order_by('-created_at', '-id')
+        .values_list('status', flat=True)
+        .first()
     )
+    state, message = DELIVERY_STATES.get(status, ('unknown', ''))
+    return {'state': state, 'message': message}
 
 
 def verify_email(request):
@@ -204,7 +234,17 @@ def verify_email(request):
             messages.error(request, "❌ Invalid or expired verification code. Try again.")
 
     remaining = request.session.get('remaining_seconds', 0)
-    return render(request, "accounts/verify_email.html", {'remaining_seconds': remaining})
+    email = request.session.get('pending_email')
+    delivery = verification_delivery_status(email) if email else None
+    return render(request, "accounts/verify_email.html", {'remaining_seconds': remaining, 'delivery': delivery})
+
+
+def verification_status(request):
+    """Delivery state of the latest code, polled by the verify page."""
+    email = request.session.get('pending_email')
+    if not email:
+        return JsonResponse({'state': 'unknown', 'message': ''})
+    return JsonResponse(verification_delivery_status(email))
 
 
 # --------------------------
@@ -234,22 +274,17 @@ def resend_code(request):
 
     EmailVerification.objects.filter(user=user, is_used=False).delete()
 
-    new_code = str(random.randint(100000, 999999))
-    EmailVerification.objects.create(user=user, code=new_code)
-
-    send_mail(
+    send_verification_email(
+        user,
         subject="Your New MCM Admission Verification Code",
-        message=f"Here is your new email verification code: {new_code}\n\nFor any queries, contact mcm.admission.portal@gmail.com | Phone: 051-3752010.",
-        from_email=settings.DEFAULT_FROM_EMAIL,
-        recipient_list=[user.email],
-        fail_silently=False,
+        intro="Here is your new email verification code",
     )
 
     request.session['pending_email'] = user.email
     request.session['last_code_sent'] = timezone.now().isoformat()
     request.session['remaining_seconds'] = 60
 
-    messages.success(request, "✅ A new verification code has been sent to your email.")
+    messages.success(request, "✅ A new verification code is on its way to your email.")
     return redirect("accounts:verify_email")
 
 
@@ -1,8 +1,10 @@
 from django.contrib import admin
 from django.utils.html import format_html
 from .models import Application, AdmissionSession, MessageTemplate  # ✅ Added MessageTemplate import
-from django.contrib import admin
-from .models import FeeConfig, FeeCategoryConfig
+from django.contrib import admin, messages
+from .models import FeeConfig, FeeCategoryConfig, RollNumberSequence, EmailOutbox, BroadcastJob
+from django.utils import timezone
+from .config import bump_config_version
 
 
 # -------------------------------------------------
@@ -49,6 +51,14 @@ class ApplicationAdmin(admin.ModelAdmin):
     reject_payment.short_description = "Mark as Payment Rejected"
 
 
+class CachedConfigAdmin(admin.ModelAdmin):
+    """Bulk deletes skip Model.delete(), so bump the settings cache here too."""
+
+    def delete_queryset(self, request, queryset):
+        super().delete_queryset(request, queryset)
+        bump_config_version()
+
+
 #-------------------------------------
 # Fees setting
 #--------------------------------------
@@ -57,14 +67,14 @@ class FeeCategoryInline(admin.TabularInline):
     extra = 0
 
 @admin.register(FeeConfig)
-class FeeConfigAdmin(admin.ModelAdmin):
+class FeeConfigAdmin(CachedConfigAdmin):
     list_display = ('class_name', 'normal_deadline', 'late_deadline', 'final_deadline', 'stop_after_final')
     inlines = [FeeCategoryInline]
     search_fields = ('class_name',)
     list_filter = ('class_name',)
 
 @admin.register(FeeCategoryConfig)
-class FeeCategoryConfigAdmin(admin.ModelAdmin):
+class FeeCategoryConfigAdmin(CachedConfigAdmin):
     list_display = ('fee_config', 'category', 'normal_fee', 'late_fee', 'final_fee')
     search_fields = ('category',)
     list_filter = ('fee_config',)
@@ -73,11 +83,20 @@ class FeeCategoryConfigAdmin(admin.ModelAdmin):
 # Admission Session Admin
 # -------------------------------------------------
 @admin.register(AdmissionSession)
-class AdmissionSessionAdmin(admin.ModelAdmin):
+class AdmissionSessionAdmin(CachedConfigAdmin):
     list_display = ('class_name', 'is_open')
     list_editable = ('is_open',)
 
 
+# -------------------------------------------------
+# Roll Number Sequence Admin
+# -------------------------------------------------
+@admin.register(RollNumberSequence)
+class RollNumberSequenceAdmin(admin.ModelAdmin):
+    list_display = ('prefix', 'last_value')
+    readonly_fields = ('prefix',)
+
+
 # -------------------------------------------------
 # 🌿 Message Template Admin (Phase 4)
 # -------------------------------------------------
@@ -87,3 +106,56 @@ class MessageTemplateAdmin(admin.ModelAdmin):
     search_fields = ('title', 'category', 'body')
     list_filter = ('category', 'created_at')
     ordering = ('-created_at',)
+
+
+# -------------------------------------------------
+# 📬 Email Outbox Admin
+# -------------------------------------------------
+@admin.register(EmailOutbox)
+class EmailOutboxAdmin(admin.ModelAdmin):
+    list_display = ('to_email', 'subject', 'category', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    search_fields = ('to_email', 'subject')
+    list_filter = ('status', 'category')
+    readonly_fields = ('created_at', 'sent_at', 'last_error')
+    raw_id_fields = ('user',)
+    actions = ['retry_now']
+
+    def retry_now(self, request, queryset):
+        """Send the selected unsent emails again on the next drain (dead ones get a fresh set of attempts)."""
+        updated = queryset.exclude(status=EmailOutbox.STATUS_SENT).update(
+            status=EmailOutbox.STATUS_PENDING, attempts=0, next_attempt_at=timezone.now()
+        )
+        self.message_user(request, f"{updated} email(s) queued for retry 📬")
+
+    retry_now.short_description = "Retry now"
+
+
+# -------------------------------------------------
+# 📢 Broadcast Job Admin
+# -------------------------------------------------
+@admin.register(BroadcastJob)
+class BroadcastJobAdmin(admin.ModelAdmin):
+    list_display = ('title', 'status', 'total', 'sent', 'failed', 'created_by', 'created_at', 'finished_at')
+    list_filter = ('status', 'send_email', 'send_inapp')
+    search_fields = ('title',)
+    readonly_fields = ('total', 'sent', 'failed', 'last_error', 'created_at', 'started_at', 'updated_at', 'finished_at')
+    actions = ['resume']
+
+    def resume(self, request, queryset):
+        """Continue stalled jobs from their checkpoints; jobs still checkpointing are left alone."""
+        from .tasks import start_broadcast_job
+
+        resumed = skipped = 0
+        for job in queryset:
+            if job.claim_resume():
+                start_broadcast_job(job)
+                resumed += 1
+            elif not job.is_finished:
+                skipped += 1
+        self.message_user(request, f"{resumed} broadcast(s) resumed 📢")
+        if skipped:
+            self.message_user(
+                request, f"{skipped} broadcast(s) still running, not resumed.", level=messages.WARNING
+            )
+
+    resume.short_description = "Resume from checkpoint"
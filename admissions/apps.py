@@ -1,6 +1,19 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def install_search_index(sender, using, **kwargs):
+    from django.db import connections
+
+    from .search import install_sqlite_fts
+
+    install_sqlite_fts(connections[using])
 
 
 class AdmissionsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'admissions'
+
+    def ready(self):
+        # SQLite keeps its applicant search index outside the migrations (see admissions/search.py)
+        post_migrate.connect(install_search_index, sender=self)
@@ -0,0 +1,100 @@
+"""
+Broadcast audiences.
+
+A broadcast goes to the applications matching its segments, a plain dict
+(so it can travel as a Celery argument) of
+
+    class_name, status, payment_status, category, test_center
+        one value or a list of values (any of them matches)
+    submitted_from, submitted_to
+        ISO dates, inclusive, on Application.submission_date
+    has_roll_number
+        'yes' or 'no'
+
+Segments only ever become filters on one queryset, so the audience is
+worked out by the database; nothing is loaded to count or select it.
+An empty dict means every application.
+"""
+from datetime import date
+
+from django.db.models import Count, Q
+
+from .models import Application
+
+CHOICE_SEGMENTS = {
+    'class_name': dict(Application._meta.get_field('class_name').choices),
+    'status': dict(Application.STATUS_CHOICES),
+    'payment_status': dict(Application._meta.get_field('payment_status').choices),
+    'category': dict(Application.CATEGORY_CHOICES),
+    'test_center': dict(Application.TEST_CENTERS),
+}
+DATE_SEGMENTS = {'submitted_from': 'submission_date__gte', 'submitted_to': 'submission_date__lte'}
+SEGMENT_NAMES = list(CHOICE_SEGMENTS) + list(DATE_SEGMENTS) + ['has_roll_number']
+
+
+def _values(data, name):
+    if hasattr(data, 'getlist'):
+        values = data.getlist(name)
+    else:
+        values = data.get(name) or []
+        values = [values] if isinstance(values, str) else list(values)
+    return [value.strip() for value in values if value and value.strip()]
+
+
+def parse_segments(data):
+    """
+    Clean segments from a request's GET/POST (or a dict). Raises ValueError
+    naming the first bad value, so a typo never widens the audience.
+    """
+    segments = {}
+    for name, choices in CHOICE_SEGMENTS.items():
+        values = _values(data, name)
+        for value in values:
+            if value not in choices:
+                raise ValueError(f"Unknown {name.replace('_', ' ')}: {value}")
+        if values:
+            segments[name] = values
+
+    for name in DATE_SEGMENTS:
+        values = _values(data, name)
+        if values:
+            try:
+                segments[name] = date.fromisoformat(values[0]).isoformat()
+            except ValueError:
+                raise ValueError(f"Invalid date for {name.replace('_', ' ')}: {values[0]}")
+
+    has_roll = _values(data, 'has_roll_number')
+    if has_roll:
+        if has_roll[0] not in ('yes', 'no'):
+            raise ValueError(f"Invalid has roll number: {has_roll[0]}")
+        segments['has_roll_number'] = has_roll[0]
+    return segments
+
+
+def audience_queryset(segments=None):
+    """Applications matching `segments`."""
+    segments = segments or {}
+    qs = Application.objects.all()
+    for name in CHOICE_SEGMENTS:
+        values = segments.get(name)
+        if values:
+            values = [values] if isinstance(values, str) else values
+            qs = qs.filter(**{f'{name}__in': values})
+    for name, lookup in DATE_SEGMENTS.items():
+        if segments.get(name):
+            qs = qs.filter(**{lookup: segments[name]})
+
+    no_roll = Q(roll_number__isnull=True) | Q(roll_number='')
+    if segments.get('has_roll_number') == 'yes':
+        qs = qs.exclude(no_roll)
+    elif segments.get('has_roll_number') == 'no':
+        qs = qs.filter(no_roll)
+    return qs
+
+
+def audience_counts(segments=None):
+    """Recipients of a broadcast, and how many of them have an email address, in one query."""
+    return audience_queryset(segments).aggregate(
+        recipients=Count('id'),
+        with_email=Count('id', filter=Q(user__email__gt='')),
+    )
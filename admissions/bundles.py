@@ -0,0 +1,234 @@
+"""
+Roll slip bundles: one printable PDF with every slip for a test center
+and/or class, in roll number order.
+
+ReportLab holds a whole document in memory until save(), so a bundle is
+rendered in parts of BUNDLE_PART_SIZE slips (using the normal slip
+renderer) and the parts are stitched into one PDF as they are produced.
+Only one part is ever in memory, whether the bundle is streamed to the
+browser or written to disk.
+
+Finished bundles are cached as roll_slips/bundles/<scope>-<hash>.pdf,
+where the hash covers the slip names (see rendering.roll_slip_name) of
+every applicant in the bundle, so any change to an applicant, or an
+applicant joining or leaving the center, produces a new bundle.
+"""
+import hashlib
+import os
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.db.models.functions import Length
+from django.utils.text import slugify
+from pypdf import PdfReader
+from pypdf.generic import ArrayObject, DictionaryObject, IndirectObject, NameObject, NullObject
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfgen import canvas
+
+from .models import Application
+from .rendering import SLIP_FIELDS, roll_slip_name
+from .utils import draw_roll_slip
+
+BUNDLE_DIR = 'roll_slips/bundles'
+BUNDLE_PART_SIZE = 100
+
+
+class PdfConcatenator:
+    """
+    Joins complete PDF documents into one, emitting bytes as each document
+    is appended. pypdf parses each document; its pages and every object
+    they use are renumbered into the joined file and written at once, so
+    only the document being appended is ever in memory.
+    """
+    CATALOG, PAGES = 1, 2
+
+    def __init__(self):
+        self.position = 0
+        self.offsets = {}
+        self.next_number = 3
+        self.pages = []
+
+    def _emit(self, data):
+        self.position += len(data)
+        return data
+
+    def start(self):
+        return self._emit(b'%PDF-1.4\n%\x93\x8c\x8b\x9e\n')
+
+    def append(self, pdf):
+        """Return the bytes for the pages of `pdf` and everything they refer to."""
+        reader = PdfReader(BytesIO(pdf))
+        numbers = {}
+        pending = []
+
+        def number_of(reference):
+            key = (reference.idnum, reference.generation)
+            if key not in numbers:
+                numbers[key] = self.next_number
+                self.next_number += 1
+                pending.append(reference)
+            return numbers[key]
+
+        def renumber(value):
+            # The reader is thrown away afterwards, so its objects are rewritten in place
+            if isinstance(value, IndirectObject):
+                return IndirectObject(number_of(value), 0, None)
+            if isinstance(value, DictionaryObject):
+                for key in list(value):
+                    value[key] = renumber(value.raw_get(key))
+            elif isinstance(value, ArrayObject):
+                for index, item in enumerate(value):
+                    value[index] = renumber(item)
+            return value
+
+        # reader.pages carries the attributes pages inherit from the page tree, which is not copied
+        pages = {}
+        for page in reader.pages:
+            reference = page.indirect_reference
+            pages[(reference.idnum, reference.generation)] = page
+            self.pages.append(number_of(reference))
+
+        out = []
+        index = 0
+        while index < len(pending):
+            reference = pending[index]
+            index += 1
+            key = (reference.idnum, reference.generation)
+            if key in pages:
+                obj = pages[key]
+                del obj[NameObject('/Parent')]
+                renumber(obj)
+                obj[NameObject('/Parent')] = IndirectObject(self.PAGES, 0, None)
+            else:
+                obj = renumber(reference.get_object() or NullObject())
+            buffer = BytesIO()
+            obj.write_to_stream(buffer)
+            self.offsets[numbers[key]] = self.position
+            out.append(self._emit(b'%d 0 obj\n%s\nendobj\n' % (numbers[key], buffer.getvalue())))
+        return b''.join(out)
+
+    def finish(self):
+        out = []
+        kids = b' '.join(b'%d 0 R' % n for n in self.pages)
+        for number, obj in (
+            (self.PAGES, b'<< /Count %d /Kids [ %s ] /Type /Pages >>' % (len(self.pages), kids)),
+            (self.CATALOG, b'<< /PageMode /UseNone /Pages %d 0 R /Type /Catalog >>' % self.PAGES),
+        ):
+            self.offsets[number] = self.position
+            out.append(self._emit(b'%d 0 obj\n%s\nendobj\n' % (number, obj)))
+
+        size = self.next_number
+        xref = [b'xref\n0 %d\n' % size, b'0000000000 65535 f \n']
+        for number in range(1, size):
+            xref.append(b'%010d 00000 n \n' % self.offsets[number])
+        xref_position = self.position
+        out.append(b''.join(xref))
+        out.append(
+            b'trailer\n<< /Root %d 0 R /Size %d >>\nstartxref\n%d\n%%%%EOF\n'
+            % (self.CATALOG, size, xref_position)
+        )
+        return b''.join(out)
+
+
+def bundle_rows(test_center=None, class_name=None):
+    """Slip fields of every verified applicant in the bundle, in roll number order."""
+    qs = Application.objects.filter(status='verified').exclude(roll_number__isnull=True)
+    if test_center:
+        qs = qs.filter(test_center=test_center)
+    if class_name:
+        qs = qs.filter(class_name=class_name)
+    # "8-0042" < "11-0001": shorter numbers first, then lexical within a length
+    return qs.order_by(Length('roll_number'), 'roll_number').values(*SLIP_FIELDS)
+
+
+def bundle_scope(test_center=None, class_name=None):
+    return slugify(f"{test_center or 'all-centers'}-{class_name or 'all-classes'}")
+
+
+def bundle_name(test_center=None, class_name=None):
+    """Cache name for the bundle as its applicants currently stand (no rendering)."""
+    digest = hashlib.sha256()
+    for values in bundle_rows(test_center, class_name).iterator(chunk_size=2000):
+        digest.update(f"{values['id']}:{roll_slip_name(Application(**values))}\n".encode())
+    return f"{BUNDLE_DIR}/{bundle_scope(test_center, class_name)}-{digest.hexdigest()[:24]}.pdf"
+
+
+def _render_part(apps):
+    buffer = BytesIO()
+    p = canvas.Canvas(buffer, pagesize=A4)
+    for app in apps:
+        draw_roll_slip(p, app)
+    p.save()
+    return buffer.getvalue()
+
+
+def iter_bundle(test_center=None, class_name=None, part_size=BUNDLE_PART_SIZE):
+    """Yield the bundle PDF in pieces, rendering one part of slips at a time."""
+    joiner = PdfConcatenator()
+    yield joiner.start()
+
+    part = []
+    for values in bundle_rows(test_center, class_name).iterator(chunk_size=part_size):
+        values.pop('roll_slip')
+        part.append(Application(**values))
+        if len(part) >= part_size:
+            yield joiner.append(_render_part(part))
+            part = []
+    if part or not joiner.pages:
+        # An empty bundle still needs one page to be a valid PDF
+        yield joiner.append(_render_part(part) if part else _blank_pdf())
+    yield joiner.finish()
+
+
+def _blank_pdf():
+    buffer = BytesIO()
+    p = canvas.Canvas(buffer, pagesize=A4)
+    p.drawString(72, A4[1] - 72, "No verified applicants in this selection.")
+    p.showPage()
+    p.save()
+    return buffer.getvalue()
+
+
+def iter_bundle_cached(name, pieces):
+    """
+    Pass `pieces` through while writing them to a temp file, and move the
+    file to `name` once the bundle is complete. An aborted download leaves
+    nothing behind.
+    """
+    path = os.path.join(settings.MEDIA_ROOT, name)
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    complete = False
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            for piece in pieces:
+                f.write(piece)
+                yield piece
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+        complete = True
+        remove_stale_bundles(name)
+    finally:
+        if not complete and os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def build_bundle(test_center=None, class_name=None):
+    """Write the bundle to the cache unless it is already current. Returns (name, built)."""
+    name = bundle_name(test_center, class_name)
+    if os.path.exists(os.path.join(settings.MEDIA_ROOT, name)):
+        return name, False
+    for _ in iter_bundle_cached(name, iter_bundle(test_center, class_name)):
+        pass
+    return name, True
+
+
+def remove_stale_bundles(name):
+    """Delete older bundles for the same center/class."""
+    directory, filename = os.path.split(os.path.join(settings.MEDIA_ROOT, name))
+    scope = filename.rsplit('-', 1)[0]
+    for other in os.listdir(directory):
+        if other != filename and other.endswith('.pdf') and other.rsplit('-', 1)[0] == scope:
+            os.remove(os.path.join(directory, other))
@@ -0,0 +1,98 @@
+"""
+Admission settings cache.
+
+AdmissionSession, FeeConfig, FeeCategoryConfig and FormFieldVisibility are
+a handful of rows read on nearly every request but changed only by staff.
+get_config() returns an in-memory snapshot of all four, kept per process
+and reloaded when the version in the ConfigVersion row changes.
+
+Saving or deleting any of these rows (admin views, Django admin, shell)
+calls bump_config_version(), which increments that row in the same
+transaction, so every worker on every node reloads on its next check once
+the change commits. Workers read the version (a primary-key lookup) at
+most every CONFIG_CHECK_INTERVAL seconds and reload at least every
+CONFIG_MAX_AGE seconds, in case a change bypassed save() (e.g. a queryset
+update).
+"""
+import threading
+import time
+
+from django.db import transaction
+
+CONFIG_CHECK_INTERVAL = 1.0
+CONFIG_MAX_AGE = 5 * 60
+
+
+class ConfigSnapshot:
+    """Read-only view of the admission settings at one version."""
+
+    def __init__(self, version):
+        from .fees import FeeSchedule
+        from .models import AdmissionSession, FeeCategoryConfig, FeeConfig, FormFieldVisibility
+
+        self.version = version
+        self.sessions = dict(AdmissionSession.objects.order_by('id').values_list('class_name', 'is_open'))
+        self.open_classes = [name for name, is_open in self.sessions.items() if is_open]
+        self.fee_schedule = FeeSchedule(
+            FeeConfig.objects.all(), FeeCategoryConfig.objects.select_related('fee_config'),
+        )
+        fields = dict(FormFieldVisibility.objects.values_list('field_name', 'is_visible'))
+        self.known_fields = frozenset(fields)
+        self.visible_fields = frozenset(name for name, visible in fields.items() if visible)
+
+    def is_open(self, class_name):
+        return self.sessions.get(class_name, False)
+
+
+_lock = threading.Lock()
+_snapshot = None
+_loaded_at = 0.0
+_checked_at = 0.0
+
+
+def _current_version():
+    from .models import ConfigVersion
+
+    return ConfigVersion.current()
+
+
+def get_config():
+    """The current ConfigSnapshot (no queries unless the settings changed)."""
+    global _snapshot, _loaded_at, _checked_at
+    now = time.monotonic()
+    snapshot = _snapshot
+    if snapshot is not None and now - _checked_at < CONFIG_CHECK_INTERVAL and now - _loaded_at < CONFIG_MAX_AGE:
+        return snapshot
+    with _lock:
+        version = _current_version()
+        _checked_at = now
+        if _snapshot is None or _snapshot.version != version or now - _loaded_at >= CONFIG_MAX_AGE:
+            _snapshot = ConfigSnapshot(version)
+            _loaded_at = now
+        return _snapshot
+
+
+def bump_config_version():
+    """Make every process reload the admission settings after the current transaction commits."""
+    from .models import ConfigVersion
+
+    def reset():
+        global _snapshot
+        with _lock:
+            _snapshot = None
+
+    ConfigVersion.bump()
+    transaction.on_commit(reset)
+
+
+def ensure_field_visibility_rows(field_names):
+    """Create (visible) FormFieldVisibility rows for form fields that have none yet."""
+    from .models import FormFieldVisibility
+
+    missing = set(field_names) - get_config().known_fields
+    if missing:
+        FormFieldVisibility.objects.bulk_create(
+            [FormFieldVisibility(field_name=field_name, is_visible=True) for field_name in missing],
+            ignore_conflicts=True,
+        )
+        bump_config_version()
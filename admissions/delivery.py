@@ -0,0 +1,113 @@
+"""
+Protected file delivery.
+
+Views authorize the request and then call serve_file(); the bytes are sent
+by the front proxy when one is configured:
+
+    FILE_DELIVERY_BACKEND = 'nginx'    -> X-Accel-Redirect to FILE_DELIVERY_PREFIX
+    FILE_DELIVERY_BACKEND = 'sendfile' -> X-Sendfile with the absolute path (Apache, Caddy, ...)
+    FILE_DELIVERY_BACKEND = None       -> FileResponse (runserver / local runs)
+
+nginx needs an internal location aliasing MEDIA_ROOT, e.g.
+
+    location /protected-media/ {
+        internal;
+        alias /srv/mcm/media/;
+    }
+
+Every response carries an ETag and Last-Modified, and repeat downloads
+with a matching If-None-Match / If-Modified-Since get a 304 without the
+file being touched.
+
+Download links can also be signed (make_download_token): the token
+carries the storage name, download filename and expiry, so the endpoint
+serving it needs no database query.
+"""
+import mimetypes
+import os
+import time
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core import signing
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import content_disposition_header, http_date, quote_etag
+
+
+def _file_etag(stat):
+    # Size + mtime change whenever a file is rewritten or replaced
+    return quote_etag(f"{stat.st_size:x}-{stat.st_mtime_ns:x}")
+
+
+def _offloaded_response(name, path):
+    backend = getattr(settings, 'FILE_DELIVERY_BACKEND', None)
+    if backend == 'nginx':
+        prefix = getattr(settings, 'FILE_DELIVERY_PREFIX', '/protected-media/')
+        response = HttpResponse()
+        response['X-Accel-Redirect'] = prefix.rstrip('/') + '/' + quote(name)
+        return response
+    if backend == 'sendfile':
+        response = HttpResponse()
+        response['X-Sendfile'] = path
+        return response
+    return None
+
+
+def serve_file(request, name, filename=None, as_attachment=False):
+    """
+    Send the media file stored under `name` (relative to MEDIA_ROOT).
+    Call only after the view has checked the user may see it.
+    """
+    if not name:
+        raise Http404("File not found.")
+    path = os.path.join(settings.MEDIA_ROOT, name)
+    try:
+        stat = os.stat(path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404("File not found.")
+
+    etag = _file_etag(stat)
+    last_modified = int(stat.st_mtime)
+
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        filename = filename or os.path.basename(name)
+        response = _offloaded_response(name, path)
+        if response is None:
+            response = FileResponse(open(path, 'rb'), as_attachment=as_attachment, filename=filename)
+        else:
+            content_type, _ = mimetypes.guess_type(filename)
+            response['Content-Type'] = content_type or 'application/octet-stream'
+            response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    # Private per-user files: browsers may keep them but must revalidate
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def serve_field_file(request, field_file, filename=None, as_attachment=False):
+    """serve_file() for a FileField/ImageField value."""
+    return serve_file(request, field_file.name if field_file else None, filename, as_attachment)
+
+
+# --------------------------
+# Signed download links
+# --------------------------
+def make_download_token(name, filename, max_age, salt, **extra):
+    """Signed, URL-safe token for `name` that expires after `max_age` seconds."""
+    payload = {'n': name, 'f': filename, 'e': int(time.time()) + int(max_age), **extra}
+    return signing.dumps(payload, salt=salt, compress=True)
+
+
+def read_download_token(token, salt):
+    """
+    Return the payload of a token from make_download_token.
+    Raises signing.BadSignature if it was tampered with or has expired.
+    """
+    payload = signing.loads(token, salt=salt)
+    if payload.get('e', 0) < time.time():
+        raise signing.SignatureExpired("Download link has expired.")
+    return payload
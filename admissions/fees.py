@@ -0,0 +1,95 @@
+"""
+Compiled fee schedule.
+
+FeeSchedule turns the FeeConfig / FeeCategoryConfig rows into immutable
+lookup tables, built once per settings version (see admissions.config)
+and shared by every request in the process:
+
+    class_name              -> FeeRule with the flat base/double/triple fees
+    (class_name, category)  -> FeeRule with that category's normal/late/final fees
+
+A FeeRule holds the deadlines as sorted breakpoints and the amount and
+tier name for each band, so pricing is a bisect with no queries. The rules
+are those of the original per-call lookups:
+
+  * no FeeConfig for the class                      -> (None, "no-config")
+  * stop_after_final and the date > final_deadline  -> (None, "closed")
+  * XI                       -> base/double/triple fee, tiers normal/double/triple
+  * other classes, category row present -> normal/late/final fee, same tier names
+  * other classes, no category row      -> base/double/triple fee, tiers normal/double/triple
+
+Bands are inclusive of their deadline: up to normal_deadline is "normal",
+up to late_deadline the second band, after it the third.
+"""
+from bisect import bisect_left
+from collections import namedtuple
+from datetime import date
+from types import MappingProxyType
+
+FLAT_TIERS = ("normal", "double", "triple")
+CATEGORY_TIERS = ("normal", "late", "final")
+
+
+class FeeRule(namedtuple('FeeRule', 'breakpoints prices final_deadline stop_after_final')):
+    """breakpoints: (normal_deadline, late_deadline) sorted; prices: three (amount, tier) bands."""
+
+    __slots__ = ()
+
+    @classmethod
+    def build(cls, config, amounts, tiers):
+        # A late deadline before the normal one leaves the middle band empty,
+        # exactly as the chained `<=` comparisons did
+        breakpoints = (config.normal_deadline, max(config.normal_deadline, config.late_deadline))
+        return cls(breakpoints, tuple(zip(amounts, tiers)), config.final_deadline, config.stop_after_final)
+
+    def price(self, as_of_date):
+        if self.stop_after_final and as_of_date > self.final_deadline:
+            return None, "closed"
+        return self.prices[bisect_left(self.breakpoints, as_of_date)]
+
+
+class FeeSchedule:
+    """Immutable fee lookup for every class and category."""
+
+    def __init__(self, fee_configs, category_fees):
+        """fee_configs: FeeConfig rows; category_fees: FeeCategoryConfig rows with fee_config loaded."""
+        flat, by_category = {}, {}
+        for config in fee_configs:
+            flat[config.class_name] = FeeRule.build(
+                config, (config.base_fee, config.double_fee, config.triple_fee), FLAT_TIERS,
+            )
+        for row in category_fees:
+            config = row.fee_config
+            if config.class_name == "XI":
+                continue  # XI is always priced flat
+            by_category[(config.class_name, row.category)] = FeeRule.build(
+                config, (row.normal_fee, row.late_fee, row.final_fee), CATEGORY_TIERS,
+            )
+        self._flat = MappingProxyType(flat)
+        self._by_category = MappingProxyType(by_category)
+
+    def rule(self, class_name, category):
+        return self._by_category.get((class_name, category)) or self._flat.get(class_name)
+
+    def price(self, class_name, category, as_of_date=None):
+        """(amount, tier) for one class and category on `as_of_date` (default today)."""
+        rule = self.rule(class_name, category)
+        if rule is None:
+            return None, "no-config"
+        return rule.price(as_of_date or date.today())
+
+    def price_many(self, pairs, as_of_date=None):
+        """
+        Price many (class_name, category) pairs for one date. Each distinct
+        pair is worked out once, so thousands of applications cost a
+        handful of lookups. Returns a list of (amount, tier) in input order.
+        """
+        as_of_date = as_of_date or date.today()
+        results = {}
+        priced = []
+        for pair in pairs:
+            result = results.get(pair)
+            if result is None:
+                result = results[pair] = self.price(pair[0], pair[1], as_of_date)
+            priced.append(result)
+        return priced
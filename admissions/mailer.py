@@ -0,0 +1,353 @@
+"""
+Outbound mail dispatcher.
+
+Every email the portal sends goes through one dispatcher per process:
+
+  * a small pool of open, authenticated SMTP connections (MAIL_POOL_SIZE),
+    reused across sends and reopened after MAIL_IDLE_TIMEOUT seconds idle;
+  * messages go out in batches of MAIL_BATCH_SIZE with send_messages();
+  * per-minute and per-day quotas (MAIL_RATE_PER_MINUTE / MAIL_RATE_PER_DAY)
+    are counted in MailCounter rows, so every worker process and node shares
+    them. A full minute waits for the next one; a batch only takes what is
+    left of the day and the rest is deferred with MailQuotaExceeded. Quota
+    taken for messages that then fail is given back;
+  * a circuit breaker, also kept in a MailCounter row: after MAIL_BREAKER_FAILURES
+    consecutive transport failures (connect errors, timeouts, dropped
+    connections) no SMTP is attempted for MAIL_BREAKER_COOLDOWN seconds and
+    messages fail fast with MailCircuitOpen. Connections use EMAIL_TIMEOUT,
+    so a hung server cannot hold a worker;
+  * stats() reports counts and throughput.
+
+deliver() sends and returns each message's outcome (used by the email
+outbox worker, admissions.outbox); send_messages() returns the number sent.
+"""
+import logging
+import os
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time as dt_time, timedelta
+
+from django.conf import settings
+from django.core.mail import get_connection
+from django.db import connection as db_connection
+
+logger = logging.getLogger(__name__)
+
+
+class MailDeferred(Exception):
+    """Nothing was attempted; the message should be tried again at `retry_at` (epoch seconds)."""
+
+    def __init__(self, message, retry_at):
+        super().__init__(message)
+        self.retry_at = retry_at
+
+
+class MailQuotaExceeded(MailDeferred):
+    """The configured daily sending quota has been used up."""
+
+
+class MailCircuitOpen(MailDeferred):
+    """Recent sends kept failing at the transport level; SMTP is not being tried."""
+
+
+# Rejections of a single message; smtplib resets the session after these
+MESSAGE_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+
+
+class MailDispatcher:
+    def __init__(self, pool_size=None, batch_size=None, per_minute=None, per_day=None,
+                 idle_timeout=None, **connection_kwargs):
+        self.pool_size = pool_size or getattr(settings, 'MAIL_POOL_SIZE', 2)
+        self.per_minute = per_minute if per_minute is not None else getattr(settings, 'MAIL_RATE_PER_MINUTE', 0)
+        self.per_day = per_day if per_day is not None else getattr(settings, 'MAIL_RATE_PER_DAY', 0)
+        self.batch_size = batch_size or getattr(settings, 'MAIL_BATCH_SIZE', 50)
+        if self.per_minute:
+            self.batch_size = min(self.batch_size, self.per_minute)
+        self.idle_timeout = idle_timeout or getattr(settings, 'MAIL_IDLE_TIMEOUT', 60)
+        self.breaker_failures = getattr(settings, 'MAIL_BREAKER_FAILURES', 5)
+        self.breaker_cooldown = getattr(settings, 'MAIL_BREAKER_COOLDOWN', 120)
+        self.connection_kwargs = connection_kwargs
+
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.pool_size)
+        self._idle = []  # (connection, last used)
+
+        self._started = None
+        self._counts = {'sent': 0, 'failed': 0, 'batches': 0, 'connections_opened': 0}
+        self._send_seconds = 0.0
+
+    # --------------------------
+    # Connection pool
+    # --------------------------
+    def _open(self):
+        connection = get_connection(fail_silently=False, **self.connection_kwargs)
+        connection.open()
+        with self._lock:
+            self._counts['connections_opened'] += 1
+        return connection
+
+    def _close(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def _acquire(self):
+        self._slots.acquire()
+        with self._lock:
+            connection, last_used = self._idle.pop() if self._idle else (None, None)
+        if connection is not None and time.monotonic() - last_used > self.idle_timeout:
+            # The server has most likely dropped it already
+            self._close(connection)
+            connection = None
+        try:
+            return connection or self._open()
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _release(self, connection, broken=False):
+        if broken:
+            self._close(connection)
+        else:
+            with self._lock:
+                self._idle.append((connection, time.monotonic()))
+        self._slots.release()
+
+    def close(self):
+        """Close every idle connection (e.g. at the end of a management command)."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection, _ in idle:
+            self._close(connection)
+
+    # --------------------------
+    # Quotas
+    # --------------------------
+    @staticmethod
+    def _day_key():
+        return f"day:{date.today().isoformat()}"
+
+    @staticmethod
+    def _tomorrow():
+        return datetime.combine(date.today() + timedelta(days=1), dt_time.min).timestamp()
+
+    @staticmethod
+    def _minute_key(minute=None):
+        return f"minute:{minute if minute is not None else int(time.time() // 60)}"
+
+    def _throttle(self, count):
+        """
+        Block until messages fit the quotas and take as many of `count` as
+        the day has left. Returns (taken, keys): how many may be sent and the
+        counters they were charged to, for _refund().
+        """
+        from .models import MailCounter
+
+        keys = []
+        if self.per_day:
+            tomorrow = self._tomorrow()
+            count = MailCounter.take_up_to(self._day_key(), count, self.per_day, until=tomorrow)
+            if not count:
+                raise MailQuotaExceeded(f"Daily mail quota of {self.per_day} reached", retry_at=tomorrow)
+            keys.append(self._day_key())
+
+        if self.per_minute:
+            while True:
+                minute = int(time.time() // 60)
+                key = self._minute_key(minute)
+                if not MailCounter.objects.filter(key=key).exists():
+                    # A new window: clear out the finished ones
+                    MailCounter.purge_expired(before=time.time() - 60 * 60 * 24)
+                if MailCounter.take(key, count, self.per_minute, until=(minute + 1) * 60):
+                    keys.append(key)
+                    break
+                time.sleep(60 - time.time() % 60 + 0.05)
+        return count, keys
+
+    @staticmethod
+    def _refund(keys, count):
+        """Return quota taken for `count` messages that were not sent."""
+        from .models import MailCounter
+
+        for key in keys:
+            MailCounter.refund(key, count)
+
+    # --------------------------
+    # Circuit breaker
+    # --------------------------
+    BREAKER_KEY = 'breaker'
+
+    def _check_breaker(self):
+        from .models import MailCounter
+
+        _, open_until = MailCounter.read(self.BREAKER_KEY)
+        if open_until > time.time():
+            raise MailCircuitOpen("SMTP circuit breaker is open", retry_at=open_until)
+
+    def _record_transport(self, ok):
+        from .models import MailCounter
+
+        if ok:
+            MailCounter.objects.filter(key=self.BREAKER_KEY, value__gt=0).update(value=0, until=0)
+            return
+        failures = MailCounter.add(self.BREAKER_KEY)
+        if failures >= self.breaker_failures:
+            # Open (or re-open after a failed trial send once the cooldown ran out)
+            MailCounter.objects.filter(key=self.BREAKER_KEY).update(until=time.time() + self.breaker_cooldown)
+            logger.error(f"SMTP failing ({failures} in a row), pausing sends for {self.breaker_cooldown}s")
+
+    def breaker_open(self):
+        from .models import MailCounter
+
+        return MailCounter.read(self.BREAKER_KEY)[1] > time.time()
+
+    # --------------------------
+    # Sending
+    # --------------------------
+    def send_messages(self, messages):
+        """Send now, in batches over pooled connections. Returns the number sent."""
+        return sum(1 for error in self.deliver(messages) if error is None)
+
+    def deliver(self, messages):
+        """
+        Send now and report each message's outcome: a list in message order
+        holding None for every message the server accepted and the exception
+        for the others. Batches run concurrently across the pool.
+        """
+        messages = list(messages)
+        batches = [messages[i:i + self.batch_size] for i in range(0, len(messages), self.batch_size)]
+        began = time.monotonic()
+        with self._lock:
+            self._started = self._started or began
+
+        if len(batches) > 1 and self.pool_size > 1:
+            with ThreadPoolExecutor(max_workers=self.pool_size) as executor:
+                results = [error for batch in executor.map(self._deliver_batch_in_thread, batches) for error in batch]
+        else:
+            results = [error for batch in batches for error in self._deliver_batch(batch)]
+
+        with self._lock:
+            self._send_seconds += time.monotonic() - began
+        return results
+
+    def _deliver_batch_in_thread(self, batch):
+        try:
+            return self._deliver_batch(batch)
+        finally:
+            # The quota and breaker rows were read on this thread's own connection
+            db_connection.close()
+
+    def _deliver_batch(self, batch):
+        try:
+            self._check_breaker()
+            taken, keys = self._throttle(len(batch))
+        except MailDeferred as e:
+            logger.warning(f"{e}, {len(batch)} messages not sent")
+            results = [e] * len(batch)
+        else:
+            results = self._send_batch(batch[:taken])
+            # Quota is only used by messages the server accepted
+            self._refund(keys, taken - results.count(None))
+            if taken < len(batch):
+                deferred = MailQuotaExceeded(f"Daily mail quota of {self.per_day} reached", retry_at=self._tomorrow())
+                logger.warning(f"{deferred}, {len(batch) - taken} messages not sent")
+                results += [deferred] * (len(batch) - taken)
+
+        sent = results.count(None)
+        with self._lock:
+            self._counts['sent'] += sent
+            self._counts['failed'] += len(batch) - sent
+            self._counts['batches'] += 1
+        return results
+
+    def _send_batch(self, batch):
+        results = []
+        connection = None
+        for message in batch:
+            for attempt in (1, 2):
+                try:
+                    connection = connection or self._acquire()
+                except Exception as e:
+                    # Server unreachable: the rest of the batch fails the same way
+                    logger.error("Could not open an SMTP connection", exc_info=True)
+                    self._record_transport(ok=False)
+                    return results + [e] * (len(batch) - len(results))
+                try:
+                    sent = connection.send_messages([message])
+                    results.append(None if sent else ValueError("Message has no recipients"))
+                    break
+                except smtplib.SMTPServerDisconnected as e:
+                    # Pooled connection dropped by the server; retry once on a fresh one
+                    self._release(connection, broken=True)
+                    connection = None
+                    if attempt == 2:
+                        self._record_transport(ok=False)
+                        results.append(e)
+                except MESSAGE_ERRORS as e:
+                    # Refused by the server; the connection itself is fine
+                    results.append(e)
+                    break
+                except Exception as e:
+                    logger.error("Email send failed", exc_info=True)
+                    self._release(connection, broken=True)
+                    connection = None
+                    self._record_transport(ok=False)
+                    results.append(e)
+                    break
+        if connection is not None:
+            self._release(connection)
+        if None in results:
+            self._record_transport(ok=True)
+        return results
+
+    # --------------------------
+    # Stats
+    # --------------------------
+    def stats(self):
+        from .models import MailCounter
+
+        with self._lock:
+            counts = dict(self._counts)
+            send_seconds = self._send_seconds
+            elapsed = time.monotonic() - self._started if self._started else 0.0
+            idle = len(self._idle)
+        return {
+            **counts,
+            'idle_connections': idle,
+            'pool_size': self.pool_size,
+            'batch_size': self.batch_size,
+            'elapsed_seconds': round(elapsed, 3),
+            'send_seconds': round(send_seconds, 3),
+            'messages_per_second': round(counts['sent'] / send_seconds, 1) if send_seconds else 0.0,
+            'sent_this_minute': MailCounter.read(self._minute_key())[0],
+            'sent_today': MailCounter.read(self._day_key())[0],
+            'per_minute_quota': self.per_minute,
+            'per_day_quota': self.per_day,
+            'breaker_open': self.breaker_open(),
+        }
+
+
+_dispatcher = None
+_dispatcher_pid = None
+_dispatcher_lock = threading.Lock()
+
+
+def get_dispatcher():
+    """The process-wide dispatcher (rebuilt after a fork, e.g. in Celery workers)."""
+    global _dispatcher, _dispatcher_pid
+    with _dispatcher_lock:
+        if _dispatcher is None or _dispatcher_pid != os.getpid():
+            _dispatcher = MailDispatcher()
+            _dispatcher_pid = os.getpid()
+        return _dispatcher
+
+
+def send_messages(messages):
+    return get_dispatcher().send_messages(messages)
+
+
+def deliver(messages):
+    return get_dispatcher().deliver(messages)
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from admissions.models import RollNumberSequence
+
+
+class Command(BaseCommand):
+    help = "Seed the per-prefix roll number counters from roll numbers already issued."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force',
+            action='store_true',
+            help="Overwrite a counter even if it is ahead of the highest issued roll number.",
+        )
+
+    def handle(self, *args, **options):
+        for prefix in (RollNumberSequence.prefix_for('VIII'), RollNumberSequence.prefix_for('XI')):
+            with transaction.atomic():
+                highest = RollNumberSequence.highest_issued(prefix)
+                seq, created = RollNumberSequence.objects.select_for_update().get_or_create(
+                    prefix=prefix, defaults={'last_value': highest}
+                )
+
+                if created:
+                    self.stdout.write(self.style.SUCCESS(f"Created counter {prefix}: last issued {highest}"))
+                elif seq.last_value < highest or options['force']:
+                    old = seq.last_value
+                    seq.last_value = highest
+                    seq.save(update_fields=['last_value'])
+                    self.stdout.write(self.style.SUCCESS(f"Updated counter {prefix}: {old} -> {highest}"))
+                else:
+                    self.stdout.write(f"Counter {prefix} already at {seq.last_value} (highest issued {highest})")
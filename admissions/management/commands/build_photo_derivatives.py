@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from admissions.models import Application
+from admissions.utils import build_photo_derivatives
+
+
+class Command(BaseCommand):
+    help = "Build print and thumbnail JPEGs for applicant photos uploaded before derivatives existed."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Rebuild derivatives for every photo.")
+
+    def handle(self, *args, **options):
+        qs = Application.objects.exclude(photo='').exclude(photo__isnull=True)
+        if not options['all']:
+            qs = qs.filter(Q(photo_print='') | Q(photo_print__isnull=True))
+
+        built, failed = 0, 0
+        for app in qs.only('id', 'photo', 'photo_print', 'photo_thumb').iterator():
+            try:
+                build_photo_derivatives(app)
+                built += 1
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f"Application {app.id}: {e}")
+
+        self.stdout.write(self.style.SUCCESS(f"Built derivatives for {built} photos ({failed} failed)."))
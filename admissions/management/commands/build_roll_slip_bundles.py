@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from admissions.bundles import build_bundle
+from admissions.models import Application
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the printable roll slip bundle (one PDF, roll number order) for a test "
+        "center and/or class. Bundles that are still current are left as they are."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--center', help="Test center code, e.g. Rawalpindi1.")
+        parser.add_argument('--class', dest='class_name', choices=['VIII', 'XI'])
+        parser.add_argument(
+            '--each-center', action='store_true',
+            help="Build one bundle per test center (combined with --class if given).",
+        )
+
+    def handle(self, *args, **options):
+        centers = dict(Application.TEST_CENTERS)
+        center, class_name = options['center'], options['class_name']
+        if center and center not in centers:
+            raise CommandError(f"Unknown test center '{center}'. Choices: {', '.join(centers)}")
+
+        scopes = [(code, class_name) for code in centers] if options['each_center'] else [(center, class_name)]
+
+        for test_center, klass in scopes:
+            name, built = build_bundle(test_center, klass)
+            status = "built" if built else "up to date"
+            self.stdout.write(f"{test_center or 'All centers'} / {klass or 'All classes'}: {name} ({status})")
+
+        self.stdout.write(self.style.SUCCESS(f"{len(scopes)} bundle(s) ready."))
@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from admissions.models import EmailOutbox
+from admissions.outbox import OUTBOX_BATCH_SIZE, drain_outbox
+
+
+class Command(BaseCommand):
+    help = "Send due emails from the outbox (use --loop where Celery beat is not running)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=OUTBOX_BATCH_SIZE)
+        parser.add_argument('--loop', action='store_true', help="Keep draining until interrupted.")
+        parser.add_argument('--interval', type=int, default=30, help="Seconds between drains with --loop.")
+
+    def handle(self, *args, **options):
+        while True:
+            totals = drain_outbox(batch_size=options['batch_size'])
+            self.stdout.write(
+                f"Sent {totals['sent']}, retrying {totals['retrying']}, dead {totals['dead']}, "
+                f"deferred {totals['deferred']} in {totals['seconds']}s"
+            )
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
+        counts = EmailOutbox.status_counts()
+        self.stdout.write(self.style.SUCCESS(
+            "Outbox: " + ", ".join(f"{status} {count}" for status, count in counts.items())
+        ))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from admissions.retention import RETENTION_BATCH_SIZE, run_retention
+
+
+class Command(BaseCommand):
+    help = "Delete expired notifications, verification codes, outbox emails and broadcast jobs in small batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=RETENTION_BATCH_SIZE,
+                            help="Ids per delete (each batch is its own transaction).")
+        parser.add_argument('--dry-run', action='store_true', help="Only count what would be deleted.")
+
+    def handle(self, *args, **options):
+        report = run_retention(batch_size=options['batch_size'], dry_run=options['dry_run'])
+        total = report.pop('total')
+        verb = "Would remove" if options['dry_run'] else "Removed"
+        for label, entry in report.items():
+            self.stdout.write(f"{label:<26} {entry['rows']:>8} rows  {entry['seconds']}s")
+        self.stdout.write(self.style.SUCCESS(f"{verb} {total['rows']} rows in {total['seconds']}s"))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from admissions.search import rebuild_search_documents
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute applicant search documents and digits-only identifier columns "
+        "(run once after migrating, and after imports or updates that bypass Application.save)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        changed = rebuild_search_documents(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Search index rebuilt, {changed} applications updated."))
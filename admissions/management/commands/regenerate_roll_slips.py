@@ -0,0 +1,97 @@
+import json
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from admissions.models import Application
+from admissions.rendering import default_workers, render_roll_slips, write_file_atomic
+
+
+def roll_sequence(roll_number):
+    """(prefix, number) for a roll number like "8-0042"."""
+    try:
+        prefix, seq = roll_number.rsplit('-', 1)
+        return prefix, int(seq)
+    except (AttributeError, ValueError):
+        raise CommandError(f"Invalid roll number: {roll_number!r}")
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-render roll slip PDFs for verified applicants on a process pool. "
+        "Use after changing the slip layout or exam instructions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--class', dest='class_name', choices=['VIII', 'XI'], help="Only this class.")
+        parser.add_argument('--center', help="Only this test center (e.g. Quetta).")
+        parser.add_argument('--roll-from', help="First roll number to include (e.g. 8-0001).")
+        parser.add_argument('--roll-to', help="Last roll number to include (e.g. 8-0500).")
+        parser.add_argument('--workers', type=int, default=None, help="Processes to use (default: CPU count).")
+        parser.add_argument('--resume', action='store_true', help="Continue an interrupted run with the same filters.")
+        parser.add_argument(
+            '--checkpoint',
+            default=os.path.join(settings.MEDIA_ROOT, 'roll_slips', '.regenerate_roll_slips.json'),
+            help="Progress file used by --resume.",
+        )
+
+    def handle(self, *args, **options):
+        filters = {k: options[k] for k in ('class_name', 'center', 'roll_from', 'roll_to')}
+        qs = Application.objects.filter(status='verified')
+
+        if filters['class_name']:
+            qs = qs.filter(class_name=filters['class_name'])
+        if filters['center']:
+            qs = qs.filter(test_center=filters['center'])
+
+        if filters['roll_from'] or filters['roll_to']:
+            prefix_from, seq_from = roll_sequence(filters['roll_from']) if filters['roll_from'] else (None, 0)
+            prefix_to, seq_to = roll_sequence(filters['roll_to']) if filters['roll_to'] else (None, None)
+            prefix = prefix_from or prefix_to
+            if prefix_from and prefix_to and prefix_from != prefix_to:
+                raise CommandError("--roll-from and --roll-to must use the same class prefix.")
+
+            # Roll numbers sort as text ("8-10000" < "8-9999"), so compare the numbers
+            ids = [
+                app_id
+                for app_id, roll in qs.filter(roll_number__startswith=f"{prefix}-").values_list('id', 'roll_number')
+                if seq_from <= roll_sequence(roll)[1] <= (seq_to if seq_to is not None else float('inf'))
+            ]
+            qs = qs.filter(id__in=ids)
+
+        checkpoint_path = options['checkpoint']
+        start_after = 0
+        if options['resume']:
+            if not os.path.exists(checkpoint_path):
+                raise CommandError(f"No checkpoint found at {checkpoint_path}")
+            with open(checkpoint_path) as f:
+                checkpoint = json.load(f)
+            if checkpoint.get('filters') != filters:
+                raise CommandError(f"Checkpoint was written for different filters: {checkpoint.get('filters')}")
+            start_after = checkpoint['last_id']
+            self.stdout.write(f"Resuming after application id {start_after}")
+        qs = qs.filter(id__gt=start_after)
+
+        total = qs.count()
+        workers = options['workers'] or default_workers()
+        self.stdout.write(f"Rendering {total} roll slips on {workers} worker(s)...")
+        started = time.monotonic()
+
+        def save_checkpoint(last_id, rendered, failed):
+            write_file_atomic(checkpoint_path, json.dumps({
+                'filters': filters, 'last_id': last_id, 'rendered': rendered, 'failed': failed,
+            }).encode())
+            rate = rendered / max(time.monotonic() - started, 0.001)
+            self.stdout.write(f"  {rendered + failed}/{total} done ({failed} failed, {rate:.0f} slips/s)")
+
+        rendered, failed = render_roll_slips(qs, workers=workers, on_chunk=save_checkpoint)
+
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Rendered {rendered} roll slips in {elapsed:.1f}s ({failed} failed)."
+        ))
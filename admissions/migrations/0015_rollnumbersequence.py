@@ -0,0 +1,25 @@
+# Generated by Django 4.2.26 on 2026-10-17 19:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admissions', '0014_alter_application_photo_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RollNumberSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('prefix', models.CharField(max_length=5, unique=True)),
+                ('last_value', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Roll Number Sequence',
+                'verbose_name_plural': 'Roll Number Sequences',
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.26 on 2026-10-17 20:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admissions', '0015_rollnumbersequence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='application',
+            name='photo_print',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='photos/'),
+        ),
+        migrations.AddField(
+            model_name='application',
+            name='photo_thumb',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='photos/'),
+        ),
+    ]
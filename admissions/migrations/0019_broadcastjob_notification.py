@@ -0,0 +1,20 @@
+# Generated by Django 4.2.26 on 2026-10-17 20:33
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0002_broadcastnotification'),
+        ('admissions', '0018_broadcastjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='broadcastjob',
+            name='notification',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='job', to='notifications.broadcastnotification'),
+        ),
+    ]
@@ -0,0 +1,65 @@
+import re
+
+from django.db import migrations, models
+
+# Frozen copy of admissions.search.build_search_document, so the backfill
+# writes the same documents the app does
+SEARCH_FIELDS = ('name', 'father_name', 'roll_number', 'form_b', 'father_cnic')
+
+
+def build_search_document(application):
+    values = [getattr(application, field) for field in SEARCH_FIELDS]
+    values += [re.sub(r'\D', '', str(getattr(application, field) or '')) for field in ('father_cnic', 'form_b')]
+    words = []
+    for value in values:
+        for word in str(value or '').lower().split():
+            if word not in words:
+                words.append(word)
+    return ' '.join(words)
+
+
+def fill_search_documents(apps, schema_editor):
+    Application = apps.get_model('admissions', 'Application')
+    last_id = 0
+    while True:
+        batch = list(
+            Application.objects.filter(id__gt=last_id).order_by('id').only('id', *SEARCH_FIELDS)[:2000]
+        )
+        if not batch:
+            break
+        last_id = batch[-1].id
+        for application in batch:
+            application.search_document = build_search_document(application)
+        Application.objects.bulk_update(batch, ['search_document'])
+
+
+def create_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return  # SQLite gets an FTS5 table after migrate instead (admissions.apps)
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    schema_editor.execute(
+        "CREATE INDEX IF NOT EXISTS admissions_app_search_trgm "
+        "ON admissions_application USING gin (search_document gin_trgm_ops)"
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute("DROP INDEX IF EXISTS admissions_app_search_trgm")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admissions', '0019_broadcastjob_notification'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='application',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(fill_search_documents, migrations.RunPython.noop),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
@@ -0,0 +1,63 @@
+# Generated by Django 4.2.26 on 2026-10-17 20:47
+
+import re
+
+from django.db import migrations, models
+
+# Frozen copy of admissions.search.digits_only
+DIGIT_FIELDS = ('father_cnic', 'form_b', 'mobile_no', 'roll_number')
+
+
+def digits_only(value, field=None):
+    digits = re.sub(r'\D', '', str(value or ''))
+    if field == 'mobile_no' and digits.startswith('92') and len(digits) == 12:
+        digits = '0' + digits[2:]
+    return digits
+
+
+def fill_identifier_digits(apps, schema_editor):
+    Application = apps.get_model('admissions', 'Application')
+    columns = [f'{field}_digits' for field in DIGIT_FIELDS]
+    last_id = 0
+    while True:
+        batch = list(
+            Application.objects.filter(id__gt=last_id).order_by('id').only('id', *DIGIT_FIELDS)[:2000]
+        )
+        if not batch:
+            break
+        last_id = batch[-1].id
+        for application in batch:
+            for field in DIGIT_FIELDS:
+                setattr(application, f'{field}_digits', digits_only(getattr(application, field), field))
+        Application.objects.bulk_update(batch, columns)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admissions', '0020_application_search_document'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='application',
+            name='father_cnic_digits',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='application',
+            name='form_b_digits',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='application',
+            name='mobile_no_digits',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='application',
+            name='roll_number_digits',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=20),
+        ),
+        migrations.RunPython(fill_identifier_digits, migrations.RunPython.noop),
+    ]
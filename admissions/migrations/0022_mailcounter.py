@@ -0,0 +1,26 @@
+# Generated by Django 4.2.26 on 2026-10-17 20:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admissions', '0021_application_identifier_digits'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MailCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('key', models.CharField(max_length=40, unique=True)),
+                ('value', models.IntegerField(default=0)),
+                ('until', models.FloatField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Mail Counter',
+                'verbose_name_plural': 'Mail Counters',
+            },
+        ),
+    ]
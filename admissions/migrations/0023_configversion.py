@@ -0,0 +1,26 @@
+# Generated by Django 4.2.26 on 2026-10-17 20:57
+
+from django.db import migrations, models
+
+
+def create_version_row(apps, schema_editor):
+    ConfigVersion = apps.get_model('admissions', 'ConfigVersion')
+    ConfigVersion.objects.get_or_create(pk=1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('admissions', '0022_mailcounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConfigVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_version_row, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
-from django.db import models, transaction
+from django.db import connection, models, transaction
+from django.db.models import F
 from django.conf import settings
 from django.utils import timezone
 import uuid
@@ -104,6 +105,9 @@ class Application(models.Model):
     )
 
     photo = models.ImageField(upload_to='photos/', blank=True, null=True, validators=[validate_photo])
+    # Derivatives of `photo`, rebuilt in the background whenever a new photo is saved
+    photo_print = models.ImageField(upload_to='photos/', blank=True, null=True, editable=False)
+    photo_thumb = models.ImageField(upload_to='photos/', blank=True, null=True, editable=False)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='draft')
     submission_date = models.DateField(default=timezone.now)
     challan_image = models.ImageField(upload_to='challans/', blank=True, null=True)
@@ -218,6 +222,16 @@ class Application(models.Model):
     secure_token = models.CharField(max_length=50, unique=True, blank=True, null=True)
     roll_slip = models.FileField(upload_to='roll_slips/', blank=True, null=True)
 
+    # -------------------------------------------------
+    # Admin search (see admissions/search.py)
+    # -------------------------------------------------
+    search_document = models.TextField(blank=True, default='', editable=False)
+    # Digits-only copies of the identifiers, for exact lookups however they are typed
+    father_cnic_digits = models.CharField(max_length=20, blank=True, default='', editable=False, db_index=True)
+    form_b_digits = models.CharField(max_length=20, blank=True, default='', editable=False, db_index=True)
+    mobile_no_digits = models.CharField(max_length=20, blank=True, default='', editable=False, db_index=True)
+    roll_number_digits = models.CharField(max_length=20, blank=True, default='', editable=False, db_index=True)
+
     # -------------------------------------------------
     # Roll Number Auto Generation
     # -------------------------------------------------
@@ -226,43 +240,69 @@ class Application(models.Model):
         Generates a sequential roll number based on class.
         Format: [Class]-[Sequence] (e.g., 8-0001, 11-0001)
         """
-        # Determine prefix based on class
-        if self.class_name == 'XI':
-            prefix = '11'
-        else:
-            prefix = '8'  # Default to Class VIII
-
-        # Find the highest existing sequence for this prefix
-        # We filter by prefix and find the max value
-        # LOCKING: Use select_for_update to prevent race conditions during bulk verify
-        with transaction.atomic():
-            last_app = Application.objects.filter(
-                roll_number__startswith=f"{prefix}-"
-            ).select_for_update().order_by('roll_number').last()
-
-            if last_app and last_app.roll_number:
-                try:
-                    # Extract sequence part (e.g., "0005" from "8-0005")
-                    last_seq = int(last_app.roll_number.split('-')[-1])
-                    new_seq = last_seq + 1
-                except ValueError:
-                    # Fallback if format is unexpected
-                    new_seq = 1
-            else:
-                new_seq = 1
-
-        return f"{prefix}-{new_seq:04d}"
+        # Numbers come from the per-prefix counter row (see RollNumberSequence)
+        # instead of scanning and locking every application with this prefix.
+        return RollNumberSequence.next_roll_number(self.class_name)
+
+    # -------------------------------------------------
+    # Photo Derivatives
+    # -------------------------------------------------
+    @property
+    def photo_thumb_url(self):
+        photo = self.photo_thumb or self.photo
+        return photo.url if photo else ''
+
+    @property
+    def photo_print_url(self):
+        photo = self.photo_print or self.photo
+        return photo.url if photo else ''
 
     # -------------------------------------------------
     # Save Override
     # -------------------------------------------------
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored photo so save() can tell when a new one is uploaded
+        instance._stored_photo = dict(zip(field_names, values)).get('photo')
+        return instance
+
     def save(self, *args, **kwargs):
         if not self.secure_token:
             self.secure_token = uuid.uuid4().hex[:24]
         if self.status == 'verified' and not self.roll_number:
             self.roll_number = self.generate_roll_number()
+
+        update_fields = kwargs.get('update_fields')
+        from .search import refresh_search_columns
+        refreshed = refresh_search_columns(self, update_fields)
+        if update_fields is not None and refreshed:
+            kwargs['update_fields'] = list(update_fields) + refreshed
+
+        photo_changed = (
+            (self.photo.name or None) != (getattr(self, '_stored_photo', None) or None)
+            and (update_fields is None or 'photo' in update_fields)
+        )
+        stale = []
+        if photo_changed:
+            # The derivatives belong to the old photo: drop them so slips and
+            # thumbnails fall back to the new upload until they are rebuilt
+            stale = [(field.storage, field.name) for field in (self.photo_print, self.photo_thumb) if field]
+            if stale:
+                self.photo_print = None
+                self.photo_thumb = None
+                if update_fields is not None:
+                    kwargs['update_fields'] = list(kwargs['update_fields']) + ['photo_print', 'photo_thumb']
         super().save(*args, **kwargs)
 
+        if photo_changed:
+            self._stored_photo = self.photo.name
+            for storage, name in stale:
+                transaction.on_commit(lambda storage=storage, name=name: storage.delete(name))
+            if self.photo:
+                from .tasks import dispatch, generate_photo_derivatives_task
+                transaction.on_commit(lambda: dispatch(generate_photo_derivatives_task, self.pk))
+
     def __str__(self):
         return f"{self.name} ({self.status})"
 
@@ -279,10 +319,148 @@ class Application(models.Model):
         verbose_name_plural = "Applications"
 
 
+# -------------------------------------------------
+# Roll Number Sequence
+# -------------------------------------------------
+class RollNumberSequence(models.Model):
+    """
+    One counter row per roll number prefix ("8" for Class VIII, "11" for Class XI).
+    Numbers are handed out with a single UPDATE ... RETURNING, so the row lock is
+    held only until the caller's transaction commits and a rolled back verify
+    gives its number back (no gaps).
+    """
+    prefix = models.CharField(max_length=5, unique=True)
+    last_value = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Roll Number Sequence"
+        verbose_name_plural = "Roll Number Sequences"
+
+    def __str__(self):
+        return f"{self.prefix}-{self.last_value:04d}"
+
+    @staticmethod
+    def prefix_for(class_name):
+        return '11' if class_name == 'XI' else '8'  # Default to Class VIII
+
+    @staticmethod
+    def format_roll_number(prefix, seq):
+        return f"{prefix}-{seq:04d}"
+
+    @classmethod
+    def highest_issued(cls, prefix):
+        """Highest sequence already used by an application with this prefix."""
+        highest = 0
+        rolls = Application.objects.filter(
+            roll_number__startswith=f"{prefix}-"
+        ).values_list('roll_number', flat=True)
+        for roll in rolls.iterator():
+            try:
+                # Compare numerically: "8-10000" sorts before "8-9999" as text
+                highest = max(highest, int(roll.split('-')[-1]))
+            except ValueError:
+                continue
+        return highest
+
+    @classmethod
+    def reserve(cls, prefix, count=1):
+        """
+        Reserve `count` consecutive sequence numbers for `prefix` and return
+        them as a range. Call inside the transaction that stores the numbers.
+        """
+        if count < 1:
+            return range(0)
+
+        table = connection.ops.quote_name(cls._meta.db_table)
+        with transaction.atomic():
+            for _ in range(2):
+                if connection.features.can_return_columns_from_insert:
+                    with connection.cursor() as cursor:
+                        cursor.execute(
+                            f"UPDATE {table} SET last_value = last_value + %s "
+                            f"WHERE prefix = %s RETURNING last_value",
+                            [count, prefix],
+                        )
+                        row = cursor.fetchone()
+                    last_value = row[0] if row else None
+                else:
+                    # Backends without RETURNING: lock the single counter row
+                    seq = cls.objects.select_for_update().filter(prefix=prefix).first()
+                    last_value = None
+                    if seq:
+                        seq.last_value += count
+                        seq.save(update_fields=['last_value'])
+                        last_value = seq.last_value
+
+                if last_value is not None:
+                    return range(last_value - count + 1, last_value + 1)
+
+                # First use of this prefix: seed from the numbers already issued
+                cls.objects.get_or_create(
+                    prefix=prefix,
+                    defaults={'last_value': cls.highest_issued(prefix)},
+                )
+
+        raise RuntimeError(f"Could not reserve roll numbers for prefix {prefix}")
+
+    @classmethod
+    def next_roll_number(cls, class_name):
+        prefix = cls.prefix_for(class_name)
+        return cls.format_roll_number(prefix, cls.reserve(prefix)[0])
+
+    @classmethod
+    def reserve_roll_numbers(cls, class_name, count):
+        """Reserve a whole block of roll numbers for one class in one statement."""
+        prefix = cls.prefix_for(class_name)
+        return [cls.format_roll_number(prefix, seq) for seq in cls.reserve(prefix, count)]
+
+
 # -------------------------------------------------
 # Additional Models
 # -------------------------------------------------
-class FormFieldVisibility(models.Model):
+class ConfigVersion(models.Model):
+    """
+    A single row (pk=1) whose `version` goes up whenever a CachedConfigModel
+    changes. Every process compares it with the version of its
+    admissions.config snapshot.
+    """
+    version = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Config version {self.version}"
+
+    @classmethod
+    def current(cls):
+        return cls.objects.filter(pk=1).values_list('version', flat=True).first() or 0
+
+    @classmethod
+    def bump(cls):
+        """Move the version on; visible to other processes when the current transaction commits."""
+        if not cls.objects.filter(pk=1).update(version=F('version') + 1):
+            cls.objects.bulk_create([cls(pk=1, version=1)], ignore_conflicts=True)
+
+
+class CachedConfigModel(models.Model):
+    """Settings rows served from admissions.config; any change makes every process reload them."""
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        from .config import bump_config_version
+
+        super().save(*args, **kwargs)
+        bump_config_version()
+
+    def delete(self, *args, **kwargs):
+        from .config import bump_config_version
+
+        result = super().delete(*args, **kwargs)
+        bump_config_version()
+        return result
+
+
+class FormFieldVisibility(CachedConfigModel):
     field_name = models.CharField(max_length=100, unique=True)
     is_visible = models.BooleanField(default=True)
 
@@ -290,7 +468,7 @@ class FormFieldVisibility(models.Model):
         return f"{self.field_name} - {'Visible' if self.is_visible else 'Hidden'}"
 
 
-class AdmissionSession(models.Model):
+class AdmissionSession(CachedConfigModel):
     CLASS_CHOICES = [
         ('VIII', 'Class VIII'),
         ('XI', 'Class XI'),
@@ -304,7 +482,7 @@ class AdmissionSession(models.Model):
 #------------------------------------
 # Fees config 
 #------------------------------------
-class FeeConfig(models.Model):
+class FeeConfig(CachedConfigModel):
     CLASS_CHOICES = [
         ("VIII", "8th Class"),
         ("XI", "11th Class"),
@@ -336,7 +514,7 @@ class FeeConfig(models.Model):
     def __str__(self):
         return f"{self.get_class_name_display()}"
 
-class FeeCategoryConfig(models.Model):
+class FeeCategoryConfig(CachedConfigModel):
     """
     Per-category fee rows used for class VIII (category-dependent).
     For XI you can leave this empty or not create entries.
@@ -389,3 +567,286 @@ class MessageTemplate(models.Model):
 
     def __str__(self):
         return f"{self.title} ({self.get_category_display()})"
+
+
+# -------------------------------------------------
+# 📬 Email Outbox
+# -------------------------------------------------
+class EmailOutbox(models.Model):
+    """
+    One row per outbound email. Request handlers and tasks only insert rows;
+    admissions.outbox.drain_outbox sends them in batches, retrying failures
+    with exponential backoff until they are sent or dead-lettered.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_SENDING = 'sending'
+    STATUS_RETRYING = 'retrying'
+    STATUS_SENT = 'sent'
+    STATUS_DEAD = 'dead'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_SENDING, 'Sending'),
+        (STATUS_RETRYING, 'Retrying'),
+        (STATUS_SENT, 'Sent'),
+        (STATUS_DEAD, 'Dead'),
+    ]
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='outbox_emails'
+    )
+    category = models.CharField(max_length=30, blank=True, db_index=True)
+    to_email = models.EmailField(max_length=254)
+    from_email = models.CharField(max_length=254, blank=True)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    # Due time for pending/retrying rows; lease expiry while a worker is sending
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+        ]
+        ordering = ['-created_at']
+        verbose_name = "Outbox Email"
+        verbose_name_plural = "Email Outbox"
+
+    def __str__(self):
+        return f"{self.to_email}: {self.subject} ({self.status})"
+
+    @classmethod
+    def from_message(cls, message, to_email, user_id=None, category=''):
+        """Unsaved row sending an EmailMessage / EmailMultiAlternatives to one recipient."""
+        html_body = ''
+        for content, mimetype in getattr(message, 'alternatives', []):
+            if mimetype == 'text/html':
+                html_body = content
+        return cls(
+            user_id=user_id,
+            category=category,
+            to_email=to_email,
+            from_email=message.from_email or '',
+            subject=message.subject,
+            body=message.body,
+            html_body=html_body,
+        )
+
+    def to_message(self):
+        from django.core.mail import EmailMultiAlternatives
+
+        message = EmailMultiAlternatives(
+            subject=self.subject,
+            body=self.body,
+            from_email=self.from_email or settings.DEFAULT_FROM_EMAIL,
+            to=[self.to_email],
+        )
+        if self.html_body:
+            message.attach_alternative(self.html_body, 'text/html')
+        return message
+
+    @classmethod
+    def status_counts(cls):
+        counts = {status: 0 for status, _ in cls.STATUS_CHOICES}
+        for row in cls.objects.order_by().values('status').annotate(n=models.Count('id')):
+            counts[row['status']] = row['n']
+        return counts
+
+
+class MailCounter(models.Model):
+    """
+    Send quotas and circuit-breaker state shared by every process that sends
+    mail (admissions.mailer). Counters move with conditional F() updates, so
+    concurrent workers can never push a quota past its limit.
+
+        day:<date> / minute:<epoch minute>   messages sent in that window
+        breaker                              consecutive transport failures;
+                                             `until` is when a pause ends
+    """
+    key = models.CharField(max_length=40, unique=True)
+    value = models.IntegerField(default=0)
+    # Epoch seconds: end of the quota window, or of the breaker pause
+    until = models.FloatField(default=0)
+
+    class Meta:
+        verbose_name = "Mail Counter"
+        verbose_name_plural = "Mail Counters"
+
+    def __str__(self):
+        return f"{self.key}: {self.value}"
+
+    @classmethod
+    def _ensure(cls, key, until=0):
+        cls.objects.bulk_create([cls(key=key, until=until)], ignore_conflicts=True)
+
+    @classmethod
+    def take(cls, key, amount, limit, until):
+        """Add `amount` to the window `key` unless that would pass `limit`. Returns True if it fit."""
+        cls._ensure(key, until)
+        return bool(cls.objects.filter(key=key, value__lte=limit - amount).update(value=F('value') + amount))
+
+    @classmethod
+    def take_up_to(cls, key, amount, limit, until):
+        """Add as much of `amount` to the window `key` as fits under `limit`. Returns the amount added."""
+        cls._ensure(key, until)
+        while True:
+            value = cls.objects.filter(key=key).values_list('value', flat=True).first() or 0
+            granted = min(amount, limit - value)
+            if granted <= 0:
+                return 0
+            # Only applies if no other worker moved the counter since it was read
+            if cls.objects.filter(key=key, value=value).update(value=F('value') + granted):
+                return granted
+
+    @classmethod
+    def refund(cls, key, amount):
+        """Give back `amount` taken from `key` for messages that were never sent."""
+        if amount > 0:
+            cls.objects.filter(key=key).update(value=F('value') - amount)
+
+    @classmethod
+    def add(cls, key, amount=1):
+        """Add `amount` to `key` and return the new value."""
+        cls._ensure(key)
+        cls.objects.filter(key=key).update(value=F('value') + amount)
+        return cls.objects.filter(key=key).values_list('value', flat=True).first() or 0
+
+    @classmethod
+    def read(cls, key):
+        """(value, until) for `key`, zeros when it does not exist."""
+        return cls.objects.filter(key=key).values_list('value', 'until').first() or (0, 0)
+
+    @classmethod
+    def purge_expired(cls, before):
+        """Drop quota windows that ended before `before` (epoch seconds)."""
+        cls.objects.filter(until__lt=before).exclude(key='breaker').delete()
+
+
+# -------------------------------------------------
+# 📢 Broadcast Jobs
+# -------------------------------------------------
+class BroadcastJob(models.Model):
+    """
+    One broadcast: who it goes to, how far it has got, and how it ended.
+    The audience is split into BroadcastChunk id ranges that workers process
+    in parallel; sent/failed are totals over all chunks, bumped per batch.
+    """
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_COMPLETED = 'completed'
+    STATUS_FAILED = 'failed'
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_COMPLETED, 'Completed'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+    # An unfinished job with no checkpoint for this long has probably lost its worker
+    STALL_SECONDS = 5 * 60
+
+    template = models.ForeignKey(MessageTemplate, on_delete=models.SET_NULL, null=True, related_name='jobs')
+    title = models.CharField(max_length=200)
+    segments = models.JSONField(default=dict, blank=True)
+    send_email = models.BooleanField(default=False)
+    send_inapp = models.BooleanField(default=True)
+    base_url = models.CharField(max_length=200, blank=True)
+    # The in-app copy, stored once and shared by every recipient
+    notification = models.OneToOneField(
+        'notifications.BroadcastNotification',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='job'
+    )
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True
+    )
+
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    total = models.PositiveIntegerField(default=0)
+    sent = models.PositiveIntegerField(default=0)
+    failed = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    # Touched by every checkpoint, so a stalled job is easy to spot
+    updated_at = models.DateTimeField(default=timezone.now)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Broadcast Job"
+        verbose_name_plural = "Broadcast Jobs"
+
+    def __str__(self):
+        return f"{self.title} ({self.status}, {self.sent}/{self.total})"
+
+    @property
+    def is_finished(self):
+        return self.status in (self.STATUS_COMPLETED, self.STATUS_FAILED)
+
+    @property
+    def is_stalled(self):
+        return not self.is_finished and (timezone.now() - self.updated_at).total_seconds() > self.STALL_SECONDS
+
+    def claim_resume(self):
+        """
+        Take a stalled job for resuming: touches updated_at only if nobody has
+        since (a checkpoint, or another resume). False when the job is not
+        stalled or was claimed first elsewhere.
+        """
+        if not self.is_stalled:
+            return False
+        now = timezone.now()
+        claimed = BroadcastJob.objects.filter(
+            id=self.id, updated_at=self.updated_at, status__in=[self.STATUS_QUEUED, self.STATUS_RUNNING]
+        ).update(updated_at=now)
+        if claimed:
+            self.updated_at = now
+        return bool(claimed)
+
+    def progress(self):
+        """The small dict the broadcast page polls."""
+        done = self.sent + self.failed
+        return {
+            'id': self.id,
+            'title': self.title,
+            'status': self.status,
+            'total': self.total,
+            'sent': self.sent,
+            'failed': self.failed,
+            'percent': round(100 * done / self.total) if self.total else (100 if self.is_finished else 0),
+            'updated_at': self.updated_at.isoformat(),
+        }
+
+
+class BroadcastChunk(models.Model):
+    """
+    An id range of a broadcast's audience. last_processed_id is the
+    checkpoint: everything up to it has been notified and queued, so a
+    retried or resumed chunk carries on after it.
+    """
+    job = models.ForeignKey(BroadcastJob, on_delete=models.CASCADE, related_name='chunks')
+    first_id = models.PositiveIntegerField()
+    last_id = models.PositiveIntegerField()
+    last_processed_id = models.PositiveIntegerField(null=True, blank=True)
+    total = models.PositiveIntegerField(default=0)
+    done = models.BooleanField(default=False)
+
+    class Meta:
+        ordering = ['job', 'first_id']
+
+    def __str__(self):
+        return f"Job {self.job_id}: {self.first_id}-{self.last_id} ({'done' if self.done else self.last_processed_id})"
@@ -0,0 +1,186 @@
+"""
+Durable email outbox.
+
+Callers queue emails with queue_emails(), which only inserts EmailOutbox
+rows (one bulk insert) and asks for a drain once the transaction commits.
+drain_outbox() claims due rows in batches, sends them through the mail
+dispatcher and records each outcome:
+
+  * sent             -> status 'sent'
+  * failed           -> 'retrying', due again after EMAIL_OUTBOX_BACKOFF * 2**(attempts-1)
+                        seconds (capped at EMAIL_OUTBOX_MAX_BACKOFF)
+  * failed too often -> 'dead' after EMAIL_OUTBOX_MAX_ATTEMPTS attempts
+  * not attempted    -> back to 'pending' without using an attempt, due when
+                        the daily quota resets or the SMTP circuit breaker closes
+
+Urgent emails (verification codes) are also sent right away by their own
+task, so they never wait behind a large broadcast.
+
+Claimed rows are leased ('sending' until now + CLAIM_LEASE), so rows held by
+a worker that died are picked up again once the lease runs out.
+"""
+import logging
+import random
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .mailer import MailDeferred, deliver
+from .models import EmailOutbox
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_BATCH_SIZE = 100
+CLAIM_LEASE = timedelta(minutes=10)
+
+
+def max_attempts():
+    return getattr(settings, 'EMAIL_OUTBOX_MAX_ATTEMPTS', None) or 6
+
+
+def backoff(attempts):
+    """Delay before the next attempt, with a little jitter so retries spread out."""
+    base = getattr(settings, 'EMAIL_OUTBOX_BACKOFF', None) or 60
+    cap = getattr(settings, 'EMAIL_OUTBOX_MAX_BACKOFF', None) or 6 * 60 * 60
+    delay = min(cap, base * 2 ** max(attempts - 1, 0))
+    return timedelta(seconds=delay * random.uniform(0.9, 1.1))
+
+
+def queue_emails(entries, category='', urgent=False):
+    """
+    Insert outbox rows for `entries`, an iterable of (user_id, message), and
+    schedule delivery after commit: a drain, or for `urgent` rows a send of
+    just those rows. Returns the rows.
+    """
+    rows = [
+        EmailOutbox.from_message(message, address, user_id=user_id, category=category)
+        for user_id, message in entries
+        for address in message.to
+    ]
+    EmailOutbox.objects.bulk_create(rows, batch_size=500)
+    if rows and urgent:
+        ids = [row.id for row in rows]
+        transaction.on_commit(lambda: _run_in_background_task('send_outbox_emails_task', ids))
+    elif rows:
+        transaction.on_commit(request_drain)
+    return rows
+
+
+def _run_in_background_task(task_name, *args):
+    """Queue a task; without a broker, run it on a thread (never inline in a request)."""
+    from . import tasks
+
+    task = getattr(tasks, task_name)
+    try:
+        task.delay(*args)
+    except Exception:
+        logger.warning(f"Could not queue {task_name}, running it in a thread", exc_info=True)
+        tasks.run_in_background(task)(*args)
+
+
+def request_drain():
+    """Ask a worker to drain the outbox."""
+    _run_in_background_task('drain_email_outbox_task')
+
+
+def _due_rows(now):
+    # For 'sending' rows next_attempt_at is the lease expiry
+    return EmailOutbox.objects.filter(
+        status__in=[EmailOutbox.STATUS_PENDING, EmailOutbox.STATUS_RETRYING, EmailOutbox.STATUS_SENDING],
+        next_attempt_at__lte=now,
+    )
+
+
+def claim_batch(batch_size=OUTBOX_BATCH_SIZE, ids=None):
+    """Lease up to `batch_size` due rows (optionally only `ids`) to this worker and return them."""
+    now = timezone.now()
+    due = _due_rows(now)
+    if ids is not None:
+        due = due.filter(id__in=ids)
+    with transaction.atomic():
+        ids = list(
+            due.select_for_update(skip_locked=True)
+            .order_by('next_attempt_at', 'id')
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not ids:
+            return []
+        EmailOutbox.objects.filter(id__in=ids).update(
+            status=EmailOutbox.STATUS_SENDING, next_attempt_at=now + CLAIM_LEASE
+        )
+    return list(EmailOutbox.objects.filter(id__in=ids).order_by('id'))
+
+
+def record_results(rows, results):
+    """Store each row's outcome; `results` holds None or the exception, per row."""
+    now = timezone.now()
+    counts = {'sent': 0, 'retrying': 0, 'dead': 0, 'deferred': 0}
+    sent_ids, deferred, failed = [], [], []
+
+    for row, error in zip(rows, results):
+        if error is None:
+            sent_ids.append(row.id)
+        elif isinstance(error, MailDeferred):
+            row.status = EmailOutbox.STATUS_RETRYING if row.attempts else EmailOutbox.STATUS_PENDING
+            row.next_attempt_at = datetime.fromtimestamp(error.retry_at, tz=dt_timezone.utc)
+            deferred.append(row)
+        else:
+            row.attempts += 1
+            row.last_error = f"{type(error).__name__}: {error}"[:2000]
+            if row.attempts >= max_attempts():
+                row.status = EmailOutbox.STATUS_DEAD
+                counts['dead'] += 1
+                logger.error(f"Outbox email {row.id} to {row.to_email} dead after {row.attempts} attempts: {row.last_error}")
+            else:
+                row.status = EmailOutbox.STATUS_RETRYING
+                row.next_attempt_at = now + backoff(row.attempts)
+                counts['retrying'] += 1
+            failed.append(row)
+
+    if sent_ids:
+        EmailOutbox.objects.filter(id__in=sent_ids).update(
+            status=EmailOutbox.STATUS_SENT, sent_at=now, last_error=''
+        )
+    if failed or deferred:
+        EmailOutbox.objects.bulk_update(failed + deferred, ['status', 'attempts', 'last_error', 'next_attempt_at'])
+
+    counts['sent'] = len(sent_ids)
+    counts['deferred'] = len(deferred)
+    return counts
+
+
+def drain_outbox(batch_size=OUTBOX_BATCH_SIZE, max_batches=None):
+    """
+    Send due outbox emails until none are left (or `max_batches` is reached).
+    Returns totals per outcome and the time taken.
+    """
+    started = time.monotonic()
+    totals = {'sent': 0, 'retrying': 0, 'dead': 0, 'deferred': 0, 'batches': 0}
+
+    while max_batches is None or totals['batches'] < max_batches:
+        rows = claim_batch(batch_size)
+        if not rows:
+            break
+        results = deliver([row.to_message() for row in rows])
+        for key, value in record_results(rows, results).items():
+            totals[key] += value
+        totals['batches'] += 1
+        if totals['deferred']:
+            # Quota used up or circuit open: nothing else can go out now
+            break
+
+    totals['seconds'] = round(time.monotonic() - started, 2)
+    if totals['batches']:
+        logger.info(f"Outbox drain: {totals}")
+    return totals
+
+
+def send_outbox_emails(ids):
+    """Send the given rows now (if still due); used for urgent emails."""
+    rows = claim_batch(len(ids), ids=ids)
+    if not rows:
+        return {'sent': 0, 'retrying': 0, 'dead': 0, 'deferred': 0}
+    return record_results(rows, deliver([row.to_message() for row in rows]))
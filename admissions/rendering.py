@@ -0,0 +1,219 @@
+"""
+Roll slip rendering and cache.
+
+Slips are rendered lazily on first download and stored under a hash of
+everything drawn on them (see roll_slip_name), so any edit to the
+applicant or the layout points to a new file and the stale one is never
+served.
+
+Slip rendering is CPU-bound reportlab work, so bulk (re)rendering is
+fanned out to a process pool sized to the machine. Workers never touch
+the database: the parent reads the fields a slip needs, workers render
+and write the PDF atomically, and the parent records the file names with
+one bulk_update per chunk.
+"""
+import hashlib
+import logging
+import multiprocessing
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+from django.urls import reverse
+
+from .delivery import make_download_token
+from .models import Application
+from .utils import ROLL_SLIP_INSTRUCTIONS, generate_roll_number_pdf
+
+logger = logging.getLogger(__name__)
+
+# Everything generate_roll_number_pdf reads, plus the current file name
+SLIP_FIELDS = (
+    'id', 'name', 'father_name', 'category', 'test_center', 'dob',
+    'class_name', 'roll_number', 'photo', 'photo_print', 'roll_slip',
+)
+RENDER_CHUNK_SIZE = 200
+
+# Signed roll slip links (see signed_roll_slip_path)
+ROLL_SLIP_LINK_SALT = 'admissions.roll-slip-link'
+
+
+# Bump when the slip layout in admissions.utils changes in a way the
+# instruction text does not capture (header, colours, table, ...).
+ROLL_SLIP_LAYOUT_VERSION = 1
+
+
+def default_workers():
+    return getattr(settings, 'ROLL_SLIP_RENDER_WORKERS', None) or os.cpu_count() or 1
+
+
+def write_file_atomic(path, data):
+    """Write to a temp file in the same directory and rename it into place."""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def roll_slip_name(application):
+    """
+    Storage name of the slip for the application's current details:
+    roll_slips/<hash>.pdf, where the hash covers every field drawn on the
+    slip, the photo file and the layout.
+    """
+    class_name = 'XI' if application.class_name == 'XI' else 'VIII'
+    parts = [
+        f"v{ROLL_SLIP_LAYOUT_VERSION}",
+        application.roll_number or '',
+        application.name or '',
+        application.father_name or '',
+        application.category or '',
+        application.test_center or '',
+        application.dob.isoformat() if application.dob else '',
+        class_name,
+        (application.photo_print or application.photo).name or '',
+        *ROLL_SLIP_INSTRUCTIONS[class_name],
+    ]
+    digest = hashlib.sha256('\x1f'.join(parts).encode('utf-8')).hexdigest()[:32]
+    return f"roll_slips/{digest}.pdf"
+
+
+def _replace_roll_slip(app_id, old_name, name):
+    if old_name == name:
+        return
+    Application.objects.filter(id=app_id).update(roll_slip=name)
+    # The old slip belonged to outdated details; nothing else points at it
+    if old_name:
+        old_path = os.path.join(settings.MEDIA_ROOT, old_name)
+        if os.path.exists(old_path):
+            os.remove(old_path)
+
+
+def ensure_roll_slip(application):
+    """
+    Return the storage name of an up-to-date slip, rendering it only if no
+    slip exists yet for the application's current details.
+    """
+    name = roll_slip_name(application)
+    path = os.path.join(settings.MEDIA_ROOT, name)
+    if not os.path.exists(path):
+        write_file_atomic(path, generate_roll_number_pdf(application))
+
+    _replace_roll_slip(application.pk, application.roll_slip.name, name)
+    application.roll_slip.name = name
+    return name
+
+
+def roll_slip_link_max_age():
+    # Emailed links stay valid this long (seconds); defaults to 60 days
+    return getattr(settings, 'ROLL_SLIP_LINK_MAX_AGE', None) or 60 * 60 * 24 * 60
+
+
+def signed_roll_slip_path(application):
+    """
+    URL path of a signed, expiring download link for the application's slip.
+    The token names the content-addressed slip for the current details, so
+    the link keeps working without a lookup once that slip has been rendered
+    (it does not need to exist yet).
+    """
+    token = make_download_token(
+        roll_slip_name(application),
+        f"RollSlip_{application.roll_number}.pdf",
+        roll_slip_link_max_age(),
+        ROLL_SLIP_LINK_SALT,
+        a=application.pk,
+    )
+    return reverse('admissions:download_roll_slip_signed', args=[token])
+
+
+def render_slip_file(values):
+    """
+    Render one slip from a dict of SLIP_FIELDS and write it under MEDIA_ROOT.
+    Returns (id, relative name, error).
+    """
+    try:
+        app = Application(**values)  # unsaved copy, only used for drawing
+        name = roll_slip_name(app)
+        write_file_atomic(os.path.join(settings.MEDIA_ROOT, name), generate_roll_number_pdf(app))
+
+        # Remove an older slip stored under a different name
+        old_name = values.get('roll_slip')
+        if old_name and old_name != name:
+            old_path = os.path.join(settings.MEDIA_ROOT, old_name)
+            if os.path.exists(old_path):
+                os.remove(old_path)
+        return values['id'], name, None
+    except Exception as e:
+        return values['id'], None, str(e)
+
+
+def _init_worker():
+    # Forked workers inherit a configured Django; spawned ones need setup
+    django.setup()
+
+
+def render_roll_slips(queryset, workers=None, chunk_size=RENDER_CHUNK_SIZE, on_chunk=None):
+    """
+    Render slips for every application in `queryset` (in id order).
+
+    `on_chunk(last_id, rendered, failed)` is called after each chunk has been
+    written and recorded, so callers can checkpoint progress.
+    Returns (rendered, failed).
+    """
+    workers = workers or default_workers()
+    # Celery prefork children are daemonic and may not start their own pool;
+    # there the task itself is the unit of parallelism.
+    if multiprocessing.current_process().daemon:
+        workers = 1
+
+    rows = queryset.exclude(roll_number__isnull=True).order_by('id').values(*SLIP_FIELDS)
+    rendered, failed = 0, 0
+
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) if workers > 1 else None
+    try:
+        chunk = []
+        for row in rows.iterator(chunk_size=chunk_size):
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                done, errors = _render_chunk(chunk, pool)
+                rendered, failed = rendered + done, failed + errors
+                if on_chunk:
+                    on_chunk(chunk[-1]['id'], rendered, failed)
+                chunk = []
+        if chunk:
+            done, errors = _render_chunk(chunk, pool)
+            rendered, failed = rendered + done, failed + errors
+            if on_chunk:
+                on_chunk(chunk[-1]['id'], rendered, failed)
+    finally:
+        if pool:
+            pool.shutdown()
+
+    return rendered, failed
+
+
+def _render_chunk(chunk, pool):
+    results = pool.map(render_slip_file, chunk, chunksize=8) if pool else map(render_slip_file, chunk)
+
+    updated, failed = [], 0
+    for app_id, name, error in results:
+        if error:
+            failed += 1
+            logger.error(f"PDF generation error for {app_id}: {error}")
+        else:
+            updated.append(Application(id=app_id, roll_slip=name))
+
+    Application.objects.bulk_update(updated, ['roll_slip'])
+    return len(updated), failed
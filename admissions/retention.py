@@ -0,0 +1,93 @@
+"""
+Retention: delete rows nobody needs any more.
+
+    read notifications          older than RETENTION_NOTIFICATION_DAYS
+    read broadcast receipts     of broadcasts older than RETENTION_NOTIFICATION_DAYS
+                                (and those broadcasts once no receipt is left)
+    verification codes          used, or unused and older than RETENTION_VERIFICATION_DAYS
+    sent / dead outbox emails   older than RETENTION_OUTBOX_DAYS
+    finished broadcast jobs     older than RETENTION_BROADCAST_JOB_DAYS (with their chunks)
+
+Unread notifications are never removed, so unread counters stay correct.
+Rows are deleted in id windows of RETENTION_BATCH_SIZE, each in its own
+short transaction, so no table is locked for long and the job can be
+stopped at any point.
+"""
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Min, Q
+from django.utils import timezone
+
+from accounts.models import EmailVerification
+from notifications.models import BroadcastNotification, BroadcastReceipt, Notification
+
+from .models import BroadcastJob, EmailOutbox
+
+RETENTION_BATCH_SIZE = 5000
+
+
+def _days(name, default):
+    return timedelta(days=getattr(settings, name, default))
+
+
+def retention_querysets(now=None):
+    """(label, queryset of rows to delete) in deletion order."""
+    now = now or timezone.now()
+    notification_cutoff = now - _days('RETENTION_NOTIFICATION_DAYS', 90)
+    return [
+        ('read notifications',
+         Notification.objects.filter(is_read=True, created_at__lt=notification_cutoff)),
+        ('read broadcast receipts',
+         BroadcastReceipt.objects.filter(is_read=True, broadcast__created_at__lt=notification_cutoff)),
+        ('broadcast notifications',
+         BroadcastNotification.objects.filter(created_at__lt=notification_cutoff, receipts__isnull=True)),
+        ('verification codes',
+         EmailVerification.objects.filter(
+             Q(is_used=True) | Q(created_at__lt=now - _days('RETENTION_VERIFICATION_DAYS', 7))
+         )),
+        ('outbox emails',
+         EmailOutbox.objects.filter(
+             status__in=[EmailOutbox.STATUS_SENT, EmailOutbox.STATUS_DEAD],
+             created_at__lt=now - _days('RETENTION_OUTBOX_DAYS', 30),
+         )),
+        ('broadcast jobs',
+         BroadcastJob.objects.filter(
+             status__in=[BroadcastJob.STATUS_COMPLETED, BroadcastJob.STATUS_FAILED],
+             created_at__lt=now - _days('RETENTION_BROADCAST_JOB_DAYS', 180),
+         )),
+    ]
+
+
+def delete_in_batches(queryset, batch_size=RETENTION_BATCH_SIZE):
+    """Delete `queryset` one id window at a time. Returns the number of rows deleted."""
+    bounds = queryset.aggregate(low=Min('id'), high=Max('id'))
+    if bounds['low'] is None:
+        return 0
+    removed = 0
+    for start in range(bounds['low'], bounds['high'] + 1, batch_size):
+        # Re-select ids inside the window: a subquery keeps the DELETE on the primary key
+        window = queryset.filter(id__gte=start, id__lt=start + batch_size)
+        with transaction.atomic():
+            deleted, per_model = queryset.model.objects.filter(id__in=window.values('id')).delete()
+        removed += per_model.get(queryset.model._meta.label, 0)
+    return removed
+
+
+def run_retention(batch_size=RETENTION_BATCH_SIZE, dry_run=False):
+    """
+    Apply every retention rule. Returns {label: {'rows': n, 'seconds': s}}
+    plus a 'total' entry; with dry_run the rows are only counted.
+    """
+    report, started = {}, time.monotonic()
+    for label, queryset in retention_querysets():
+        began = time.monotonic()
+        rows = queryset.count() if dry_run else delete_in_batches(queryset, batch_size)
+        report[label] = {'rows': rows, 'seconds': round(time.monotonic() - began, 3)}
+    report['total'] = {
+        'rows': sum(entry['rows'] for entry in report.values()),
+        'seconds': round(time.monotonic() - started, 3),
+    }
+    return report
@@ -0,0 +1,299 @@
+"""
+Applicant search for the admin portal.
+
+Every application carries a search document (Application.search_document):
+its name, father's name, roll number, Form-B and father's CNIC, lowercased
+and joined, plus the identifiers as digits only. Next to it are indexed
+digits-only copies of the father's CNIC, Form-B, mobile number and roll
+number (<field>_digits). Application.save() and bulk verify keep all of
+them current; after changes that bypass both (queryset.update, raw
+imports) run `manage.py rebuild_search_index`.
+
+search_applications() first checks whether the query is a whole
+identifier, typed with or without dashes or spaces:
+
+    13 digits                       father's CNIC or Form-B
+    03xxxxxxxxx / +92 3xx xxxxxxx   mobile number
+    8-0041, 11-0003, 110003         roll number
+
+and answers those with an exact lookup on the matching _digits index
+(roll numbers fall back to the text search when nothing matches, as they
+are often typed in part). Anything else matches every word of the query
+as a substring of the document, through an index instead of a scan:
+
+  * PostgreSQL: a pg_trgm GIN index on search_document (migration 0020)
+    serves the LIKE '%word%' filters; results are ranked by
+    word_similarity() to the whole query.
+  * SQLite: an FTS5 table with the trigram tokenizer
+    (admissions_application_fts), kept in sync by triggers; results are
+    ranked by bm25().
+  * Anything else: LIKE filters, unranked.
+
+Words shorter than three characters cannot use a trigram index and would
+match nearly every document (digits especially), so they only match the
+start of a word in the applicant's or father's name. An application whose
+name is the whole query always ranks first.
+"""
+import logging
+import re
+
+from django.db import connection
+from django.db.models import Case, F, FloatField, Func, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+
+from .models import Application
+
+logger = logging.getLogger(__name__)
+
+SEARCH_FIELDS = ('name', 'father_name', 'roll_number', 'form_b', 'father_cnic')
+NAME_FIELDS = ('name', 'father_name')
+MIN_INDEXED_LENGTH = 3
+DIGIT_FIELDS = ('father_cnic', 'form_b', 'mobile_no', 'roll_number')
+
+IDENTIFIER_RE = re.compile(r'\+?[\d\s-]+')
+ROLL_NUMBER_RE = re.compile(r'(8|11)-?\d{4,}')
+
+FTS_TABLE = 'admissions_application_fts'
+
+
+def digits_only(value, field=None):
+    """The digits of an identifier; mobile numbers in national form (03001234567)."""
+    digits = re.sub(r'\D', '', str(value or ''))
+    if field == 'mobile_no' and digits.startswith('92') and len(digits) == 12:
+        digits = '0' + digits[2:]
+    return digits
+
+
+def build_search_document(application):
+    values = [getattr(application, field, None) for field in SEARCH_FIELDS]
+    # Digits-only identifiers too, so partial numbers typed without dashes still match
+    values += [digits_only(getattr(application, field, None)) for field in ('father_cnic', 'form_b')]
+    words = []
+    for value in values:
+        for word in str(value or '').lower().split():
+            if word not in words:
+                words.append(word)
+    return ' '.join(words)
+
+
+def refresh_search_columns(application, update_fields=None):
+    """
+    Recompute the search columns that depend on `update_fields` (all of them
+    when None). Returns the names of the columns it set.
+    """
+    changed = None if update_fields is None else set(update_fields)
+    refreshed = []
+    if changed is None or changed & set(SEARCH_FIELDS):
+        application.search_document = build_search_document(application)
+        refreshed.append('search_document')
+    for field in DIGIT_FIELDS:
+        if changed is None or field in changed:
+            setattr(application, f'{field}_digits', digits_only(getattr(application, field, None), field))
+            refreshed.append(f'{field}_digits')
+    return refreshed
+
+
+def search_terms(query):
+    return query.lower().split()
+
+
+def identifier_lookup(query):
+    """
+    (Q on the _digits columns, is_partial) when `query` is shaped like a
+    whole identifier, else (None, False).
+    """
+    query = query.strip()
+    if not IDENTIFIER_RE.fullmatch(query):
+        return None, False
+    digits = digits_only(query)
+    if len(digits) == 13:
+        return Q(father_cnic_digits=digits) | Q(form_b_digits=digits), False
+    mobile = digits_only(query, 'mobile_no')
+    if len(mobile) == 11 and mobile.startswith('03'):
+        return Q(mobile_no_digits=mobile), False
+    if ROLL_NUMBER_RE.fullmatch(re.sub(r'\s', '', query)):
+        return Q(roll_number_digits=digits), True
+    return None, False
+
+
+# --------------------------
+# Querying
+# --------------------------
+class WordSimilarity(Func):
+    function = 'word_similarity'
+    output_field = FloatField()
+
+
+def search_applications(queryset, query):
+    """
+    Filter `queryset` (Applications) to those matching every word of
+    `query`, best matches first (newest first where there is no ranking).
+    """
+    terms = search_terms(query)
+    if not terms:
+        return queryset
+
+    lookup, partial = identifier_lookup(query)
+    if lookup is not None:
+        exact = queryset.filter(lookup).order_by('-submission_date')
+        if not partial or exact.exists():
+            return exact
+
+    indexed = [term for term in terms if len(term) >= MIN_INDEXED_LENGTH]
+    for term in terms:
+        if len(term) < MIN_INDEXED_LENGTH:
+            queryset = queryset.filter(_name_word_q(term))
+    queryset = queryset.annotate(
+        exact_name=Case(When(name__iexact=' '.join(terms), then=1), default=0, output_field=IntegerField())
+    )
+    if not indexed:
+        return queryset.order_by('-exact_name', '-submission_date')
+
+    vendor = connection.vendor
+    if vendor == 'sqlite' and fts_available():
+        return _search_sqlite(queryset, indexed)
+
+    for term in indexed:
+        # The document is lowercase, so a case-sensitive LIKE is exact and can use the trigram index
+        queryset = queryset.filter(search_document__contains=term)
+    if vendor == 'postgresql':
+        queryset = queryset.annotate(
+            search_rank=WordSimilarity(Value(' '.join(terms)), F('search_document'))
+        ).order_by('-exact_name', '-search_rank', '-submission_date')
+        return queryset
+    return queryset.order_by('-exact_name', '-submission_date')
+
+
+def _name_word_q(term):
+    """`term` at the start of a word of the applicant's or father's name."""
+    q = Q()
+    for field in NAME_FIELDS:
+        q |= Q(**{f'{field}__istartswith': term}) | Q(**{f'{field}__icontains': f' {term}'})
+    return q
+
+
+def _search_sqlite(queryset, terms):
+    match = ' AND '.join('"{}"'.format(term.replace('"', '""')) for term in terms)
+    table = Application._meta.db_table
+    # LIMIT -1 keeps SQLite from flattening the ranked matches into the
+    # correlated lookup: they are computed once and indexed, not once per row
+    return queryset.filter(
+        id__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match])
+    ).annotate(
+        search_rank=RawSQL(
+            f"SELECT rank FROM (SELECT rowid AS match_id, bm25({FTS_TABLE}) AS rank FROM {FTS_TABLE} "
+            f"WHERE {FTS_TABLE} MATCH %s LIMIT -1) WHERE match_id = {table}.id",
+            [match],
+            output_field=FloatField(),
+        )
+    ).order_by('-exact_name', 'search_rank', '-submission_date')
+
+
+# --------------------------
+# SQLite FTS5 index
+# --------------------------
+_fts_available = None
+
+
+def fts_available():
+    """True when the SQLite FTS5 table exists (checked once per process)."""
+    global _fts_available
+    if _fts_available is None:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s", [FTS_TABLE])
+            _fts_available = cursor.fetchone() is not None
+    return _fts_available
+
+
+def install_sqlite_fts(using_connection=None):
+    """
+    Create the FTS5 table and its sync triggers if missing. Runs after every
+    migrate: SQLite migrations that rebuild admissions_application drop the
+    triggers, so whenever they had to be recreated the index is rebuilt too.
+    """
+    global _fts_available
+    conn = using_connection or connection
+    if conn.vendor != 'sqlite':
+        return False
+    table = Application._meta.db_table
+    triggers = {
+        f'{FTS_TABLE}_ai': f"""
+            CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON {table} BEGIN
+                INSERT INTO {FTS_TABLE}(rowid, search_document) VALUES (new.id, new.search_document);
+            END""",
+        f'{FTS_TABLE}_ad': f"""
+            CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON {table} BEGIN
+                INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_document)
+                VALUES ('delete', old.id, old.search_document);
+            END""",
+        f'{FTS_TABLE}_au': f"""
+            CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE OF search_document ON {table} BEGIN
+                INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, search_document)
+                VALUES ('delete', old.id, old.search_document);
+                INSERT INTO {FTS_TABLE}(rowid, search_document) VALUES (new.id, new.search_document);
+            END""",
+    }
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger') AND name LIKE %s",
+                       [f'{FTS_TABLE}%'])
+        existing = {row[0] for row in cursor.fetchall()}
+        if table not in conn.introspection.table_names(cursor) or 'search_document' not in {
+            column.name for column in conn.introspection.get_table_description(cursor, table)
+        }:
+            # Migrated back past 0020: the index has nothing to index
+            if FTS_TABLE in existing:
+                cursor.execute(f"DROP TABLE {FTS_TABLE}")
+            _fts_available = False
+            return False
+        try:
+            if FTS_TABLE not in existing:
+                cursor.execute(
+                    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+                    f"search_document, content='{table}', content_rowid='id', tokenize='trigram')"
+                )
+        except Exception:
+            # SQLite built without FTS5 / the trigram tokenizer (3.34+): LIKE search still works
+            logger.warning("SQLite FTS5 trigram search unavailable, using LIKE", exc_info=True)
+            return False
+        missing = [name for name in triggers if name not in existing]
+        for name in missing:
+            cursor.execute(triggers[name])
+        if missing:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    _fts_available = True
+    return True
+
+
+# --------------------------
+# Maintenance
+# --------------------------
+def rebuild_search_documents(batch_size=2000):
+    """
+    Recompute every application's search document and _digits columns
+    (also the backfill after they were added). Returns the number of
+    applications changed.
+    """
+    columns = ['search_document'] + [f'{field}_digits' for field in DIGIT_FIELDS]
+    sources = set(SEARCH_FIELDS) | set(DIGIT_FIELDS)
+    changed = 0
+    last_id = 0
+    while True:
+        batch = list(
+            Application.objects.filter(id__gt=last_id).order_by('id')
+            .only('id', *columns, *sources)[:batch_size]
+        )
+        if not batch:
+            break
+        last_id = batch[-1].id
+        stale = []
+        for application in batch:
+            before = [getattr(application, column) for column in columns]
+            refresh_search_columns(application)
+            if [getattr(application, column) for column in columns] != before:
+                stale.append(application)
+        Application.objects.bulk_update(stale, columns)
+        changed += len(stale)
+    if connection.vendor == 'sqlite' and install_sqlite_fts():
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+    return changed
@@ -1,14 +1,25 @@
 import threading
+import string
+from concurrent.futures import ThreadPoolExecutor
 from django.core.mail import EmailMessage
 import os, base64
 from django.conf import settings
-from django.core.mail import send_mail
-from django.template.loader import render_to_string
+from django.core.mail import EmailMultiAlternatives
+from django.db import connection as db_connection, transaction
+from django.db.models import F
+from django.template.loader import get_template
+from django.templatetags.static import static
+from django.utils import timezone
 from django.utils.html import strip_tags
-from .models import MessageTemplate, Application
-from notifications.models import Notification   # adjust import path if different
-from .utils import generate_roll_number_pdf
-from django.core.files.base import ContentFile
+from .models import MessageTemplate, Application, RollNumberSequence, BroadcastJob, BroadcastChunk
+from notifications.models import Notification, BroadcastNotification, BroadcastReceipt   # adjust import path if different
+from .utils import build_photo_derivatives
+from .rendering import signed_roll_slip_path
+from .outbox import drain_outbox, queue_emails, send_outbox_emails
+from .audience import audience_queryset
+from .retention import run_retention
+from .search import refresh_search_columns
+from notifications.live import publish_events, status_event
 import logging
 
  # reuse your existing function
@@ -19,7 +30,7 @@ logger = logging.getLogger(__name__)
 
 # Try importing Celery's shared_task decorator
 try:
-    from celery import shared_task
+    from celery import group, shared_task
     CELERY_AVAILABLE = True
 except ImportError:
     CELERY_AVAILABLE = False
@@ -27,8 +38,15 @@ except ImportError:
 
 # ✅ Thread-based background runner (fallback)
 def run_in_background(func):
+    def run(*args, **kwargs):
+        try:
+            func(*args, **kwargs)
+        finally:
+            # The thread opened its own DB connection; nothing else will close it
+            db_connection.close()
+
     def wrapper(*args, **kwargs):
-        thread = threading.Thread(target=func, args=args, kwargs=kwargs, daemon=True)
+        thread = threading.Thread(target=run, args=args, kwargs=kwargs, daemon=True)
         thread.start()
     return wrapper
 
@@ -44,142 +62,470 @@ def background_task(func):
 # ==========================================
 # 📤 Task 1: Broadcast Messages (email + in-app)
 # ==========================================
+# Every broadcast is a BroadcastJob. broadcast_job_task splits its audience
+# into BroadcastChunk id ranges of BROADCAST_CHUNK_SIZE applications and
+# fans the unfinished ones out as a Celery group of broadcast_chunk_task (or
+# over a local thread pool without a broker). A chunk reads only the columns
+# the template needs and works in batches of BROADCAST_BATCH_SIZE: each
+# batch bulk_creates its receipts for the job's shared BroadcastNotification
+# (the in-app copy is stored once), queues its emails in the outbox and
+# moves the chunk's checkpoint in one transaction, so a retried or resumed
+# chunk never notifies anyone twice.
+BROADCAST_CHUNK_SIZE = 1000
+BROADCAST_BATCH_SIZE = 200
+BROADCAST_LOCAL_WORKERS = 4
+BROADCAST_CHUNK_RETRIES = 3
+
+# Placeholders a template body may use -> (column, display choices)
+BROADCAST_FIELDS = {
+    'name': ('name', None),
+    'father_name': ('father_name', None),
+    'roll_number': ('roll_number', None),
+    'test_center': ('test_center', dict(Application.TEST_CENTERS)),
+    'category': ('category', dict(Application.CATEGORY_CHOICES)),
+    'entry': ('entry', None),
+}
+
+
+def broadcast_placeholders(body):
+    """Names of the {placeholders} used in a template body."""
+    return {field for _, field, _, _ in string.Formatter().parse(body) if field}
+
+
+def broadcast_audience(target='all'):
+    """
+    Applications a broadcast goes to: `target` is a segments dict (see
+    admissions.audience), or 'all' / a category code as sent by older callers.
+    """
+    if isinstance(target, dict):
+        return audience_queryset(target)
+    if target and target != 'all':
+        return audience_queryset({'category': [target]})
+    return audience_queryset()
+
+
+def broadcast_id_ranges(queryset, size=BROADCAST_CHUNK_SIZE):
+    """Yield (first_id, last_id, count) ranges of `size` rows covering `queryset`."""
+    first = last = None
+    count = 0
+    for app_id in queryset.order_by('id').values_list('id', flat=True).iterator(chunk_size=5000):
+        first = app_id if first is None else first
+        last = app_id
+        count += 1
+        if count == size:
+            yield first, last, count
+            first, count = None, 0
+    if first is not None:
+        yield first, last, count
+
+
+_logo_data_uri = None
+
+
+def broadcast_logo_url(base_url=None):
+    """Absolute URL of the logo, or (without a base URL) the logo inlined as a data URI."""
+    global _logo_data_uri
+    if base_url:
+        return f"{base_url}{static('images/logo.png')}"
+    if _logo_data_uri is None:
+        logo_path = os.path.join(settings.BASE_DIR, 'static', 'images', 'logo.png')
+        try:
+            with open(logo_path, 'rb') as f:
+                _logo_data_uri = 'data:image/png;base64,' + base64.b64encode(f.read()).decode()
+        except OSError:
+            _logo_data_uri = ''
+    return _logo_data_uri
+
+
+def create_broadcast_job(template, send_email=True, send_inapp=True, target='all', base_url='', user=None):
+    """Record a broadcast; start it with start_broadcast_job()."""
+    segments = target if isinstance(target, dict) else ({} if target in (None, '', 'all') else {'category': [target]})
+    return BroadcastJob.objects.create(
+        template=template,
+        title=template.title,
+        segments=segments,
+        send_email=send_email,
+        send_inapp=send_inapp,
+        base_url=base_url or '',
+        created_by=user,
+    )
+
+
+def start_broadcast_job(job):
+    """Queue a new or interrupted job; it carries on from its checkpoints."""
+    try:
+        broadcast_job_task.delay(job.id)
+    except Exception:
+        logger.warning(f"Could not queue broadcast job {job.id}, running it in a thread", exc_info=True)
+        run_in_background(broadcast_job_task)(job.id)
+
+
 @shared_task
-def broadcast_message_task(template_id, send_email=True, send_inapp=True, target='all'):
+def broadcast_message_task(template_id, send_email=True, send_inapp=True, target='all', base_url=None):
+    """Create and run a broadcast job (kept for callers that predate BroadcastJob)."""
     try:
         template = MessageTemplate.objects.get(id=template_id)
     except MessageTemplate.DoesNotExist:
         return {'error': 'Template not found'}
+    job = create_broadcast_job(template, send_email, send_inapp, target, base_url)
+    return broadcast_job_task(job.id)
 
-    apps_qs = Application.objects.select_related('user').all()  # adjust target filtering if needed
 
-    # prepare base64 logo once
-    logo_path = os.path.join(settings.BASE_DIR, 'static', 'images', 'logo.png')
-    logo_data_uri = None
+@shared_task
+def broadcast_job_task(job_id):
+    job = BroadcastJob.objects.select_related('template').filter(id=job_id).first()
+    if job is None or job.is_finished:
+        return {'error': 'Job not found or already finished'}
+    if job.template is None:
+        return _fail_job(job, 'Template not found')
+
+    unknown = broadcast_placeholders(job.template.body) - set(BROADCAST_FIELDS)
+    if unknown:
+        return _fail_job(job, f"Unknown placeholders: {', '.join(sorted(unknown))}")
+
+    with transaction.atomic():
+        job = BroadcastJob.objects.select_for_update().get(id=job_id)
+        if not job.chunks.exists():
+            # First run: fix the audience as it stands now
+            chunks = [
+                BroadcastChunk(job=job, first_id=first, last_id=last, total=count)
+                for first, last, count in broadcast_id_ranges(broadcast_audience(job.segments))
+            ]
+            BroadcastChunk.objects.bulk_create(chunks, batch_size=500)
+            job.total = sum(chunk.total for chunk in chunks)
+            if job.send_inapp:
+                job.notification = BroadcastNotification.objects.create(
+                    title=job.template.title, message=job.template.body
+                )
+        now = timezone.now()
+        job.status = BroadcastJob.STATUS_RUNNING
+        job.started_at = job.started_at or now
+        job.updated_at = now
+        job.save(update_fields=['total', 'notification', 'status', 'started_at', 'updated_at'])
+
+    chunk_ids = list(job.chunks.filter(done=False).values_list('id', flat=True))
+    if not chunk_ids:
+        _finish_job_if_done(job.id)
+        return job.progress()
+
+    if CELERY_AVAILABLE:
+        try:
+            group(broadcast_chunk_task.s(chunk_id) for chunk_id in chunk_ids).apply_async()
+            return {'job': job.id, 'chunks': len(chunk_ids)}
+        except Exception:
+            logger.warning("Could not queue broadcast chunks, sending them from a local pool", exc_info=True)
+
+    with ThreadPoolExecutor(max_workers=BROADCAST_LOCAL_WORKERS) as executor:
+        list(executor.map(_run_local_chunk, chunk_ids))
+    return {'job': job.id, 'chunks': len(chunk_ids)}
+
+
+def _run_local_chunk(chunk_id):
     try:
-        with open(logo_path, 'rb') as f:
-            logo_data_uri = 'data:image/png;base64,' + base64.b64encode(f.read()).decode()
+        return broadcast_chunk_task(chunk_id)
     except Exception:
-        logo_data_uri = None
-
-    for app in apps_qs:
-        # personalize
-        message_body = template.body.format(
-            name=app.name,
-            father_name=app.father_name,
-            roll_number=app.roll_number or "N/A",
-            test_center=app.get_test_center_display(),
-            category=app.get_category_display(),
-            entry=app.entry,
+        # Already logged and recorded on the job; it can be resumed
+        return None
+    finally:
+        # Worker threads get their own DB connection
+        db_connection.close()
+
+
+def _fail_job(job, error):
+    BroadcastJob.objects.filter(id=job.id).update(
+        status=BroadcastJob.STATUS_FAILED, last_error=error,
+        updated_at=timezone.now(), finished_at=timezone.now(),
+    )
+    return {'error': error}
+
+
+def _finish_job_if_done(job_id):
+    if not BroadcastChunk.objects.filter(job_id=job_id, done=False).exists():
+        BroadcastJob.objects.filter(id=job_id, status=BroadcastJob.STATUS_RUNNING).update(
+            status=BroadcastJob.STATUS_COMPLETED, updated_at=timezone.now(), finished_at=timezone.now()
         )
 
-        if send_inapp:
-            try:
-                Notification.objects.create(user=app.user, title=template.title, message=message_body)
-            except Exception:
-                # log error if you have logger; skip failing notifications
-                pass
-
-        if send_email and getattr(app.user, 'email', None):
-            subject = template.subject or template.title
-            html_message = render_to_string('emails/broadcast_template.html', {
-                'subject': subject,
-                'body': message_body,
-                'logo_url': logo_data_uri or request_fallback_logo(),  # see helper below
-                'name': app.name
-            })
-            plain_message = strip_tags(html_message)
-            try:
-                send_mail(subject, plain_message, settings.DEFAULT_FROM_EMAIL, [app.user.email],
-                          html_message=html_message, fail_silently=True)
-            except Exception:
-                pass
-
-    return {'success': True}
 
+@shared_task(bind=True, max_retries=BROADCAST_CHUNK_RETRIES)
+def broadcast_chunk_task(self, chunk_id):
+    """Send one id range of a broadcast job, checkpointing after every batch."""
+    chunk = BroadcastChunk.objects.select_related('job__template').filter(id=chunk_id).first()
+    if chunk is None or chunk.done or chunk.job.template is None:
+        return None
+    job = chunk.job
+    template = job.template
 
-@shared_task
-def bulk_verify_applications_task(app_ids, base_url):
+    # In-app receipts need only the user; emails also need what the template uses
+    placeholders = broadcast_placeholders(template.body) if job.send_email else set()
+    columns = ['id', 'user_id']
+    if job.send_email:
+        columns += ['user__email', 'name'] + [BROADCAST_FIELDS[field][0] for field in placeholders if field != 'name']
+    audience = broadcast_audience(job.segments).filter(id__lte=chunk.last_id).order_by('id')
+
+    subject = template.subject or template.title
+    html_template = get_template('emails/broadcast_template.html')
+    logo_url = broadcast_logo_url(job.base_url)
+    checkpoint = chunk.last_processed_id
+    cursor = checkpoint if checkpoint is not None else chunk.first_id - 1
+
+    try:
+        while True:
+            rows = list(audience.filter(id__gt=cursor).values_list(*columns, named=True)[:BROADCAST_BATCH_SIZE])
+            if not rows:
+                break
+
+            receipts, emails = [], []
+            sent = failed = 0
+            for row in rows:
+                if job.notification_id:
+                    # In-app copy is shared; it is personalized when shown
+                    receipts.append(BroadcastReceipt(broadcast_id=job.notification_id, user_id=row.user_id))
+                if not (job.send_email and row.user__email):
+                    sent += 1
+                    continue
+
+                # personalize
+                try:
+                    values = {}
+                    for field in placeholders:
+                        column, choices = BROADCAST_FIELDS[field]
+                        value = getattr(row, column)
+                        values[field] = choices.get(value, value) if choices else value
+                    if 'roll_number' in values:
+                        values['roll_number'] = values['roll_number'] or "N/A"
+                    message_body = template.body.format(**values)
+                except Exception:
+                    logger.warning(f"Broadcast job {job.id}: could not personalize application {row.id}", exc_info=True)
+                    failed += 1
+                    continue
+
+                html_message = html_template.render({
+                    'subject': subject,
+                    'body': message_body,
+                    'logo_url': logo_url,
+                    'name': row.name,
+                })
+                email = EmailMultiAlternatives(subject, strip_tags(html_message), settings.DEFAULT_FROM_EMAIL, [row.user__email])
+                email.attach_alternative(html_message, 'text/html')
+                emails.append((row.user_id, email))
+                sent += 1
+
+            cursor = rows[-1].id
+            with transaction.atomic():
+                # Compare-and-set: if the checkpoint moved, another worker (a resume
+                # while this one was still alive) has sent this batch, so stop here
+                # without queuing anything. The row lock makes the loser wait and then miss.
+                claimed = BroadcastChunk.objects.filter(
+                    id=chunk.id, last_processed_id=checkpoint, done=False
+                ).update(last_processed_id=cursor)
+                if claimed:
+                    BroadcastReceipt.objects.bulk_create(receipts, ignore_conflicts=True)
+                    queue_emails(emails, category='broadcast')
+                    BroadcastJob.objects.filter(id=job.id).update(
+                        sent=F('sent') + sent, failed=F('failed') + failed, updated_at=timezone.now()
+                    )
+            if not claimed:
+                logger.warning(f"Broadcast job {job.id}: chunk {chunk.id} was taken over by another worker")
+                return None
+            checkpoint = cursor
+    except Exception as e:
+        logger.error(f"Broadcast job {job.id}: chunk {chunk.id} stopped after id {cursor}", exc_info=True)
+        BroadcastJob.objects.filter(id=job.id).update(last_error=str(e), updated_at=timezone.now())
+        if not self.request.called_directly:
+            # The retry starts again from the checkpoint
+            raise self.retry(exc=e, countdown=30)
+        raise
+
+    BroadcastChunk.objects.filter(id=chunk.id).update(done=True)
+    _finish_job_if_done(job.id)
+    return {'chunk': chunk.id, 'last_id': cursor}
+
+
+# ==========================================
+# ✅ Task 2: Bulk Verification Pipeline
+# ==========================================
+# Stage 1 (bulk_verify_applications_task): per chunk, one transaction that
+#   reserves a block of roll numbers, bulk_updates the applications,
+#   bulk_creates the notifications and queues the roll slip emails in the
+#   email outbox, so a verified applicant always has an email on record.
+# Stage 2 (drain_email_outbox_task): sends queued emails in batches through
+#   the mail dispatcher, with retries (admissions.outbox).
+# Roll slip PDFs are rendered lazily on first download (rendering.ensure_roll_slip);
+# `manage.py regenerate_roll_slips` can pre-warm them.
+BULK_VERIFY_CHUNK_SIZE = 250
+
+
+def chunked(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def dispatch(task, *args):
+    """Queue a pipeline stage on Celery, or run it inline if the broker is down."""
+    try:
+        task.delay(*args)
+    except Exception:
+        logger.warning(f"Could not queue {task.name}, running inline", exc_info=True)
+        task(*args)
+
+
+def build_verification_email(app, download_link):
+    """Roll slip email sent once a challan is verified."""
+    if app.class_name == 'XI':
+        schedule = (
+            "• Duration: 4 hours (till 1300 hrs)\n\n"
+            "🖊 Subjects: English, Mathematics, Physics, and Chemistry.\n\n"
+            "⚠ Important Instructions:\n"
+            "1. Bring your Roll Number Slip and writing material. Calculator is also allowed.\n"
+        )
+    else:
+        # Default for Class VIII
+        schedule = (
+            "• Duration: 3 hours (till 1200 hrs)\n\n"
+            "🖊 Subjects: English, Mathematics, Urdu, and Islamiyat.\n\n"
+            "⚠ Important Instructions:\n"
+            "1. Bring your Roll Number Slip and writing material.\n"
+        )
+
+    email_body = (
+        f"Dear {app.name},\n\n"
+        f"Your application has been verified successfully.\n\n"
+        f"Roll Number: {app.roll_number}\n"
+        f"Father’s Name: {app.father_name}\n"
+        f"Test Center: {app.get_test_center_display()}\n\n"
+        "📅 Examination Schedule:\n"
+        "• Report at respective center: 0800 hrs\n"
+        "• Start of written test: 0900 hrs\n"
+        f"{schedule}"
+        "2. Entrance Exam booklet will be provided at the center.\n"
+        "3. Missing the test for any reason means no re-examination.\n"
+        "4. Mobile phones are not allowed.\n"
+        "5. Parents/Guardians must bring CNIC.\n\n"
+        f"👉 Download your Roll Number Slip securely here:\n{download_link}\n\n"
+        "Alternatively, log in to your MCM Admission Portal to download it anytime.\n\n"
+        f"For queries contact: {settings.ADMISSION_CONTACT_EMAIL} | Phone: {settings.ADMISSION_CONTACT_PHONE}\n\n"
+        "Regards,\nAdmission Office\nMilitary College Murree"
+    )
+
+    return EmailMessage(
+        subject="🎓 Roll Number Slip - Military College Murree",
+        body=email_body,
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[app.user.email],
+    )
+
+
+@shared_task(bind=True)
+def bulk_verify_applications_task(self, app_ids, base_url):
     """
-    Celery task to verify multiple applications, generate roll slips,
-    and send emails/notifications asynchronously.
+    Celery task to verify multiple applications in chunks.
+    Emails are queued in the outbox with each chunk and sent by its worker.
     """
     from django.db import transaction
 
-    for app in Application.objects.filter(id__in=app_ids):
+    app_ids = sorted(set(int(i) for i in app_ids))
+    total = len(app_ids)
+    done, errors = 0, []
+
+    for chunk_no, chunk_ids in enumerate(chunked(app_ids, BULK_VERIFY_CHUNK_SIZE), start=1):
         try:
             with transaction.atomic():
-                app.payment_status = 'verified'
-                app.status = 'verified'
-
-                # Generate roll number + secure token
-                if not app.roll_number:
-                    app.roll_number = app.generate_roll_number()
-                if not app.secure_token:
-                    app.secure_token = uuid.uuid4().hex[:12]
-                app.save(update_fields=['payment_status', 'status', 'roll_number', 'secure_token'])
-
-                # Generate and save roll slip PDF
-                pdf_data = generate_roll_number_pdf(app)
-                filename = f"RollSlip_{app.roll_number}.pdf"
-                if app.roll_slip:
-                    try:
-                        app.roll_slip.delete(save=False)
-                    except Exception:
-                        pass
-                app.roll_slip.save(filename, ContentFile(pdf_data), save=False)
-                app.save(update_fields=['roll_slip'])
-
-                # Build download link
-                download_link = f"{base_url}/admissions/download-roll-slip/{app.secure_token}/"
-
-                # Compose and send email
-                try:
-                    email_body = (
-                        f"Dear {app.name},\n\n"
-                        f"Your application has been verified successfully.\n\n"
-                        f"Roll Number: {app.roll_number}\n"
-                        f"Father’s Name: {app.father_name}\n"
-                        f"Test Center: {app.get_test_center_display()}\n\n"
-                        "📅 Examination Schedule:\n"
-                        "• Report at respective center: 0800 hrs\n"
-                        "• Start of written test: 0900 hrs\n"
-                        "• Duration: 3 hours (till 1200 hrs)\n\n"
-                        "🖊 Subjects: English, Mathematics, Urdu, and Islamiyat.\n\n"
-                        "⚠ Important Instructions:\n"
-                        "1. Bring your Roll Number Slip and writing material.\n"
-                        "2. Entrance Exam booklet will be provided at the center.\n"
-                        "3. Missing the test for any reason means no re-examination.\n"
-                        "4. Mobile phones are not allowed.\n"
-                        "5. Parents/Guardians must bring CNIC.\n\n"
-                        f"👉 Download your Roll Number Slip securely here:\n{download_link}\n\n"
-                        "Alternatively, log in to your MCM Admission Portal to download it anytime.\n\n"
-                        f"For queries contact: {settings.ADMISSION_CONTACT_EMAIL} | Phone: {settings.ADMISSION_CONTACT_PHONE}\n\n"
-                        "Regards,\nAdmission Office\nMilitary College Murree"
-                    )
+                apps = list(
+                    Application.objects.select_for_update(of=('self',))
+                    .select_related('user')
+                    .filter(id__in=chunk_ids)
+                    .order_by('id')
+                )
 
-                    email = EmailMessage(
-                        subject="🎓 Roll Number Slip - Military College Murree",
-                        body=email_body,
-                        from_email=settings.DEFAULT_FROM_EMAIL,
-                        to=[app.user.email],
-                    )
-                    email.send(fail_silently=True)
-                except Exception as e:
-                    logger.error(f"Email sending failed for {app.name}", exc_info=True)
+                # Reserve one block of roll numbers per class for the whole chunk
+                needs_roll = {}
+                for app in apps:
+                    if not app.roll_number:
+                        needs_roll.setdefault(app.class_name, []).append(app)
+                for class_name, pending in needs_roll.items():
+                    numbers = RollNumberSequence.reserve_roll_numbers(class_name, len(pending))
+                    for app, roll_number in zip(pending, numbers):
+                        app.roll_number = roll_number
 
-                # Create notification
-                try:
-                    Notification.objects.create(
-                        user=app.user,
+                for app in apps:
+                    app.payment_status = 'verified'
+                    app.status = 'verified'
+                    if not app.secure_token:
+                        app.secure_token = uuid.uuid4().hex[:12]
+                    refresh_search_columns(app, ['roll_number'])
+
+                Application.objects.bulk_update(
+                    apps, ['payment_status', 'status', 'roll_number', 'secure_token',
+                           'search_document', 'roll_number_digits']
+                )
+                Notification.objects.bulk_create([
+                    Notification(
+                        user_id=app.user_id,
                         title="Challan Verified",
                         message=f"🎉 Your challan has been verified. Roll Number: {app.roll_number}"
                     )
-                except Exception as e:
-                    logger.error(f"Notification error for {app.id}", exc_info=True)
+                    for app in apps
+                ])
+                publish_events(status_event(app) for app in apps)
+                queue_emails(
+                    [
+                        (app.user_id, build_verification_email(app, f"{base_url}{signed_roll_slip_path(app)}"))
+                        for app in apps if getattr(app.user, 'email', None)
+                    ],
+                    category='roll_slip',
+                )
+        except Exception as e:
+            logger.error(f"Error verifying chunk {chunk_no} ({len(chunk_ids)} applications)", exc_info=True)
+            errors.append(str(e))
+            continue
 
-                logger.info(f"Processed {app.name} ({app.roll_number})")
+        done += len(apps)
+        progress = {'chunk': chunk_no, 'done': done, 'total': total}
+        if self.request.id:
+            self.update_state(state='PROGRESS', meta=progress)
+        logger.info(f"Bulk verify chunk {chunk_no}: {done}/{total} applications verified")
 
-        except Exception as e:
-            logger.error(f"Error verifying {app.name}", exc_info=True)
-            continue
\ No newline at end of file
+    return {'verified': done, 'total': total, 'errors': errors}
+
+
+# ==========================================
+# 📸 Task 3: Photo Derivatives
+# ==========================================
+@shared_task
+def generate_photo_derivatives_task(app_id):
+    """Build the print and thumbnail JPEGs for a newly uploaded photo."""
+    app = Application.objects.filter(id=app_id).first()
+    if not app or not app.photo:
+        return {'built': False}
+    try:
+        build_photo_derivatives(app)
+    except Exception:
+        logger.error(f"Photo derivative error for {app_id}", exc_info=True)
+        return {'built': False}
+    return {'built': True}
+
+
+# ==========================================
+# 📬 Task 4: Email Outbox Worker
+# ==========================================
+@shared_task
+def drain_email_outbox_task():
+    """Send due outbox emails (queued after each insert and every minute by beat)."""
+    return drain_outbox()
+
+
+@shared_task
+def send_outbox_emails_task(ids):
+    """Send specific outbox rows right away (verification codes and other urgent mail)."""
+    return send_outbox_emails(ids)
+
+
+# ==========================================
+# 🧹 Task 5: Retention
+# ==========================================
+@shared_task
+def retention_task():
+    """Delete old read notifications, spent verification codes and finished job records (daily, by beat)."""
+    report = run_retention()
+    logger.info(f"Retention removed {report['total']['rows']} rows in {report['total']['seconds']}s: {report}")
+    return report
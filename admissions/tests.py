@@ -1,3 +1,476 @@
-from django.test import TestCase
+import io
+import os
+import re
+import shutil
+import smtplib
+import tempfile
+from datetime import date, timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.files.base import ContentFile
+from django.core.mail import EmailMessage
+from django.core.mail.backends.base import BaseEmailBackend
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+from pypdf import PdfReader
+
+from notifications.models import BroadcastNotification, BroadcastReceipt
+
+from . import config
+from .bundles import iter_bundle
+from .delivery import make_download_token
+from .fees import FeeSchedule
+from .mailer import MailCircuitOpen, MailDispatcher, MailQuotaExceeded
+from .models import (
+    Application, BroadcastChunk, BroadcastJob, ConfigVersion, EmailOutbox, FeeCategoryConfig, FeeConfig,
+    FormFieldVisibility, MailCounter, MessageTemplate, RollNumberSequence,
+)
+from .outbox import claim_batch, drain_outbox, max_attempts, queue_emails, record_results
+from .rendering import ROLL_SLIP_LINK_SALT, signed_roll_slip_path
+from .search import search_applications
+from .tasks import broadcast_chunk_task
+from .utils import build_photo_derivatives, generate_roll_number_pdf
+
+
+def make_application(username, **fields):
+    user = get_user_model().objects.create_user(username=username, email=f"{username}@example.com", password='x')
+    fields.setdefault('name', username.title())
+    fields.setdefault('class_name', 'VIII')
+    return Application.objects.create(user=user, **fields)
+
+
+def jpeg(color='red'):
+    buffer = io.BytesIO()
+    Image.new('RGB', (300, 300), color).save(buffer, 'JPEG')
+    return ContentFile(buffer.getvalue())
+
+
+class MediaTestCase(TestCase):
+    """Runs with MEDIA_ROOT in a temporary directory."""
+
+    def setUp(self):
+        super().setUp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+
+
+# ==========================================
+# Roll slips (admissions/utils.py)
+# ==========================================
+class RollSlipRenderingTests(TestCase):
+    def render(self, **fields):
+        fields.setdefault('class_name', 'VIII')
+        app = Application(name="Test Student", father_name="Test Father", roll_number='8-0042',
+                          test_center='Peshawar', **fields)
+        return PdfReader(io.BytesIO(generate_roll_number_pdf(app)), strict=True)
+
+    def test_slip_has_details_and_class_instructions(self):
+        reader = self.render(class_name='XI')
+        self.assertEqual(len(reader.pages), 1)
+        text = reader.pages[0].extract_text()
+        self.assertIn('8-0042', text)
+        self.assertIn('TEST STUDENT', text.upper())
+        self.assertIn('Physics', text)
+
+    def test_logo_is_drawn_from_the_static_layer_with_its_transparency(self):
+        for _ in range(2):  # the second slip reuses the logo decoded for the first
+            page = self.render().pages[0]
+            forms = [xobj.get_object() for xobj in page['/Resources']['/XObject'].values()]
+            logos = [
+                image.get_object() for form in forms
+                for image in form.get('/Resources', {}).get('/XObject', {}).values()
+                if image.get_object().get('/Subtype') == '/Image'
+            ]
+            self.assertEqual(len(logos), 1)
+            self.assertIn('/SMask', logos[0])
+
+
+# ==========================================
+# Roll slip bundles (admissions/bundles.py)
+# ==========================================
+class RollSlipBundleTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        for n in (3, 1, 5, 2, 4):
+            app = make_application(
+                f"bundle{n}", status='verified', roll_number=f"8-000{n}", test_center='Peshawar'
+            )
+            if n == 2:
+                app.photo.save('bundle2.jpg', jpeg(), save=True)
+        make_application('elsewhere', status='verified', roll_number='8-0009', test_center='Lahore')
+
+    def read(self, **kwargs):
+        return PdfReader(io.BytesIO(b''.join(iter_bundle(**kwargs))), strict=True)
+
+    def test_one_page_per_slip_in_roll_number_order_across_parts(self):
+        reader = self.read(test_center='Peshawar', part_size=2)
+        self.assertEqual(len(reader.pages), 5)
+        rolls = [re.search(r'8-000\d', page.extract_text()).group(0) for page in reader.pages]
+        self.assertEqual(rolls, ['8-0001', '8-0002', '8-0003', '8-0004', '8-0005'])
+
+    def test_photo_survives_the_merge(self):
+        reader = self.read(test_center='Peshawar', part_size=2)
+        self.assertTrue(reader.pages[1].images)
+
+    def test_empty_bundle_is_one_blank_page(self):
+        reader = self.read(test_center='Jhelum')
+        self.assertEqual(len(reader.pages), 1)
+        self.assertIn("No verified applicants", reader.pages[0].extract_text())
+
+
+# ==========================================
+# Roll numbers (RollNumberSequence)
+# ==========================================
+class RollNumberSequenceTests(TestCase):
+    def test_first_reservation_carries_on_from_issued_numbers(self):
+        make_application('issued', status='verified', roll_number='8-0041')
+        self.assertEqual(RollNumberSequence.next_roll_number('VIII'), '8-0042')
+        self.assertEqual(RollNumberSequence.reserve_roll_numbers('VIII', 3), ['8-0043', '8-0044', '8-0045'])
+        self.assertEqual(RollNumberSequence.next_roll_number('XI'), '11-0001')
+
+    def test_rolled_back_verify_gives_its_number_back(self):
+        RollNumberSequence.next_roll_number('VIII')
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            RollNumberSequence.next_roll_number('VIII')
+            raise RuntimeError("verify failed")
+        self.assertEqual(RollNumberSequence.next_roll_number('VIII'), '8-0002')
+
+    def test_verifying_assigns_a_number_once(self):
+        app = make_application('student', class_name='XI')
+        self.assertIsNone(app.roll_number)
+        app.status = 'verified'
+        app.save()
+        self.assertEqual(app.roll_number, '11-0001')
+        app.save()
+        self.assertEqual(Application.objects.get(pk=app.pk).roll_number, '11-0001')
+
+
+# ==========================================
+# Email outbox (admissions/outbox.py)
+# ==========================================
+class EmailOutboxTests(TestCase):
+    def setUp(self):
+        queue_emails([(None, EmailMessage('Hello', 'Body', 'from@example.com', [f'to{n}@example.com']))
+                      for n in range(3)])
+
+    def test_claimed_rows_are_leased_until_the_lease_runs_out(self):
+        rows = claim_batch()
+        self.assertEqual(len(rows), 3)
+        self.assertTrue(all(row.status == EmailOutbox.STATUS_SENDING for row in rows))
+        self.assertEqual(claim_batch(), [])
+
+        # The worker holding them died: the rows come back once the lease expires
+        EmailOutbox.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(len(claim_batch()), 3)
+
+    def test_failures_back_off_and_end_dead(self):
+        rows = claim_batch()
+        counts = record_results(rows, [smtplib.SMTPDataError(554, b'rejected')] * len(rows))
+        self.assertEqual(counts['retrying'], 3)
+        row = EmailOutbox.objects.get(pk=rows[0].pk)
+        self.assertEqual((row.status, row.attempts), (EmailOutbox.STATUS_RETRYING, 1))
+        self.assertGreater(row.next_attempt_at, timezone.now())
+        self.assertIn('SMTPDataError', row.last_error)
+
+        row.attempts = max_attempts() - 1
+        with self.assertLogs('admissions.outbox', 'ERROR'):
+            record_results([row], [smtplib.SMTPDataError(554, b'rejected')])
+        self.assertEqual(EmailOutbox.objects.get(pk=row.pk).status, EmailOutbox.STATUS_DEAD)
+
+    def test_deferred_rows_keep_their_attempts(self):
+        rows = claim_batch()
+        retry_at = (timezone.now() + timedelta(hours=3)).timestamp()
+        counts = record_results(rows, [MailQuotaExceeded("quota", retry_at=retry_at)] * len(rows))
+        self.assertEqual(counts['deferred'], 3)
+        row = EmailOutbox.objects.get(pk=rows[0].pk)
+        self.assertEqual((row.status, row.attempts), (EmailOutbox.STATUS_PENDING, 0))
+        self.assertAlmostEqual(row.next_attempt_at.timestamp(), retry_at, places=3)
+
+    def test_drain_sends_every_due_row(self):
+        totals = drain_outbox()
+        self.assertEqual(totals['sent'], 3)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertFalse(EmailOutbox.objects.exclude(status=EmailOutbox.STATUS_SENT).exists())
+
+
+# ==========================================
+# Mail dispatcher quotas and breaker (admissions/mailer.py)
+# ==========================================
+class RefusingBackend(BaseEmailBackend):
+    def send_messages(self, messages):
+        raise smtplib.SMTPRecipientsRefused({})
+
+
+class UnreachableBackend(BaseEmailBackend):
+    def open(self):
+        raise ConnectionRefusedError("SMTP server unreachable")
+
+
+def messages(count):
+    return [EmailMessage('Hi', 'Body', 'from@example.com', [f'to{n}@example.com']) for n in range(count)]
+
+
+class MailDispatcherTests(TestCase):
+    def dispatcher(self, **kwargs):
+        kwargs.setdefault('backend', 'django.core.mail.backends.locmem.EmailBackend')
+        return MailDispatcher(pool_size=1, batch_size=10, **kwargs)
+
+    def test_batch_takes_what_is_left_of_the_day_and_defers_the_rest(self):
+        dispatcher = self.dispatcher(per_day=3)
+        with self.assertLogs('admissions.mailer', 'WARNING'):
+            results = dispatcher.deliver(messages(5))
+        self.assertEqual(results[:3], [None] * 3)
+        self.assertTrue(all(isinstance(error, MailQuotaExceeded) for error in results[3:]))
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertEqual(MailCounter.read(dispatcher._day_key())[0], 3)
+
+    def test_quota_of_refused_messages_is_given_back(self):
+        dispatcher = self.dispatcher(per_day=10, per_minute=10, backend='admissions.tests.RefusingBackend')
+        results = dispatcher.deliver(messages(4))
+        self.assertTrue(all(isinstance(error, smtplib.SMTPRecipientsRefused) for error in results))
+        self.assertEqual(MailCounter.read(dispatcher._day_key())[0], 0)
+        self.assertEqual(MailCounter.read(dispatcher._minute_key())[0], 0)
+
+    @override_settings(MAIL_BREAKER_FAILURES=2)
+    def test_breaker_opens_after_repeated_transport_failures(self):
+        dispatcher = self.dispatcher(backend='admissions.tests.UnreachableBackend')
+        with self.assertLogs('admissions.mailer', 'WARNING') as logs:
+            for _ in range(2):
+                self.assertIsInstance(dispatcher.deliver(messages(1))[0], ConnectionRefusedError)
+            self.assertTrue(dispatcher.breaker_open())
+            self.assertIsInstance(dispatcher.deliver(messages(1))[0], MailCircuitOpen)
+        self.assertIn("pausing sends", '\n'.join(logs.output))
+
+
+# ==========================================
+# Signed roll slip links
+# ==========================================
+class SignedRollSlipLinkTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.app = make_application('linked', status='verified', test_center='Peshawar')
+
+    def download(self, path):
+        response = self.client.get(path)
+        if response.status_code == 200:
+            response.body = b''.join(response.streaming_content)
+        return response
+
+    def test_link_serves_the_slip_and_later_needs_no_queries(self):
+        path = signed_roll_slip_path(self.app)
+        response = self.download(path)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.body.startswith(b'%PDF'))
+        self.assertIn(f'RollSlip_{self.app.roll_number}.pdf', response['Content-Disposition'])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.download(path).status_code, 200)
+
+    def test_tampered_and_expired_links_are_refused(self):
+        token = signed_roll_slip_path(self.app).rstrip('/').rsplit('/', 1)[-1]
+        tampered = token[:-2] + ('A' if token[-2] != 'A' else 'B') + token[-1]
+        expired = make_download_token('roll_slips/x.pdf', 'x.pdf', -1, ROLL_SLIP_LINK_SALT, a=self.app.pk)
+        for bad in (tampered, expired):
+            path = reverse('admissions:download_roll_slip_signed', args=[bad])
+            self.assertEqual(self.client.get(path).status_code, 404)
+
+
+# ==========================================
+# Fee schedule (admissions/fees.py)
+# ==========================================
+def legacy_fee(class_name, category, as_of_date):
+    """The per-call lookup FeeSchedule replaced, kept as the reference."""
+    config = FeeConfig.objects.filter(class_name=class_name).first()
+    if config is None:
+        return None, "no-config"
+    if config.stop_after_final and as_of_date > config.final_deadline:
+        return None, "closed"
+    cat = None if class_name == "XI" else FeeCategoryConfig.objects.filter(fee_config=config, category=category).first()
+    if cat is None:
+        amounts, tiers = (config.base_fee, config.double_fee, config.triple_fee), ("normal", "double", "triple")
+    else:
+        amounts, tiers = (cat.normal_fee, cat.late_fee, cat.final_fee), ("normal", "late", "final")
+    if as_of_date <= config.normal_deadline:
+        return amounts[0], tiers[0]
+    if as_of_date <= config.late_deadline:
+        return amounts[1], tiers[1]
+    return amounts[2], tiers[2]
+
+
+class FeeScheduleTests(TestCase):
+    def test_schedule_prices_like_the_per_call_lookup(self):
+        start = date(2026, 3, 1)
+        viii = FeeConfig.objects.create(
+            class_name='VIII', normal_deadline=start, late_deadline=start + timedelta(days=10),
+            final_deadline=start + timedelta(days=20), base_fee=100, double_fee=200, triple_fee=300,
+        )
+        FeeCategoryConfig.objects.create(fee_config=viii, category='civilian', normal_fee=5000, late_fee=6000, final_fee=7000)
+        FeeCategoryConfig.objects.create(fee_config=viii, category='caf', normal_fee=2000, late_fee=2500, final_fee=3000)
+        # Late deadline before the normal one, and no stop after the final deadline
+        xi = FeeConfig.objects.create(
+            class_name='XI', normal_deadline=start + timedelta(days=5), late_deadline=start,
+            final_deadline=start + timedelta(days=8), stop_after_final=False,
+            base_fee=1000, double_fee=2000, triple_fee=3000,
+        )
+        FeeCategoryConfig.objects.create(fee_config=xi, category='civilian', normal_fee=1, late_fee=2, final_fee=3)
+
+        schedule = FeeSchedule(FeeConfig.objects.all(), FeeCategoryConfig.objects.select_related('fee_config'))
+        days = [start + timedelta(days=n) for n in range(-2, 25)]
+        for class_name in ('VIII', 'XI', 'IX'):
+            for category in ('civilian', 'caf', 'fata', None):
+                for day in days:
+                    with self.subTest(class_name=class_name, category=category, day=day):
+                        self.assertEqual(schedule.price(class_name, category, day), legacy_fee(class_name, category, day))
+
+        pairs = [('VIII', 'caf'), ('XI', 'civilian'), ('VIII', 'caf'), ('VIII', 'fata')]
+        self.assertEqual(
+            schedule.price_many(pairs, start),
+            [legacy_fee(class_name, category, start) for class_name, category in pairs],
+        )
+
+
+# ==========================================
+# Settings snapshot (admissions/config.py)
+# ==========================================
+class ConfigSnapshotTests(TestCase):
+    def setUp(self):
+        config._snapshot = None
+        self.addCleanup(setattr, config, '_snapshot', None)
+
+    def test_unchanged_settings_are_served_without_queries(self):
+        config.get_config()
+        with self.assertNumQueries(0):
+            config.get_config()
+
+    def test_saving_a_setting_reloads_the_snapshot_after_commit(self):
+        self.assertEqual(config.get_config().fee_schedule.price('XI', None)[1], 'no-config')
+        today = date.today()
+        with self.captureOnCommitCallbacks(execute=True):
+            FeeConfig.objects.create(
+                class_name='XI', normal_deadline=today, late_deadline=today, final_deadline=today, base_fee=900,
+            )
+        self.assertEqual(config.get_config().fee_schedule.price('XI', None), (900, 'normal'))
+
+    def test_field_visibility_form_bumps_the_version_once(self):
+        for name in ('name', 'father_name', 'email', 'address'):
+            FormFieldVisibility.objects.create(field_name=name)
+        staff = get_user_model().objects.create_superuser(username='staff', email='staff@example.com', password='x')
+        self.client.force_login(staff)
+        version = ConfigVersion.current()
+
+        response = self.client.post(reverse('admissions:form_field_control'), {'visible_fields': ['name', 'email']})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(ConfigVersion.current(), version + 1)
+        self.assertEqual(
+            set(FormFieldVisibility.objects.filter(is_visible=True).values_list('field_name', flat=True)),
+            {'name', 'email'},
+        )
+
+
+# ==========================================
+# Broadcast checkpoints (admissions/tasks.py)
+# ==========================================
+class BroadcastCheckpointTests(TestCase):
+    def setUp(self):
+        self.apps = [make_application(f'recipient{n}') for n in range(5)]
+        template = MessageTemplate.objects.create(title='Notice', subject='Notice', body='Hello {name}')
+        self.job = BroadcastJob.objects.create(
+            template=template, title='Notice', status=BroadcastJob.STATUS_RUNNING, total=5,
+            notification=BroadcastNotification.objects.create(title='Notice', message='Hello {name}'),
+        )
+        self.chunk = BroadcastChunk.objects.create(
+            job=self.job, first_id=self.apps[0].id, last_id=self.apps[-1].id, total=5,
+        )
+
+    def recipients(self):
+        return set(BroadcastReceipt.objects.values_list('user_id', flat=True))
+
+    def test_resumed_chunk_carries_on_after_its_checkpoint(self):
+        BroadcastChunk.objects.filter(pk=self.chunk.pk).update(last_processed_id=self.apps[1].id)
+        broadcast_chunk_task(self.chunk.id)
+        self.assertEqual(self.recipients(), {app.user_id for app in self.apps[2:]})
+        self.job.refresh_from_db()
+        self.assertEqual((self.job.sent, self.job.status), (3, BroadcastJob.STATUS_COMPLETED))
+
+    def test_worker_stops_when_another_one_moved_the_checkpoint(self):
+        def taken_over(*args, **kwargs):
+            # A resumed worker checkpoints past this one while it is mid-batch
+            BroadcastChunk.objects.filter(pk=self.chunk.pk).update(last_processed_id=self.apps[3].id)
+
+        with mock.patch('admissions.tasks.BROADCAST_BATCH_SIZE', 2), \
+                mock.patch('admissions.tasks.queue_emails', side_effect=taken_over), \
+                self.assertLogs('admissions.tasks', 'WARNING'):
+            broadcast_chunk_task(self.chunk.id)
+        self.assertEqual(self.recipients(), {app.user_id for app in self.apps[:2]})
+        self.chunk.refresh_from_db()
+        self.assertFalse(self.chunk.done)
+        self.job.refresh_from_db()
+        self.assertEqual(self.job.sent, 2)
+
+    def test_only_one_resume_claims_a_stalled_job(self):
+        stalled = timezone.now() - timedelta(seconds=BroadcastJob.STALL_SECONDS + 1)
+        BroadcastJob.objects.filter(pk=self.job.pk).update(updated_at=stalled)
+        first, second = BroadcastJob.objects.get(pk=self.job.pk), BroadcastJob.objects.get(pk=self.job.pk)
+        self.assertTrue(first.is_stalled)
+        self.assertTrue(first.claim_resume())
+        self.assertFalse(second.claim_resume())
+        self.assertFalse(BroadcastJob.objects.get(pk=self.job.pk).is_stalled)
+
+
+# ==========================================
+# Applicant search (admissions/search.py)
+# ==========================================
+class SearchTests(TestCase):
+    def setUp(self):
+        self.ali = make_application('ali', name='Ali Khan', father_name='Imran Khan', father_cnic='35202-1234567-3')
+        self.jadoon = make_application('jadoon', name='Ali Khan Jadoon', father_name='Tariq Jadoon')
+        self.khalid = make_application('khalid', name='Khalid Ali', father_name='Aslam Ali')
+        self.raza = make_application('raza', name='Ali Raza', father_name='Shahid Raza', father_cnic='35202-7654321-3')
+
+    def names(self, query):
+        return [app.name for app in search_applications(Application.objects.all(), query)]
+
+    def test_exact_name_ranks_first(self):
+        self.assertEqual(self.names('Ali Khan')[0], 'Ali Khan')
+        self.assertEqual(set(self.names('Ali Khan')), {'Ali Khan', 'Ali Khan Jadoon'})
+
+    def test_short_words_only_match_the_start_of_name_words(self):
+        self.assertEqual(set(self.names('ali kh')), {'Ali Khan', 'Ali Khan Jadoon', 'Khalid Ali'})
+        # "3" ends both CNICs but starts no name word
+        self.assertEqual(self.names('Ali Khan 3'), [])
+
+    def test_identifiers_match_exactly_with_or_without_dashes(self):
+        self.assertEqual(self.names('35202-1234567-3'), ['Ali Khan'])
+        self.assertEqual(self.names('3520276543213'), ['Ali Raza'])
+
+
+# ==========================================
+# Photo derivatives
+# ==========================================
+class PhotoDerivativeTests(MediaTestCase):
+    def test_new_photo_drops_the_old_derivatives(self):
+        app = make_application('photo')
+        app.photo.save('first.jpg', jpeg('red'), save=True)
+        build_photo_derivatives(app)
+        app = Application.objects.get(pk=app.pk)
+        old_files = [app.photo_print.path, app.photo_thumb.path]
+        self.assertTrue(all(os.path.exists(path) for path in old_files))
+
+        with mock.patch('admissions.tasks.dispatch') as dispatch, self.captureOnCommitCallbacks(execute=True):
+            app.photo.save('second.jpg', jpeg('blue'), save=True)
+
+        app = Application.objects.get(pk=app.pk)
+        self.assertFalse(app.photo_print)
+        self.assertFalse(app.photo_thumb)
+        self.assertEqual(app.photo_print_url, app.photo.url)
+        self.assertFalse(any(os.path.exists(path) for path in old_files))
+        dispatch.assert_called_once()
+        self.assertEqual(dispatch.call_args.args[1], app.pk)
@@ -21,8 +21,12 @@ urlpatterns = [
 
     # 🎫 Roll Number Slip (dashboard + email link)
     path('dashboard/download-roll-slip/', views.download_roll_slip_dashboard, name='download_roll_slip_dashboard'),
+    path('roll-slip/<str:signed>/', views.download_roll_slip_signed, name='download_roll_slip_signed'),
     path('download-roll-slip/<str:token>/', views.download_roll_slip, name='download_roll_slip'),
 
+    # 📎 Uploaded documents (staff or owner)
+    path('files/<int:app_id>/<str:field>/', views.application_file, name='application_file'),
+
     # 🛠️ Admin: dashboards and management
     path('admin-dashboard/', views.admin_dashboard, name='admin_dashboard'),
     path('admin-dashboard/applicant/<int:app_id>/', views.view_applicant, name='view_applicant'),
@@ -34,13 +38,17 @@ urlpatterns = [
     # Bulk actions (verify, reject, assign_center)
     path('admin-api/applicants/bulk-action/', views.bulk_applicant_action, name='bulk_applicant_action'),
     path('analytics-data/', views.analytics_data, name='analytics_data'),
+    path('admin-api/mail-stats/', views.mail_stats, name='mail_stats'),
     path('admin-analytics/', views.admin_analytics, name='admin_analytics'),
         # ✅ Add this missing route
     path('export-analytics-pdf/', views.export_analytics_pdf, name='export_analytics_pdf'),
     path('export-csv/', views.export_applicants_csv, name='export_applicants_csv'),
     path('export-excel/', views.export_applicants_excel, name='export_applicants_excel'),
+    path('roll-slip-bundle/', views.roll_slip_bundle, name='roll_slip_bundle'),
     path('broadcast-messages/', views.broadcast_messages, name='broadcast_messages'),
     path('broadcast-preview/', views.broadcast_preview, name='broadcast_preview'),
+    path('broadcast-jobs/<int:job_id>/status/', views.broadcast_job_status, name='broadcast_job_status'),
+    path('broadcast-jobs/<int:job_id>/resume/', views.broadcast_job_resume, name='broadcast_job_resume'),
     path('create-template/', views.create_message_template, name='create_message_template'),
     
     path('admin/fees/', views.fee_management_dashboard, name='fee_management'),
@@ -2,105 +2,226 @@ from reportlab.lib.pagesizes import A4
 from reportlab.lib import colors
 from reportlab.pdfgen import canvas
 from reportlab.platypus import Table, TableStyle
+from reportlab.lib.utils import ImageReader
+from reportlab import rl_config
 from io import BytesIO
+from PIL import Image, ImageOps
 import os
+import threading
 from django.conf import settings
 from datetime import date
 from django.core.exceptions import ObjectDoesNotExist
-from .models import FeeConfig, FeeCategoryConfig
+from django.core.files.base import ContentFile
+from .config import get_config
 
 
-def generate_roll_number_pdf(application):
-    """Generates a professional, beautifully styled Roll Number Slip PDF with MCM branding."""
-    buffer = BytesIO()
-    p = canvas.Canvas(buffer, pagesize=A4)
+# Write PDF streams as binary: ReportLab's ASCII85 text encoding (pure Python
+# without its C accelerator) was most of the time spent on each slip, for
+# streams a quarter larger
+rl_config.useA85 = 0
+
+# 🎨 MCM Brand Colors
+MCM_GREEN = colors.HexColor("#005430")  # Dark Green
+MCM_GOLD = colors.HexColor("#DAA520")   # Gold
+LIGHT_GRAY = colors.HexColor("#F9F9F9") # Light Gray
+DARK_TEXT = colors.HexColor("#212121")  # Dark Gray/Black
+
+ROLL_SLIP_INSTRUCTIONS = {
+    'XI': [
+        "1. Report at the respective center by 0800 hrs.",
+        "2. The written test will start at 0900 hrs and last 4 hours (till 1300 hrs).",
+        "3. Subjects: English, Mathematics, Physics, Chemistry.",
+        "4. Bring this printed Roll Number Slip and writing material. Calculator is also allowed.",
+        "5. Bring writing material; exam booklet will be provided.",
+        "6. Mobile phones are strictly prohibited.",
+        "7. Parents/Guardians must bring CNIC.",
+    ],
+    # Default for Class VIII
+    'VIII': [
+        "1. Report at the respective center by 0800 hrs.",
+        "2. The written test will start at 0900 hrs and last 3 hours (till 1200 hrs).",
+        "3. Subjects: English, Mathematics, Urdu, Islamiat.",
+        "4. Bring this printed Roll Number Slip and your CNIC/Form-B.",
+        "5. Bring writing material; exam booklet will be provided.",
+        "6. Mobile phones are strictly prohibited.",
+        "7. Parents/Guardians must bring CNIC.",
+    ],
+}
+
+
+_logo_image = None
+_logo_lock = threading.Lock()
+
+
+def get_logo_image():
+    """
+    The MCM logo, read and decoded from static/images once per process
+    (None if missing). It is drawn inside the static layer form, so each
+    document embeds it once however many slips it holds.
+    """
+    global _logo_image
+    if _logo_image is None:
+        logo_path = os.path.join(settings.BASE_DIR, "static", "images", "logo.png")
+        if not os.path.exists(logo_path):
+            return None
+        with _logo_lock:
+            if _logo_image is None:
+                image = ImageReader(logo_path)
+                image.getRGBData()  # decode now, not on the first slip of every worker thread
+                _logo_image = image
+    return _logo_image
+
+
+def reset_roll_slip_cache():
+    """Drop the cached logo so the next slip reloads it (used by the benchmark)."""
+    global _logo_image
+    _logo_image = None
+
+
+def draw_roll_slip_static_layer(p, class_name):
+    """
+    Fixed part of the slip (border, header band, logo, instructions box and
+    footer) as a form XObject, defined once per document and per class.
+    """
+    class_name = 'XI' if class_name == 'XI' else 'VIII'
+    form_name = f"rollslip_static_{class_name}"
+    if p.hasForm(form_name):
+        p.doForm(form_name)
+        return
+
     width, height = A4
-    
-    # 🎨 MCM Brand Colors
-    MCM_GREEN = colors.HexColor("#005430")  # Dark Green
-    MCM_GOLD = colors.HexColor("#DAA520")   # Gold
-    LIGHT_GRAY = colors.HexColor("#F9F9F9") # Light Gray
-    DARK_TEXT = colors.HexColor("#212121")  # Dark Gray/Black
-    
+    p.beginForm(form_name)
+
     # ═══════════════════════════════════════════════════════
     # 🔲 PAGE BORDER (Frame the entire document)
     # ═══════════════════════════════════════════════════════
-    # Draw border FIRST so everything else sits on top
     p.setStrokeColor(MCM_GREEN)
     p.setLineWidth(3)
     p.rect(30, 30, width - 60, height - 60, fill=0, stroke=1)
-    
+
     # ═══════════════════════════════════════════════════════
     # 🎨 PROFESSIONAL HEADER BAND (Green Background)
     # ═══════════════════════════════════════════════════════
     p.setFillColor(MCM_GREEN)
     p.rect(33, height - 130, width - 66, 95, fill=1, stroke=0)
-    
+
     # Header Text (White on Green)
     p.setFillColor(colors.white)
     p.setFont("Helvetica-Bold", 20)
     p.drawCentredString(width / 2, height - 70, "MILITARY COLLEGE MURREE")
-    
+
     # Subtitle (Gold)
     p.setFillColor(MCM_GOLD)
     p.setFont("Helvetica-Bold", 13)
     p.drawCentredString(width / 2, height - 95, "ROLL NUMBER SLIP - ENTRANCE TEST 2026")
-    
-    # Reset color
-    p.setFillColor(DARK_TEXT)
-    
+
     # ═══════════════════════════════════════════════════════
     # 🏫 LOGO (Circular Badge with Gold Border)
     # ═══════════════════════════════════════════════════════
-    logo_path = os.path.join(settings.BASE_DIR, "static", "images", "logo.png")
-    if os.path.exists(logo_path):
+    logo = get_logo_image()
+    if logo:
         # Gold circle background
         p.setFillColor(MCM_GOLD)
         p.circle(85, height - 85, 35, fill=1, stroke=0)
         # Logo image
-        p.drawImage(logo_path, 55, height - 115, width=60, height=60, preserveAspectRatio=True, mask='auto')
-    
+        p.drawImage(logo, 55, height - 115, width=60, height=60, preserveAspectRatio=True, mask='auto')
+
+    # ═══════════════════════════════════════════════════════
+    # ⚠ INSTRUCTIONS BOX (Green Header, White Background)
+    # ═══════════════════════════════════════════════════════
+    instr_y = height - 295 - 165
+
+    # Header box
+    p.setFillColor(MCM_GREEN)
+    p.rect(50, instr_y, width - 100, 30, fill=1, stroke=0)
+
+    # Header text (white square + text instead of emoji)
+    p.setFillColor(colors.white)
+    p.setFont("Helvetica-Bold", 13)
+    p.drawString(60, instr_y + 10, "IMPORTANT INSTRUCTIONS")
+
+    # Instructions background
+    p.setFillColor(colors.white)
+    p.setStrokeColor(MCM_GREEN)
+    p.setLineWidth(2)
+    p.rect(50, instr_y - 150, width - 100, 150, fill=1, stroke=1)
+
+    # Instructions text (dynamic based on class)
+    p.setFillColor(DARK_TEXT)
+    p.setFont("Helvetica", 10)
+    y = instr_y - 20
+    for line in ROLL_SLIP_INSTRUCTIONS[class_name]:
+        p.drawString(65, y, line)
+        y -= 18
+
+    # ═══════════════════════════════════════════════════════
+    # 📧 FOOTER (Gold Line + Contact Info)
+    # ═══════════════════════════════════════════════════════
+    footer_y = 70
+
+    # Gold separator line
+    p.setStrokeColor(MCM_GOLD)
+    p.setLineWidth(2)
+    p.line(50, footer_y + 20, width - 50, footer_y + 20)
+
+    # Footer text
+    p.setFillColor(MCM_GREEN)
+    p.setFont("Helvetica-Oblique", 9)
+    p.drawCentredString(width / 2, footer_y + 5, "Admission Office - Military College Murree")
+
+    p.endForm()
+    p.doForm(form_name)
+
+
+def draw_roll_slip(p, application):
+    """Draws one roll slip page: the cached static layer plus the applicant overlay."""
+    width, height = A4
+
+    draw_roll_slip_static_layer(p, application.class_name)
+
     # ═══════════════════════════════════════════════════════
     # 🎫 ROLL NUMBER HIGHLIGHT BOX (Gold Background)
     # ═══════════════════════════════════════════════════════
     roll_y = height - 175
     p.setFillColor(MCM_GOLD)
     p.roundRect(60, roll_y - 35, 250, 45, 8, fill=1, stroke=0)
-    
+
     # Roll Number Text (Large, Bold, White)
     p.setFillColor(colors.white)
     p.setFont("Helvetica-Bold", 16)
     p.drawString(75, roll_y - 12, "Roll Number:")
     p.setFont("Helvetica-Bold", 24)
     p.drawString(75, roll_y - 32, application.roll_number or "—")
-    
+
     # Reset color
     p.setFillColor(DARK_TEXT)
-    
+
     # ═══════════════════════════════════════════════════════
     # 🪪 CANDIDATE PHOTO (Framed with Green Border)
     # ═══════════════════════════════════════════════════════
     photo_x = width - 160
     photo_y = height - 260
-    
-    if application.photo:
+
+    # Prefer the print-sized JPEG derivative; fall back to the upload until it exists
+    photo = application.photo_print or application.photo
+    if photo:
         try:
             # Green border frame
             p.setStrokeColor(MCM_GREEN)
             p.setLineWidth(3)
             p.rect(photo_x - 3, photo_y - 3, 116, 116, fill=0, stroke=1)
             # Photo
-            p.drawImage(application.photo.path, photo_x, photo_y, width=110, height=110, preserveAspectRatio=True, mask='auto')
+            p.drawImage(photo.path, photo_x, photo_y, width=110, height=110, preserveAspectRatio=True, mask='auto')
         except Exception:
             p.setFont("Helvetica-Oblique", 9)
             p.setFillColor(colors.gray)
             p.drawString(photo_x + 10, photo_y + 50, "[Photo not available]")
-    
+
     # ═══════════════════════════════════════════════════════
     # 📋 APPLICANT DETAILS TABLE (Professional Styling)
     # ═══════════════════════════════════════════════════════
     table_y = height - 295
-    
+
     details = [
         ["Candidate Name", application.name],
         ["Father's Name", application.father_name],
@@ -108,7 +229,7 @@ def generate_roll_number_pdf(application):
         ["Test Center", dict(application.TEST_CENTERS).get(application.test_center, application.test_center or "—")],
         ["Date of Birth", application.dob.strftime("%d-%b-%Y") if application.dob else "—"],
     ]
-    
+
     table = Table(details, colWidths=[135, 330])
     table.setStyle(TableStyle([
         # Header styling (labels)
@@ -141,81 +262,72 @@ def generate_roll_number_pdf(application):
     
     table.wrapOn(p, 60, table_y)
     table.drawOn(p, 60, table_y - 120)
-    
-    # ═══════════════════════════════════════════════════════
-    # ⚠ INSTRUCTIONS BOX (Green Header, White Background)
-    # ═══════════════════════════════════════════════════════
-    instr_y = table_y - 165
-    
-    # Header box
-    p.setFillColor(MCM_GREEN)
-    p.rect(50, instr_y, width - 100, 30, fill=1, stroke=0)
-    
-    # Header text (white square + text instead of emoji)
-    p.setFillColor(colors.white)
-    p.setFont("Helvetica-Bold", 13)
-    p.drawString(60, instr_y + 10, "IMPORTANT INSTRUCTIONS")
-    
-    # Instructions background
-    p.setFillColor(colors.white)
-    p.setStrokeColor(MCM_GREEN)
-    p.setLineWidth(2)
-    p.rect(50, instr_y - 150, width - 100, 150, fill=1, stroke=1)
-    
-    # Instructions text (using simple symbols instead of emojis)
-    p.setFillColor(DARK_TEXT)
-    p.setFont("Helvetica", 10)
-    
-    # Dynamic instructions based on class
-    if application.class_name == 'XI':
-        lines = [
-            "1. Report at the respective center by 0800 hrs.",
-            "2. The written test will start at 0900 hrs and last 4 hours (till 1300 hrs).",
-            "3. Subjects: English, Mathematics, Physics, Chemistry.",
-            "4. Bring this printed Roll Number Slip and writing material. Calculator is also allowed.",
-            "5. Bring writing material; exam booklet will be provided.",
-            "6. Mobile phones are strictly prohibited.",
-            "7. Parents/Guardians must bring CNIC.",
-        ]
-    else:
-        # Default for Class VIII
-        lines = [
-            "1. Report at the respective center by 0800 hrs.",
-            "2. The written test will start at 0900 hrs and last 3 hours (till 1200 hrs).",
-            "3. Subjects: English, Mathematics, Urdu, Islamiat.",
-            "4. Bring this printed Roll Number Slip and your CNIC/Form-B.",
-            "5. Bring writing material; exam booklet will be provided.",
-            "6. Mobile phones are strictly prohibited.",
-            "7. Parents/Guardians must bring CNIC.",
-        ]
-    
-    y = instr_y - 20
-    for line in lines:
-        p.drawString(65, y, line)
-        y -= 18
-    
-    # ═══════════════════════════════════════════════════════
-    # 📧 FOOTER (Gold Line + Contact Info)
-    # ═══════════════════════════════════════════════════════
-    footer_y = 70
-    
-    # Gold separator line
-    p.setStrokeColor(MCM_GOLD)
-    p.setLineWidth(2)
-    p.line(50, footer_y + 20, width - 50, footer_y + 20)
-    
-    # Footer text
-    p.setFillColor(MCM_GREEN)
-    p.setFont("Helvetica-Oblique", 9)
-    p.drawCentredString(width / 2, footer_y + 5, "Admission Office - Military College Murree")
-    
+
     p.showPage()
+
+
+def generate_roll_number_pdf(application):
+    """Generates a professional, beautifully styled Roll Number Slip PDF with MCM branding."""
+    buffer = BytesIO()
+    p = canvas.Canvas(buffer, pagesize=A4)
+    draw_roll_slip(p, application)
     p.save()
     pdf_data = buffer.getvalue()
     buffer.close()
     return pdf_data
 
 
+#-----------------------
+# Photo derivatives
+#-----------------------
+PHOTO_PRINT_SIZE = (460, 460)  # 110 pt slip box at ~300 dpi
+PHOTO_THUMB_SIZE = (200, 200)  # admin lists and applicant views
+
+
+def _jpeg_derivative(image, size, quality):
+    img = image.copy()
+    img.thumbnail(size, Image.LANCZOS)
+    buffer = BytesIO()
+    img.save(buffer, 'JPEG', quality=quality, optimize=True, progressive=True)
+    return ContentFile(buffer.getvalue())
+
+
+def build_photo_derivatives(application):
+    """
+    Writes a print-resolution JPEG (for the roll slip) and a small thumbnail
+    next to the uploaded photo and records them on the application.
+    """
+    photo_name = application.photo.name
+    with application.photo.open('rb') as f:
+        image = ImageOps.exif_transpose(Image.open(f))
+        if image.mode in ('RGBA', 'LA', 'P'):
+            # Flatten transparency onto white; JPEG has no alpha channel
+            image = image.convert('RGBA')
+            background = Image.new('RGB', image.size, (255, 255, 255))
+            background.paste(image, mask=image.getchannel('A'))
+            image = background
+        else:
+            image = image.convert('RGB')
+
+    base = os.path.splitext(os.path.basename(photo_name))[0]
+    for field, suffix, size, quality in (
+        (application.photo_print, 'print', PHOTO_PRINT_SIZE, 85),
+        (application.photo_thumb, 'thumb', PHOTO_THUMB_SIZE, 80),
+    ):
+        if field:
+            try:
+                field.delete(save=False)
+            except Exception:
+                pass
+        field.save(f"{base}_{suffix}.jpg", _jpeg_derivative(image, size, quality), save=False)
+
+    # Only record them if the photo was not replaced again in the meantime
+    application.__class__.objects.filter(pk=application.pk, photo=photo_name).update(
+        photo_print=application.photo_print.name,
+        photo_thumb=application.photo_thumb.name,
+    )
+
+
 def get_fee_by_category(category):
     """
     Legacy fallback fee calculation by category.
@@ -245,40 +357,14 @@ def get_dynamic_fee_for_application(application, as_of_date=None):
     """
     Returns (amount, tier) where tier is one of: "normal","late"/"double","final"/"triple"
     Returns (None, 'closed') if applications should be stopped (stop_after_final True and after final_deadline).
+    Returns (None, 'no-config') if the class has no FeeConfig.
+    Priced from the compiled schedule (admissions.fees), no queries.
     """
-    as_of_date = as_of_date or date.today()
-    try:
-        config = FeeConfig.objects.get(class_name=application.class_name)
-    except FeeConfig.DoesNotExist:
-        return None, "no-config"
-
-    # stop condition
-    if config.stop_after_final and as_of_date > config.final_deadline:
-        return None, "closed"
-
-    # XI: flat model
-    if application.class_name == "XI":
-        if as_of_date <= config.normal_deadline:
-            return config.base_fee, "normal"
-        elif as_of_date <= config.late_deadline:
-            return config.double_fee, "double"
-        else:
-            return config.triple_fee, "triple"
-
-    # VIII: category-based
-    try:
-        cat = FeeCategoryConfig.objects.get(fee_config=config, category=application.category)
-        if as_of_date <= config.normal_deadline:
-            return cat.normal_fee, "normal"
-        elif as_of_date <= config.late_deadline:
-            return cat.late_fee, "late"
-        else:
-            return cat.final_fee, "final"
-    except FeeCategoryConfig.DoesNotExist:
-        # fallback to config base fee if category row missing
-        if as_of_date <= config.normal_deadline:
-            return config.base_fee, "normal"
-        elif as_of_date <= config.late_deadline:
-            return config.double_fee, "double"
-        else:
-            return config.triple_fee, "triple"
\ No newline at end of file
+    return get_config().fee_schedule.price(application.class_name, application.category, as_of_date)
+
+
+def get_dynamic_fees(applications, as_of_date=None):
+    """get_dynamic_fee_for_application for many applications at once (one date), in order."""
+    return get_config().fee_schedule.price_many(
+        ((application.class_name, application.category) for application in applications), as_of_date,
+    )
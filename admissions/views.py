@@ -4,13 +4,14 @@ from .models import FeeConfig, FeeCategoryConfig
 from .utils import get_dynamic_fee_for_application, get_fee_by_category
 from django.http import  Http404
 from .tasks import bulk_verify_applications_task
-from .tasks import broadcast_message_task
+from .tasks import broadcast_message_task, create_broadcast_job, start_broadcast_job
 from django.templatetags.static import static
 from django.core.mail import EmailMessage
 from django.utils.html import strip_tags
 from django.core.files.base import ContentFile
 import threading, os
 from django.core.paginator import Paginator
+from django.db import transaction
 from django.db.models import Q
 import json
 from django.db.models import Count
@@ -27,6 +28,7 @@ from django.contrib.auth.decorators import login_required, user_passes_test
 from django.template.loader import render_to_string
 from django.http import HttpResponse, JsonResponse
 from datetime import date
+from django.utils import timezone
 import random
 from django.contrib import messages
 from django.conf import settings
@@ -44,9 +46,20 @@ from reportlab.lib import colors
 from reportlab.pdfgen import canvas
 from reportlab.platypus import Table, TableStyle
 import io
-from .utils import generate_roll_number_pdf
+from .rendering import ensure_roll_slip, signed_roll_slip_path, ROLL_SLIP_LINK_SALT
+from .delivery import serve_file, serve_field_file, read_download_token
+from django.core import signing
+from django.http import StreamingHttpResponse
+from . import mailer
+from .models import EmailOutbox, BroadcastJob
+from .outbox import queue_emails
+from .audience import CHOICE_SEGMENTS, audience_counts, parse_segments
+from .bundles import bundle_name, bundle_scope, iter_bundle, iter_bundle_cached
+from .config import bump_config_version, ensure_field_visibility_rows, get_config
+from .search import search_applications
 # notifications model (app 'notifications' should be installed)
 from notifications.models import Notification
+from notifications.live import publish_events, publish_status, status_event
 from django.contrib.admin.views.decorators import staff_member_required
 from django.utils.decorators import method_decorator
 from django.shortcuts import render
@@ -133,9 +146,8 @@ def fee_management_dashboard(request):
             except ValueError:
                 messages.warning(request, "Fee values must be numeric. Some values were ignored.")
 
-        fee_config.save()
-
         # CLASS VIII: update category rows (if present)
+        changed_cats = []
         if fee_config.class_name == 'VIII':
             cats = FeeCategoryConfig.objects.filter(fee_config=fee_config)
             for cat in cats:
@@ -153,11 +165,17 @@ def fee_management_dashboard(request):
                         cat.late_fee = int(l_val)
                     if f_val is not None and f_val != '':
                         cat.final_fee = int(f_val)
-                    cat.save()
+                    changed_cats.append(cat)
                 except ValueError:
                     # skip malformed values but continue
                     continue
 
+        # fee_config.save() bumps the config version once; the category rows
+        # are written in the same transaction, so they need no bump of their own
+        with transaction.atomic():
+            fee_config.save()
+            FeeCategoryConfig.objects.bulk_update(changed_cats, ['normal_fee', 'late_fee', 'final_fee'])
+
         messages.success(request, "Fee configuration saved successfully.")
         # redirect back to same page (preserve query param)
         return redirect(f"{reverse('admissions:fee_management')}?class={selected_class}")
@@ -233,15 +251,8 @@ def fee_preview_ajax(request):
     except Exception:
         return JsonResponse({"success": False, "error": "Invalid date"})
 
-    class Dummy:
-        pass
-
-    dummy = Dummy()
-    dummy.class_name = class_name
-    dummy.category = category
-
     try:
-        amount, tier = get_dynamic_fee_for_application(dummy, as_of_date=d)
+        amount, tier = get_config().fee_schedule.price(class_name, category, as_of_date=d)
         return JsonResponse({"success": True, "amount": amount, "tier": tier})
     except Exception as e:
         return JsonResponse({"success": False, "error": str(e)})
@@ -373,15 +384,10 @@ def dashboard(request):
     # so dashboard can immediately compute dynamic fee.
     # ---------------------------------------------------
     try:
-        from .models import AdmissionSession
         user_class = getattr(user, 'class_applied', None)
 
         if user_class:
-            try:
-                session = AdmissionSession.objects.get(class_name=user_class)
-                session_open = bool(session.is_open)
-            except AdmissionSession.DoesNotExist:
-                session_open = False
+            session_open = get_config().is_open(user_class)
 
             # Case A: if application has no class -> set it (only if session open)
             if not application.class_name and session_open:
@@ -428,10 +434,6 @@ def dashboard(request):
                 amount = None
                 fee_tier = None
 
-    # Notifications
-    notifications = Notification.objects.filter(user=request.user).order_by('-created_at')[:10]
-    unread_count = Notification.objects.filter(user=request.user, is_read=False).count()
-
     context = {
         "application": application,
         "progress": progress,
@@ -442,9 +444,7 @@ def dashboard(request):
         "fee_tier": fee_tier,
         "admissions_closed": admissions_closed,
 
-        # UI
-        "notifications": notifications,
-        "unread_count": unread_count,
+        # Notifications and unread_count come from notifications.context_processors
     }
 
     return render(request, "admissions/dashboard.html", context)
@@ -467,16 +467,10 @@ def complete_application(request):
     # 2. user.class_applied exists,
     # 3. AdmissionSession for that class is OPEN
     # -----------------------------
-    from .models import AdmissionSession
-
     user_class = getattr(user, 'class_applied', None)
 
     if user_class:
-        try:
-            session = AdmissionSession.objects.get(class_name=user_class)
-            session_open = bool(session.is_open)
-        except AdmissionSession.DoesNotExist:
-            session_open = False
+        session_open = get_config().is_open(user_class)
 
         # Case A: Application has NO class assigned → set it (only if session open)
         if not application.class_name:
@@ -594,10 +588,8 @@ def complete_application(request):
     # -----------------------------
     # Field visibility controls (unchanged)
     # -----------------------------
-    for field_name in list(form.fields.keys()):
-        FormFieldVisibility.objects.get_or_create(field_name=field_name, defaults={'is_visible': True})
-
-    visible_fields = FormFieldVisibility.objects.filter(is_visible=True).values_list('field_name', flat=True)
+    ensure_field_visibility_rows(form.fields)
+    visible_fields = get_config().visible_fields
     for field in list(form.fields.keys()):
         if field not in visible_fields:
             del form.fields[field]
@@ -692,29 +684,20 @@ def verify_challan_action(request, app_id, action):
         app.payment_status = 'verified'
         app.status = 'verified'
 
-        # Ensure roll number and secure token
-        if not app.roll_number:
-            app.roll_number = app.generate_roll_number()
-        if not app.secure_token:
-            import uuid
-            app.secure_token = uuid.uuid4().hex[:12]
-
+        # Ensure roll number and secure token (short transaction: the roll
+        # number counter row is only locked until this commits)
+        with transaction.atomic():
+            if not app.roll_number:
+                app.roll_number = app.generate_roll_number()
+            if not app.secure_token:
+                import uuid
+                app.secure_token = uuid.uuid4().hex[:12]
+            app.save(update_fields=['payment_status', 'status', 'roll_number', 'secure_token'])
+
+        # The roll slip PDF is rendered on first download (see ensure_roll_slip)
         try:
-            # Generate PDF Roll Slip
-            pdf_data = generate_roll_number_pdf(app)
-            filename = f"RollSlip_{app.roll_number}.pdf"
-
-            # Save PDF file (for dashboard download)
-            if app.roll_slip:
-                try:
-                    app.roll_slip.delete(save=False)
-                except Exception:
-                    pass
-            app.roll_slip.save(filename, ContentFile(pdf_data), save=False)
-            app.save(update_fields=['roll_slip', 'payment_status', 'status', 'roll_number', 'secure_token'])
-
             # ✅ Build secure download link
-            download_link = f"{request.scheme}://{request.get_host()}/admissions/download-roll-slip/{app.secure_token}/"
+            download_link = f"{request.scheme}://{request.get_host()}{signed_roll_slip_path(app)}"
 
             # ✅ Email body (detailed)
             if app.class_name == 'XI':
@@ -772,10 +755,10 @@ def verify_challan_action(request, app_id, action):
                 to=[app.user.email],
             )
 
-            threading.Thread(target=lambda e: e.send(fail_silently=True), args=(email,), daemon=True).start()
+            queue_emails([(app.user_id, email)], category='roll_slip')
 
         except Exception as e:
-            logger.error("Error generating/saving PDF or sending email", exc_info=True)
+            logger.error("Error queuing verification email", exc_info=True)
 
         # Create notification
         try:
@@ -786,6 +769,7 @@ def verify_challan_action(request, app_id, action):
             )
         except Exception as e:
             logger.error("Notification error", exc_info=True)
+        publish_status(app)
 
         message_text = f"✅ Challan for {app.name} verified successfully."
 
@@ -793,6 +777,7 @@ def verify_challan_action(request, app_id, action):
         app.payment_status = 'rejected'
         app.status = 'rejected'
         app.save(update_fields=['payment_status', 'status'])
+        publish_status(app)
 
         # Notify student (in-app)
         try:
@@ -827,10 +812,10 @@ def verify_challan_action(request, app_id, action):
                 to=[app.user.email],
             )
 
-            threading.Thread(target=lambda e: e.send(fail_silently=True), args=(email,), daemon=True).start()
+            queue_emails([(app.user_id, email)], category='rejection')
 
         except Exception as e:
-            logger.error("Error sending rejection email", exc_info=True)
+            logger.error("Error queuing rejection email", exc_info=True)
 
         message_text = f"❌ Challan for {app.name} rejected."
 
@@ -854,7 +839,8 @@ def admin_dashboard(request):
     
     # Ensure sessions exist for each defined class
     for code, _ in AdmissionSession.CLASS_CHOICES:
-        AdmissionSession.objects.get_or_create(class_name=code)
+        if code not in get_config().sessions:
+            AdmissionSession.objects.get_or_create(class_name=code)
 
     # Handle toggle action
     if request.method == "POST" and request.POST.get("action") == "toggle_admission":
@@ -872,8 +858,7 @@ def admin_dashboard(request):
             messages.error(request, "Invalid class selected.")
 
     # Initialize FormFieldVisibility rows (if not present)
-    for field in ApplicationForm().fields.keys():
-        FormFieldVisibility.objects.get_or_create(field_name=field)
+    ensure_field_visibility_rows(ApplicationForm().fields)
 
     # Applicant summary
     applications = Application.objects.select_related('user').all().order_by('-submission_date')
@@ -928,13 +913,7 @@ def admin_applicants_api(request):
     # 🔍 Search Filter
     q = request.GET.get('q', '').strip()
     if q:
-        qs = qs.filter(
-            Q(name__icontains=q) |
-            Q(father_name__icontains=q) |
-            Q(roll_number__icontains=q) |
-            Q(form_b__icontains=q) |
-            Q(father_cnic__icontains=q)
-        )
+        qs = search_applications(qs, q)
     # 🏷 Category Filter  ⭐ ADD THIS ⭐
     category = request.GET.get('category', '').strip()
     if category:
@@ -1007,129 +986,23 @@ def bulk_applicant_action(request):
     # BULK VERIFY
     # ----------------------
     if action == 'verify':
-        def verify_worker(to_verify_qs, admin_user=None):
-            for app in to_verify_qs:
-                try:
-                    app.payment_status = 'verified'
-                    app.status = 'verified'
-
-                    # Generate roll number and secure token
-                    if not app.roll_number:
-                        app.roll_number = app.generate_roll_number()
-                    if not app.secure_token:
-                        import uuid
-                        app.secure_token = uuid.uuid4().hex[:12]
-
-                    app.save(update_fields=['payment_status', 'status', 'roll_number', 'secure_token'])
-
-                    # Generate Roll Slip PDF
-                    try:
-                        pdf_data = generate_roll_number_pdf(app)
-                        filename = f"RollSlip_{app.roll_number}.pdf"
-                        if app.roll_slip:
-                            try:
-                                app.roll_slip.delete(save=False)
-                            except Exception:
-                                pass
-                        app.roll_slip.save(filename, ContentFile(pdf_data), save=False)
-                        app.save(update_fields=['roll_slip'])
-                    except Exception as e:
-                        logger.error(f"PDF generation error for {app.id}", exc_info=True)
-
-                    # Build secure download link
-                    download_link = f"{request.scheme}://{request.get_host()}/admissions/download-roll-slip/{app.secure_token}/"
-
-                    # Detailed verification email (same content as verify_challan_action with phone)
-                    if app.class_name == 'XI':
-                        email_body = (
-                            f"Dear {app.name},\n\n"
-                            f"Your application has been verified successfully.\n\n"
-                            f"Roll Number: {app.roll_number}\n"
-                            f"Father’s Name: {app.father_name}\n"
-                            f"Test Center: {app.get_test_center_display()}\n\n"
-                            "📅 Examination Schedule:\n"
-                            "• Report at respective center: 0800 hrs\n"
-                            "• Start of written test: 0900 hrs\n"
-                            "• Duration: 4 hours (till 1300 hrs)\n\n"
-                            "🖊 Subjects: English, Mathematics, Physics, and Chemistry.\n\n"
-                            "⚠ Important Instructions:\n"
-                            "1. Bring your Roll Number Slip and writing material. Calculator is also allowed.\n"
-                            "2. Entrance Exam booklet will be provided at the center.\n"
-                            "3. Missing the test for any reason means no re-examination.\n"
-                            "4. Mobile phones are not allowed.\n"
-                            "5. Parents/Guardians must bring CNIC.\n\n"
-                            f"👉 Download your Roll Number Slip securely here:\n{download_link}\n\n"
-                            "Alternatively, log in to your MCM Admission Portal to download it anytime.\n\n"
-                            f"For queries contact: {CONTACT_EMAIL} | Phone: {CONTACT_PHONE}\n\n"
-                            "Regards,\nAdmission Office\nMilitary College Murree"
-                        )
-                    else:
-                        # Default for Class VIII
-                        email_body = (
-                            f"Dear {app.name},\n\n"
-                            f"Your application has been verified successfully.\n\n"
-                            f"Roll Number: {app.roll_number}\n"
-                            f"Father’s Name: {app.father_name}\n"
-                            f"Test Center: {app.get_test_center_display()}\n\n"
-                            "📅 Examination Schedule:\n"
-                            "• Report at respective center: 0800 hrs\n"
-                            "• Start of written test: 0900 hrs\n"
-                            "• Duration: 3 hours (till 1200 hrs)\n\n"
-                            "🖊 Subjects: English, Mathematics, Urdu, and Islamiyat.\n\n"
-                            "⚠ Important Instructions:\n"
-                            "1. Bring your Roll Number Slip and writing material.\n"
-                            "2. Entrance Exam booklet will be provided at the center.\n"
-                            "3. Missing the test for any reason means no re-examination.\n"
-                            "4. Mobile phones are not allowed.\n"
-                            "5. Parents/Guardians must bring CNIC.\n\n"
-                            f"👉 Download your Roll Number Slip securely here:\n{download_link}\n\n"
-                            "Alternatively, log in to your MCM Admission Portal to download it anytime.\n\n"
-                            f"For queries contact: {CONTACT_EMAIL} | Phone: {CONTACT_PHONE}\n\n"
-                            "Regards,\nAdmission Office\nMilitary College Murree"
-                        )
-
-                    email = EmailMessage(
-                        subject="🎓 Roll Number Slip - Military College Murree",
-                        body=email_body,
-                        from_email=settings.DEFAULT_FROM_EMAIL,
-                        to=[app.user.email],
-                    )
-
-                    # Send in background
-                    threading.Thread(target=lambda e: e.send(fail_silently=True), args=(email,), daemon=True).start()
-
-                    # Notification
-                    try:
-                        Notification.objects.create(
-                            user=app.user,
-                            title="Challan Verified",
-                            message=f"🎉 Your challan has been verified. Roll Number: {app.roll_number}"
-                        )
-                    except Exception as e:
-                        logger.error(f"Notification error for {app.id}", exc_info=True)
-
-                    processed.append(str(app.id))
-
-                except Exception as ex:
-                    errors.append(str(ex))
-        from .tasks import bulk_verify_applications_task
+        from .tasks import bulk_verify_applications_task, run_in_background
 
         # Get absolute base URL (for secure link building)
         base_url = f"{request.scheme}://{request.get_host()}"
+        app_ids = list(apps.values_list('id', flat=True))
         apps.update(
         status='verified',
         payment_status='verified'
         )
 
-        # Trigger Celery task instead of thread
+        # Trigger Celery task; the chunked pipeline reserves roll numbers in
+        # blocks and hands slips/emails to their own stages
         try:
-            bulk_verify_applications_task.delay(
-                list(apps.values_list('id', flat=True)),
-                f"{request.scheme}://{request.get_host()}"
-            )
+            bulk_verify_applications_task.delay(app_ids, base_url)
         except Exception as e:
             logger.warning("Celery task failed, fallback to threaded worker", exc_info=True)
-            threading.Thread(target=verify_worker, args=(list(apps), request.user), daemon=True).start()
+            run_in_background(bulk_verify_applications_task)(app_ids, base_url)
 
     # ----------------------
     # BULK REJECT
@@ -1137,49 +1010,43 @@ def bulk_applicant_action(request):
     elif action == 'reject':
         apps.update(payment_status='rejected', status='rejected')
 
-        def reject_worker(rejected_qs):
-            for app in rejected_qs:
-                try:
-                    # Create in-app notification
-                    try:
-                        Notification.objects.create(
-                            user=app.user,
-                            title="Challan Rejected",
-                            message="❌ Your challan has been rejected. Please contact the admission office for further assistance."
-                        )
-                    except Exception:
-                        pass
-
-                    # Rejection email (polite, include contact phone & email)
-                    email_body = (
-                        f"Dear {app.name},\n\n"
-                        "We regret to inform you that your submitted challan could not be verified.\n\n"
-                        "Please ensure that all payment details were entered correctly and that the bank stamp "
-                        "or transaction slip is valid and readable.\n\n"
-                        "If you believe this was a mistake or have already resolved the issue, "
-                        "please contact the Admission Office at Military College Murree for clarification.\n\n"
-                        f"Contact: {CONTACT_EMAIL}\n"
-                        f"Phone: {CONTACT_PHONE}\n\n"
-                        "⏰ Office Hours: 08:00 AM – 02:00 PM (Mon–Fri)\n\n"
-                        "Thank you for your understanding.\n\n"
-                        "Regards,\nAdmission Office\nMilitary College Murree"
-                    )
-
-                    email = EmailMessage(
-                        subject="❌ Challan Rejected - Military College Murree",
-                        body=email_body,
-                        from_email=settings.DEFAULT_FROM_EMAIL,
-                        to=[app.user.email],
-                    )
-
-                    threading.Thread(target=lambda e: e.send(fail_silently=True), args=(email,), daemon=True).start()
-
-                    processed.append(str(app.id))
-
-                except Exception as e:
-                    errors.append(str(e))
-
-        threading.Thread(target=reject_worker, args=(list(apps),), daemon=True).start()
+        notifications, emails, status_events = [], [], []
+        for app in apps.select_related('user'):
+            status_events.append(status_event(app))
+            notifications.append(Notification(
+                user_id=app.user_id,
+                title="Challan Rejected",
+                message="❌ Your challan has been rejected. Please contact the admission office for further assistance."
+            ))
+
+            # Rejection email (polite, include contact phone & email)
+            if app.user.email:
+                email_body = (
+                    f"Dear {app.name},\n\n"
+                    "We regret to inform you that your submitted challan could not be verified.\n\n"
+                    "Please ensure that all payment details were entered correctly and that the bank stamp "
+                    "or transaction slip is valid and readable.\n\n"
+                    "If you believe this was a mistake or have already resolved the issue, "
+                    "please contact the Admission Office at Military College Murree for clarification.\n\n"
+                    f"Contact: {CONTACT_EMAIL}\n"
+                    f"Phone: {CONTACT_PHONE}\n\n"
+                    "⏰ Office Hours: 08:00 AM – 02:00 PM (Mon–Fri)\n\n"
+                    "Thank you for your understanding.\n\n"
+                    "Regards,\nAdmission Office\nMilitary College Murree"
+                )
+                emails.append((app.user_id, EmailMessage(
+                    subject="❌ Challan Rejected - Military College Murree",
+                    body=email_body,
+                    from_email=settings.DEFAULT_FROM_EMAIL,
+                    to=[app.user.email],
+                )))
+            processed.append(str(app.id))
+
+        # Inserts only; the outbox worker sends the emails
+        with transaction.atomic():
+            Notification.objects.bulk_create(notifications)
+            queue_emails(emails, category='rejection')
+            publish_events(status_events)
 
     # ----------------------
     # ASSIGN CENTER
@@ -1211,9 +1078,17 @@ def view_applicant(request, app_id):
 def form_field_control(request):
     fields = FormFieldVisibility.objects.all().order_by('field_name')
     if request.method == "POST":
+        visible = set(request.POST.getlist("visible_fields"))
+        changed = []
         for field in fields:
-            field.is_visible = field.field_name in request.POST.getlist("visible_fields")
-            field.save()
+            if field.is_visible != (field.field_name in visible):
+                field.is_visible = not field.is_visible
+                changed.append(field)
+        if changed:
+            # One write and one config version bump for the whole form
+            with transaction.atomic():
+                FormFieldVisibility.objects.bulk_update(changed, ['is_visible'])
+                bump_config_version()
         messages.success(request, "Form field visibility updated successfully!")
         return redirect('admissions:form_field_control')
     return render(request, 'admissions/form_field_control.html', {'fields': fields})
@@ -1254,38 +1129,89 @@ def download_roll_slip_dashboard(request):
         messages.warning(request, "Your roll number slip will be available after verification.")
         return redirect('admissions:dashboard')
 
-    # Regenerate if missing
-    if not app.roll_slip or not os.path.exists(app.roll_slip.path):
-        pdf_data = generate_roll_number_pdf(app)
-        pdf_filename = f"RollSlip_{app.roll_number or 'Pending'}.pdf"
-        pdf_path = os.path.join(settings.MEDIA_ROOT, 'roll_slips', pdf_filename)
-
-        os.makedirs(os.path.dirname(pdf_path), exist_ok=True)
-        with open(pdf_path, "wb") as f:
-            f.write(pdf_data)
-
-        app.roll_slip.name = f"roll_slips/{pdf_filename}"
-        app.save(update_fields=['roll_slip'])
+    # Rendered on first download; served from the slip cache afterwards
+    name = ensure_roll_slip(app)
 
-    return FileResponse(
-        open(app.roll_slip.path, 'rb'),
+    return serve_file(
+        request, name,
+        filename=f"RollSlip_{app.roll_number or 'Pending'}.pdf",
         as_attachment=True,
-        filename=os.path.basename(app.roll_slip.name)
     )
+
+
+def download_roll_slip_signed(request, signed):
+    """
+    Serve a roll slip from a signed, expiring link. The token names the slip
+    file, so a slip that is already rendered is served without touching the
+    database; otherwise the application is looked up once and rendered.
+    """
+    try:
+        payload = read_download_token(signed, salt=ROLL_SLIP_LINK_SALT)
+    except signing.BadSignature:
+        raise Http404("Invalid or expired download link.")
+
+    try:
+        return serve_file(request, payload['n'], filename=payload['f'], as_attachment=True)
+    except Http404:
+        pass
+
+    # Not rendered yet, or re-rendered since the link was issued
+    app = get_object_or_404(Application, id=payload['a'], status='verified')
+    name = ensure_roll_slip(app)
+    return serve_file(request, name, filename=f"RollSlip_{app.roll_number}.pdf", as_attachment=True)
+
+
 def download_roll_slip(request, token):
-    """Securely serve roll slip PDFs to verified applicants using unique tokens."""
+    """Legacy secure_token links from emails sent before links were signed."""
     try:
         app = Application.objects.get(secure_token=token, status='verified')
-        if not app.roll_slip:
-            raise Http404("Roll slip not found.")
-
-        return FileResponse(
-            open(app.roll_slip.path, 'rb'),
-            as_attachment=True,
-            filename=f"RollSlip_{app.roll_number}.pdf"
-        )
     except Application.DoesNotExist:
         raise Http404("Invalid or expired download link.")
+
+    name = ensure_roll_slip(app)
+    return serve_file(request, name, filename=f"RollSlip_{app.roll_number}.pdf", as_attachment=True)
+
+
+# Uploaded documents that can be opened through application_file
+APPLICATION_FILE_FIELDS = ('photo', 'payment_proof', 'challan_image', 'marksheet_9th', 'marksheet_10th')
+
+
+@login_required
+def application_file(request, app_id, field):
+    """Serve an uploaded document to staff or to the applicant who owns it."""
+    if field not in APPLICATION_FILE_FIELDS:
+        raise Http404("File not found.")
+    app = get_object_or_404(Application.objects.only('id', 'user_id', field), id=app_id)
+    if not (staff_required(request.user) or app.user_id == request.user.id):
+        raise Http404("File not found.")
+    return serve_field_file(request, getattr(app, field))
+
+
+@user_passes_test(staff_required)
+def roll_slip_bundle(request):
+    """
+    One PDF with every verified slip for a test center and/or class, in roll
+    number order. Served from the bundle cache when it is current, otherwise
+    streamed part by part while it is written to the cache.
+    """
+    test_center = request.GET.get('center', '').strip() or None
+    class_name = request.GET.get('class_name', '').strip() or None
+    if test_center and test_center not in dict(Application.TEST_CENTERS):
+        raise Http404("Unknown test center.")
+    if class_name and class_name not in ('VIII', 'XI'):
+        raise Http404("Unknown class.")
+
+    name = bundle_name(test_center, class_name)
+    filename = f"RollSlips_{bundle_scope(test_center, class_name)}.pdf"
+    if os.path.exists(os.path.join(settings.MEDIA_ROOT, name)):
+        return serve_file(request, name, filename=filename, as_attachment=True)
+
+    response = StreamingHttpResponse(
+        iter_bundle_cached(name, iter_bundle(test_center, class_name)),
+        content_type='application/pdf',
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
 # ────────────────────────────────────────────────────────────────
 # 📊 PHASE 2 — ADMIN ANALYTICS DASHBOARD (Chart.js Integration)
 # ────────────────────────────────────────────────────────────────
@@ -1307,6 +1233,14 @@ def download_roll_slip(request, token):
 # ────────────────────────────────────────────────────────────────
 
 
+@user_passes_test(staff_required)
+def mail_stats(request):
+    """Outbox counts per status, plus this process's dispatcher throughput and quota use."""
+    return JsonResponse({
+        'outbox': EmailOutbox.status_counts(),
+        'dispatcher': mailer.get_dispatcher().stats(),
+    })
+
 
 @user_passes_test(staff_required)
 def analytics_data(request):
@@ -1524,13 +1458,7 @@ def get_filtered_applicants(request):
     # 🔍 Search
     q = request.GET.get('q', '').strip()
     if q:
-        qs = qs.filter(
-            Q(name__icontains=q) |
-            Q(father_name__icontains=q) |
-            Q(roll_number__icontains=q) |
-            Q(form_b__icontains=q) |
-            Q(father_cnic__icontains=q)
-        )
+        qs = search_applications(qs, q)
 
     # 🏷 Category
     category = request.GET.get('category', '').strip()
@@ -1574,7 +1502,8 @@ def get_filtered_applicants(request):
         qs = qs.exclude(admin_remarks__icontains="shaheed") \
                .exclude(admin_remarks__icontains="in service death")
 
-    return qs.order_by('-submission_date')
+    # Searches come back ranked (best match first)
+    return qs if q else qs.order_by('-submission_date')
 
 
 
@@ -1596,26 +1525,74 @@ def broadcast_messages(request):
         send_inapp = 'send_inapp' in request.POST
 
         template = MessageTemplate.objects.get(id=template_id)
-
-        # ✅ Use Celery (or threaded fallback automatically)
+        base_url = f"{request.scheme}://{request.get_host()}"
         try:
-            broadcast_message_task.delay(template.id, send_email, send_inapp)
-        except Exception:
-            # fallback to direct call (threaded mode)
-            broadcast_message_task(template.id, send_email, send_inapp)
+            segments = parse_segments(request.POST)
+        except ValueError as e:
+            messages.error(request, f"❌ {e}")
+            return redirect('admissions:broadcast_messages')
+
+        # ✅ Tracked job, run by Celery (or a background thread automatically)
+        job = create_broadcast_job(template, send_email, send_inapp, segments, base_url, user=request.user)
+        start_broadcast_job(job)
 
         sent = True
 
-    return render(request, 'admin_portal/broadcast_messages.html', {'templates': templates, 'sent': sent})
+    return render(request, 'admin_portal/broadcast_messages.html', {
+        'templates': templates,
+        'sent': sent,
+        'jobs': BroadcastJob.objects.order_by('-created_at')[:10],
+        'stall_seconds': BroadcastJob.STALL_SECONDS,
+        'class_choices': CHOICE_SEGMENTS['class_name'].items(),
+        'status_choices': Application.STATUS_CHOICES,
+        'payment_choices': CHOICE_SEGMENTS['payment_status'].items(),
+        'category_choices': Application.CATEGORY_CHOICES,
+        'center_choices': Application.TEST_CENTERS,
+    })
+
+@login_required
+@user_passes_test(staff_required)
+def broadcast_job_status(request, job_id):
+    """Progress of one broadcast job (a single-row read, polled by the broadcast page)."""
+    job = get_object_or_404(BroadcastJob, id=job_id)
+    progress = job.progress()
+    progress['stalled'] = job.is_stalled
+    return JsonResponse(progress)
+
+
+@login_required
+@user_passes_test(staff_required)
+def broadcast_job_resume(request, job_id):
+    """Restart a stalled job; finished chunks are skipped, the rest continue from their checkpoint."""
+    if request.method != "POST":
+        return JsonResponse({'error': 'POST required'}, status=405)
+    job = get_object_or_404(BroadcastJob, id=job_id)
+    if job.is_finished:
+        return JsonResponse({'error': 'This broadcast has already finished.'}, status=400)
+    # A job that is still checkpointing is still being sent; resuming it would only race its workers
+    if not job.claim_resume():
+        return JsonResponse({'error': 'This broadcast is still running.'}, status=409)
+    start_broadcast_job(job)
+    return JsonResponse({'success': True})
+
 
 @login_required
 @user_passes_test(staff_required)
 def broadcast_preview(request):
     """
-    Live preview of selected message template before broadcast.
+    Live preview of selected message template before broadcast, with the
+    number of recipients the selected segments reach (?format=json returns
+    just the counts).
     """
     from django.templatetags.static import static
 
+    try:
+        audience = audience_counts(parse_segments(request.GET))
+    except ValueError as e:
+        audience = {'error': str(e)}
+    if request.GET.get('format') == 'json':
+        return JsonResponse(audience, status=400 if 'error' in audience else 200)
+
     template_id = request.GET.get('template_id')
     if template_id:
         try:
@@ -1641,7 +1618,8 @@ def broadcast_preview(request):
         'subject': subject,
         'body': body,
         'logo_url': logo_url,
-        'name': "Cadet Name"
+        'name': "Cadet Name",
+        'audience': audience,
     })
 
 
@@ -81,6 +81,7 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'notifications.context_processors.notifications',
             ],
         },
     },
@@ -131,6 +132,8 @@ EMAIL_USE_SSL = True
 
 EMAIL_SSL_CERTFILE = None
 EMAIL_SSL_KEYFILE = None
+# Hard limit (seconds) on every SMTP connect/read, so a hung server cannot block a worker
+EMAIL_TIMEOUT = int(os.getenv('EMAIL_TIMEOUT', 10))
 
 EMAIL_HOST_USER = 'mcm.admission.portal@gmail.com'
 EMAIL_HOST_PASSWORD = 'zmke tkxb iaxu ofsa'
@@ -143,6 +146,27 @@ if not EMAIL_HOST_USER:
 else:
     DEFAULT_FROM_EMAIL = f"Military College Murree <{EMAIL_HOST_USER}>"
 
+# Mail dispatcher (admissions/mailer.py): pooled connections, batched sends.
+# Quotas of 0 mean unlimited; Gmail allows ~500/day (2,000 on Workspace).
+# They are counted in the database (MailCounter), so they hold across
+# every worker process and node.
+MAIL_POOL_SIZE = int(os.getenv('MAIL_POOL_SIZE', 2))
+MAIL_BATCH_SIZE = int(os.getenv('MAIL_BATCH_SIZE', 50))
+MAIL_RATE_PER_MINUTE = int(os.getenv('MAIL_RATE_PER_MINUTE', 0))
+MAIL_RATE_PER_DAY = int(os.getenv('MAIL_RATE_PER_DAY', 0))
+MAIL_IDLE_TIMEOUT = int(os.getenv('MAIL_IDLE_TIMEOUT', 60))
+# Circuit breaker: after this many consecutive connection failures, stop
+# trying SMTP for MAIL_BREAKER_COOLDOWN seconds (queued mail waits).
+MAIL_BREAKER_FAILURES = int(os.getenv('MAIL_BREAKER_FAILURES', 5))
+MAIL_BREAKER_COOLDOWN = int(os.getenv('MAIL_BREAKER_COOLDOWN', 120))
+
+# Email outbox (admissions/outbox.py): failed sends are retried after
+# BACKOFF * 2**(attempt-1) seconds, capped at MAX_BACKOFF, and dead-lettered
+# after MAX_ATTEMPTS.
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv('EMAIL_OUTBOX_MAX_ATTEMPTS', 6))
+EMAIL_OUTBOX_BACKOFF = int(os.getenv('EMAIL_OUTBOX_BACKOFF', 60))
+EMAIL_OUTBOX_MAX_BACKOFF = int(os.getenv('EMAIL_OUTBOX_MAX_BACKOFF', 6 * 60 * 60))
+
 # ============================
 # STATIC & MEDIA
 # ============================
@@ -156,6 +180,16 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Protected downloads (roll slips, uploaded documents) are authorized by
+# Django and sent by the front proxy: 'nginx' (X-Accel-Redirect to an
+# internal location aliasing MEDIA_ROOT), 'sendfile' (X-Sendfile), or
+# unset to stream them from Django. See admissions/delivery.py.
+FILE_DELIVERY_BACKEND = os.getenv('FILE_DELIVERY_BACKEND') or None
+FILE_DELIVERY_PREFIX = os.getenv('FILE_DELIVERY_PREFIX', '/protected-media/')
+
+# Lifetime of the signed roll slip links sent by email (seconds)
+ROLL_SLIP_LINK_MAX_AGE = int(os.getenv('ROLL_SLIP_LINK_MAX_AGE', 60 * 60 * 24 * 60))
+
 # LOGIN/LOGOUT
 LOGIN_URL = '/accounts/login/'
 LOGIN_REDIRECT_URL = '/admissions/dashboard/'
@@ -177,6 +211,64 @@ CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = TIME_ZONE
 
+# Periodic tasks (celery -A mcm_admission beat)
+CELERY_BEAT_SCHEDULE = {
+    # Picks up retries and anything queued while the workers were down
+    'drain-email-outbox': {
+        'task': 'admissions.tasks.drain_email_outbox_task',
+        'schedule': 60.0,
+    },
+    # Batched deletes of expired rows (admissions/retention.py)
+    'purge-old-records': {
+        'task': 'admissions.tasks.retention_task',
+        'schedule': 60.0 * 60 * 24,
+    },
+}
+
+# ============================
+# RETENTION (admissions/retention.py)
+# ============================
+# Read notifications (and read broadcast receipts) are kept this many days
+RETENTION_NOTIFICATION_DAYS = int(os.getenv('RETENTION_NOTIFICATION_DAYS', 90))
+# Used verification codes go at once; unused ones after this many days
+RETENTION_VERIFICATION_DAYS = int(os.getenv('RETENTION_VERIFICATION_DAYS', 7))
+# Sent / dead outbox emails
+RETENTION_OUTBOX_DAYS = int(os.getenv('RETENTION_OUTBOX_DAYS', 30))
+# Completed / failed broadcast jobs and their chunks
+RETENTION_BROADCAST_JOB_DAYS = int(os.getenv('RETENTION_BROADCAST_JOB_DAYS', 180))
+
+# ============================
+# CACHE
+# ============================
+# Shared by every web process and Celery worker, so a cache entry dropped by
+# the process that changed the data is gone for all of them (the
+# notification bell, notifications.counters). Redis, e.g.
+# redis://localhost:6379/2; empty falls back to a per-process memory cache,
+# which is only correct with a single process.
+CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL', 'redis://localhost:6379/2')
+if CACHE_REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': CACHE_REDIS_URL,
+            'KEY_PREFIX': 'mcm',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+# ============================
+# LIVE EVENTS (notifications/live.py)
+# ============================
+# Redis for dashboard live events, e.g. redis://localhost:6379/1. Needed as
+# soon as events come from Celery workers or more than one web process;
+# empty keeps them in-process.
+LIVE_EVENTS_REDIS_URL = os.getenv('LIVE_EVENTS_REDIS_URL', '')
+
 # CONTACT INFO
 ADMISSION_CONTACT_EMAIL = 'mcm.admission.portal@gmail.com'
 ADMISSION_CONTACT_PHONE = '051-3752010'
@@ -1,3 +1,12 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import BroadcastNotification
+
+
+@admin.register(BroadcastNotification)
+class BroadcastNotificationAdmin(admin.ModelAdmin):
+    list_display = ('title', 'created_at', 'recipients')
+    search_fields = ('title', 'message')
+
+    def recipients(self, obj):
+        return obj.receipts.count()
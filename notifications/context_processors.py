@@ -0,0 +1,20 @@
+"""
+Notification bell for every page (templates/base.html).
+
+`notifications` and `unread_count` are lazy: nothing is read unless the
+template uses them, and then the recent notifications come from the shared
+per-user cache kept by notifications.counters.
+"""
+from django.utils.functional import SimpleLazyObject
+
+from .utils import cached_recent_notifications, unread_count
+
+
+def notifications(request):
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return {}
+    return {
+        'notifications': SimpleLazyObject(lambda: cached_recent_notifications(user)),
+        'unread_count': SimpleLazyObject(lambda: unread_count(user)),
+    }
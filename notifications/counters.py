@@ -0,0 +1,110 @@
+"""
+Per-user unread counters.
+
+UnreadCounter.unread is moved with F() updates in the same transaction as
+the rows it counts (see UnreadCountingQuerySet and the mark-as-read views),
+and read through the shared cache (settings.CACHES) for up to
+UNREAD_CACHE_TIMEOUT seconds. Whenever a user's count moves, their cached
+count and recent notifications (see
+notifications.utils.cached_recent_notifications) are dropped once the
+transaction commits, for every process at once.
+"""
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, F
+from django.db.models.functions import Greatest
+
+from .models import BroadcastReceipt, Notification, UnreadCounter
+
+UNREAD_CACHE_TIMEOUT = 5 * 60
+
+
+def _cache_key(user_id):
+    return f"notif:unread:{user_id}"
+
+
+def recent_cache_key(user_id):
+    return f"notif:recent:{user_id}"
+
+
+def _invalidate(user_ids):
+    keys = [key for user_id in user_ids for key in (_cache_key(user_id), recent_cache_key(user_id))]
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def add_unread(user_ids):
+    """Count one more unread item for every occurrence of a user id in `user_ids`."""
+    per_user = Counter(user_ids)
+    if not per_user:
+        return
+    # Users without a counter get one, counted from the tables, on first read
+    by_amount = {}
+    for user_id, amount in per_user.items():
+        by_amount.setdefault(amount, []).append(user_id)
+    for amount, ids in by_amount.items():
+        UnreadCounter.objects.filter(user_id__in=ids).update(unread=F('unread') + amount)
+    _invalidate(per_user)
+
+
+def mark_read(user_id, amount=1):
+    """Count `amount` fewer unread items for a user (never below zero)."""
+    if amount:
+        UnreadCounter.objects.filter(user_id=user_id).update(unread=Greatest(F('unread') - amount, 0))
+        _invalidate([user_id])
+
+
+def count_unread(user_id):
+    """Unread items straight from the notification tables."""
+    return (
+        Notification.objects.filter(user_id=user_id, is_read=False).count()
+        + BroadcastReceipt.objects.filter(user_id=user_id, is_read=False).count()
+    )
+
+
+def get_unread_count(user_id):
+    """The user's unread count, from the cache when possible."""
+    key = _cache_key(user_id)
+    unread = cache.get(key)
+    if unread is None:
+        unread = UnreadCounter.objects.filter(user_id=user_id).values_list('unread', flat=True).first()
+        if unread is None:
+            # No counter yet (e.g. notifications from before counters existed)
+            unread = count_unread(user_id)
+            UnreadCounter.objects.get_or_create(user_id=user_id, defaults={'unread': unread})
+        cache.set(key, unread, UNREAD_CACHE_TIMEOUT)
+    return unread
+
+
+def reconcile(user_ids=None):
+    """
+    Recount unread items and fix counters that disagree. Returns the number
+    of counters corrected or created.
+    """
+    personal = Notification.objects.filter(is_read=False)
+    receipts = BroadcastReceipt.objects.filter(is_read=False)
+    counters = UnreadCounter.objects.all()
+    if user_ids is not None:
+        personal = personal.filter(user_id__in=user_ids)
+        receipts = receipts.filter(user_id__in=user_ids)
+        counters = counters.filter(user_id__in=user_ids)
+
+    actual = Counter()
+    for qs in (personal, receipts):
+        for row in qs.order_by().values('user_id').annotate(n=Count('id')):
+            actual[row['user_id']] += row['n']
+
+    wrong, seen = [], set()
+    for counter in counters.iterator(chunk_size=2000):
+        seen.add(counter.user_id)
+        if counter.unread != actual[counter.user_id]:
+            counter.unread = actual[counter.user_id]
+            wrong.append(counter)
+    missing = [UnreadCounter(user_id=user_id, unread=n) for user_id, n in actual.items() if user_id not in seen]
+
+    with transaction.atomic():
+        UnreadCounter.objects.bulk_update(wrong, ['unread'], batch_size=1000)
+        UnreadCounter.objects.bulk_create(missing, batch_size=1000, ignore_conflicts=True)
+        _invalidate([c.user_id for c in wrong + missing])
+    return len(wrong) + len(missing)
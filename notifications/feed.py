@@ -0,0 +1,91 @@
+"""
+Notification feed: personal notifications and broadcast receipts merged
+newest first, paged with a keyset cursor instead of OFFSET.
+
+Items are ordered by (created_at, kind, id) descending, where broadcasts
+sort after personal notifications created at the same instant. A cursor
+is the last item seen, written "<created_at ISO>,<id>" for a notification
+or "<created_at ISO>,b<id>" for a broadcast; the next page is everything
+strictly before it. Each page reads at most limit + 1 rows from each table
+through the (user, created_at, id) index, however far back it is.
+"""
+from django.db.models import F, Q
+from django.utils.dateparse import parse_datetime
+
+from .models import BroadcastReceipt, Notification
+from .utils import personalize
+
+FEED_PAGE_SIZE = 20
+FEED_MAX_PAGE_SIZE = 50
+
+PERSONAL, BROADCAST = 1, 0  # tie-break rank within one created_at
+
+
+def parse_cursor(value):
+    """(created_at, rank, id) from a cursor string; ValueError if malformed."""
+    stamp, _, ident = (value or '').replace(' ', '+').rpartition(',')
+    created_at = parse_datetime(stamp)
+    if created_at is None or not ident:
+        raise ValueError("Invalid cursor")
+    rank = BROADCAST if ident.startswith('b') else PERSONAL
+    return created_at, rank, int(ident.lstrip('b'))
+
+
+def make_cursor(item):
+    prefix = 'b' if isinstance(item, BroadcastReceipt) else ''
+    return f"{item.created_at.isoformat()},{prefix}{_item_id(item)}"
+
+
+def _item_id(item):
+    return item.broadcast_id if isinstance(item, BroadcastReceipt) else item.id
+
+
+def _sort_key(item):
+    rank = BROADCAST if isinstance(item, BroadcastReceipt) else PERSONAL
+    return item.created_at, rank, _item_id(item)
+
+
+def feed_page(user, before=None, limit=FEED_PAGE_SIZE):
+    """
+    One page of `user`'s feed. `before` is a parsed cursor (or None for the
+    newest items). Returns (items, next_cursor or None).
+    """
+    personal = Notification.objects.filter(user=user)
+    receipts = BroadcastReceipt.objects.filter(user=user).select_related('broadcast')
+
+    if before is not None:
+        created_at, rank, item_id = before
+        older = Q(created_at__lt=created_at)
+        older_broadcast = Q(broadcast__created_at__lt=created_at)
+        if rank == PERSONAL:
+            personal = personal.filter(older | Q(created_at=created_at, id__lt=item_id))
+            receipts = receipts.filter(older_broadcast | Q(broadcast__created_at=created_at))
+        else:
+            personal = personal.filter(older)
+            receipts = receipts.filter(older_broadcast | Q(broadcast__created_at=created_at, broadcast_id__lt=item_id))
+
+    personal = list(personal.order_by('-created_at', '-id')[:limit + 1])
+    receipts = list(receipts.order_by(F('broadcast__created_at').desc(), '-broadcast_id')[:limit + 1])
+
+    if receipts:
+        application = getattr(user, 'admission_application', None)
+        for receipt in receipts:
+            receipt.message = personalize(receipt.broadcast.message, application)
+
+    merged = sorted(personal + receipts, key=_sort_key, reverse=True)
+    items = merged[:limit]
+    next_cursor = make_cursor(items[-1]) if len(merged) > limit else None
+    return items, next_cursor
+
+
+def serialize(item):
+    is_broadcast = isinstance(item, BroadcastReceipt)
+    return {
+        'id': item.id,
+        'kind': 'broadcast' if is_broadcast else 'notification',
+        'title': item.title,
+        'message': item.message,
+        'link': item.link,
+        'is_read': item.is_read,
+        'created_at': item.created_at.isoformat(),
+    }
@@ -0,0 +1,167 @@
+"""
+Live events for the student dashboard (server-sent events).
+
+publish() sends a small JSON event to one user's channel once the current
+transaction commits; notifications.views.stream relays the channel to the
+browser as text/event-stream. Events:
+
+    notification  {"title", "message"}
+    status        {"status", "payment_status", "roll_number"}
+
+Channels go through Redis pub/sub when LIVE_EVENTS_REDIS_URL is set, so
+events published by Celery workers or other web processes reach every
+stream. Without it an in-process broker is used, which only connects
+publishers and streams living in the same process (runserver, or a single
+ASGI worker).
+
+Streaming needs the ASGI entry point (mcm_admission.asgi, e.g. under
+uvicorn or daphne). Under WSGI the stream endpoint answers with the current
+state only and the browser reconnects after `retry`, which still costs far
+less than reloading the dashboard.
+"""
+import asyncio
+import json
+import logging
+import threading
+from contextlib import asynccontextmanager
+
+from django.conf import settings
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+
+def _channel(user_id):
+    return f"live:user:{user_id}"
+
+
+def _redis_url():
+    return getattr(settings, 'LIVE_EVENTS_REDIS_URL', '')
+
+
+# --------------------------
+# In-process broker
+# --------------------------
+class LocalBroker:
+    """Fan-out to asyncio queues of the streams open in this process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = {}  # channel -> {(loop, queue)}
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for loop, queue in subscribers:
+            loop.call_soon_threadsafe(self._put, queue, message)
+
+    @staticmethod
+    def _put(queue, message):
+        try:
+            queue.put_nowait(message)
+        except asyncio.QueueFull:
+            pass  # A stalled stream; it resyncs with a snapshot when it reconnects
+
+    @asynccontextmanager
+    async def subscribe(self, channel):
+        entry = (asyncio.get_running_loop(), asyncio.Queue(maxsize=100))
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(entry)
+        try:
+            yield entry[1].get
+        finally:
+            with self._lock:
+                self._subscribers.get(channel, set()).discard(entry)
+                if not self._subscribers.get(channel):
+                    self._subscribers.pop(channel, None)
+
+
+local_broker = LocalBroker()
+
+
+# --------------------------
+# Redis
+# --------------------------
+_redis = None
+_redis_lock = threading.Lock()
+
+
+def _redis_client():
+    global _redis
+    with _redis_lock:
+        if _redis is None:
+            import redis
+
+            _redis = redis.Redis.from_url(_redis_url(), socket_timeout=2)
+        return _redis
+
+
+@asynccontextmanager
+async def _redis_subscribe(channel):
+    import redis.asyncio as aioredis
+
+    client = aioredis.Redis.from_url(_redis_url())
+    pubsub = client.pubsub(ignore_subscribe_messages=True)
+    await pubsub.subscribe(channel)
+
+    async def get():
+        while True:
+            message = await pubsub.get_message(timeout=None)
+            if message is not None:
+                data = message['data']
+                return data.decode() if isinstance(data, bytes) else data
+
+    try:
+        yield get
+    finally:
+        await pubsub.unsubscribe(channel)
+        for closeable in (pubsub, client):
+            close = getattr(closeable, 'aclose', None) or closeable.close
+            await close()
+
+
+# --------------------------
+# API
+# --------------------------
+def publish_events(events):
+    """Send (user_id, event, data) triples to the users' streams after the current transaction commits."""
+    messages = [(_channel(user_id), json.dumps({'event': event, 'data': data})) for user_id, event, data in events]
+    if messages:
+        transaction.on_commit(lambda: _send(messages))
+
+
+def publish(user_id, event, data):
+    publish_events([(user_id, event, data)])
+
+
+def _send(messages):
+    try:
+        if _redis_url():
+            pipe = _redis_client().pipeline(transaction=False)
+            for channel, message in messages:
+                pipe.publish(channel, message)
+            pipe.execute()
+        else:
+            for channel, message in messages:
+                local_broker.publish(channel, message)
+    except Exception:
+        # Live updates are best effort; the dashboard still shows everything on load
+        logger.warning("Could not publish live events", exc_info=True)
+
+
+def subscribe(user_id):
+    """Async context manager giving an awaitable that returns the next raw message."""
+    channel = _channel(user_id)
+    return _redis_subscribe(channel) if _redis_url() else local_broker.subscribe(channel)
+
+
+def status_event(application):
+    return (application.user_id, 'status', {
+        'status': application.status,
+        'payment_status': application.payment_status,
+        'roll_number': application.roll_number,
+    })
+
+
+def publish_status(application):
+    publish_events([status_event(application)])
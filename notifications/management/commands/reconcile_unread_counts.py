@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from notifications.counters import reconcile
+
+
+class Command(BaseCommand):
+    help = "Recount unread notifications and repair per-user unread counters that have drifted."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', dest='user_ids', help="Only this user id (repeatable).")
+
+    def handle(self, *args, **options):
+        fixed = reconcile(options['user_ids'])
+        self.stdout.write(self.style.SUCCESS(f"{fixed} unread counter(s) corrected."))
@@ -2,11 +2,38 @@ from django.db import models
 from django.conf import settings
 from django.utils import timezone
 
+
+class UnreadCountingQuerySet(models.QuerySet):
+    """
+    create()/bulk_create() also bump the recipients' unread counters and
+    push a live "notification" event to their dashboards.
+    """
+
+    def create(self, **kwargs):
+        obj = super().create(**kwargs)
+        self._created([obj])
+        return obj
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        self._created(objs)
+        return objs
+
+    def _created(self, objs):
+        from .counters import add_unread
+        from .live import publish_events
+
+        unread = [obj for obj in objs if not obj.is_read]
+        add_unread([obj.user_id for obj in unread])
+        publish_events(self.model.live_events(unread))
+
+
 class Notification(models.Model):
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
-        related_name='notifications'
+        related_name='notifications',
+        db_index=False,  # led by notif_user_created_idx
     )
     title = models.CharField(max_length=255)
     message = models.TextField()
@@ -14,8 +41,102 @@ class Notification(models.Model):
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(default=timezone.now)
 
+    objects = UnreadCountingQuerySet.as_manager()
+
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Feed / dashboard: a user's newest first, keyset on (created_at, id)
+            models.Index(fields=['user', '-created_at', '-id'], name='notif_user_created_idx'),
+            # Unread counts and mark-all-as-read
+            models.Index(fields=['user', 'is_read'], name='notif_user_unread_idx'),
+        ]
 
     def __str__(self):
         return f"{self.title} → {self.user.username}"
+
+    @classmethod
+    def live_events(cls, notifications):
+        return [(n.user_id, 'notification', {'title': n.title, 'message': n.message}) for n in notifications]
+
+
+class BroadcastNotification(models.Model):
+    """
+    An announcement sent to many users, stored once. Who received it (and
+    whether they have read it) lives in BroadcastReceipt. The message may
+    hold {placeholders} that are filled from each reader's application when
+    it is shown.
+    """
+    title = models.CharField(max_length=255)
+    message = models.TextField()
+    link = models.URLField(blank=True, null=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='broadcast_created_idx'),
+        ]
+
+    def __str__(self):
+        return self.title
+
+
+class BroadcastReceipt(models.Model):
+    """One recipient of a broadcast: just the two keys and a read flag."""
+    broadcast = models.ForeignKey(BroadcastNotification, on_delete=models.CASCADE, related_name='receipts')
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='broadcast_receipts'
+    )
+    is_read = models.BooleanField(default=False)
+
+    objects = UnreadCountingQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'broadcast'], name='broadcast_receipt_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.broadcast.title} → {self.user.username}"
+
+    @classmethod
+    def live_events(cls, receipts):
+        # Broadcast messages are personalized on display; the title is enough here
+        titles = dict(
+            BroadcastNotification.objects.filter(id__in={r.broadcast_id for r in receipts}).values_list('id', 'title')
+        ) if receipts else {}
+        return [(r.user_id, 'notification', {'title': titles.get(r.broadcast_id, ''), 'message': ''}) for r in receipts]
+
+    # Read like a Notification in templates
+    @property
+    def title(self):
+        return self.broadcast.title
+
+    @property
+    def link(self):
+        return self.broadcast.link
+
+    @property
+    def created_at(self):
+        return self.broadcast.created_at
+
+
+class UnreadCounter(models.Model):
+    """
+    Unread notifications + broadcasts per user, kept in step by
+    notifications.counters so the header badge never has to count rows.
+    `manage.py reconcile_unread_counts` repairs any drift.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='unread_counter'
+    )
+    unread = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.unread} unread"
@@ -1,3 +1,117 @@
-from django.test import TestCase
+from datetime import timedelta
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .counters import get_unread_count, mark_read, reconcile
+from .feed import feed_page, make_cursor, parse_cursor
+from .models import BroadcastNotification, BroadcastReceipt, Notification, UnreadCounter
+
+LOCAL_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+def make_user(username):
+    return get_user_model().objects.create_user(username=username, email=f"{username}@example.com", password='x')
+
+
+# ==========================================
+# Unread counters (notifications/counters.py)
+# ==========================================
+@override_settings(CACHES=LOCAL_CACHE)
+class UnreadCounterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = make_user('reader')
+
+    def notify(self, count=1):
+        with self.captureOnCommitCallbacks(execute=True):
+            Notification.objects.bulk_create(
+                [Notification(user=self.user, title=f"Notice {n}", message='') for n in range(count)]
+            )
+
+    def test_counter_is_created_from_the_tables_on_first_read(self):
+        self.notify(2)
+        self.assertFalse(UnreadCounter.objects.filter(user=self.user).exists())
+        self.assertEqual(get_unread_count(self.user.id), 2)
+        self.assertEqual(UnreadCounter.objects.get(user=self.user).unread, 2)
+
+    def test_cached_count_is_dropped_when_the_count_moves(self):
+        self.assertEqual(get_unread_count(self.user.id), 0)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_unread_count(self.user.id), 0)
+
+        self.notify(3)
+        self.assertEqual(get_unread_count(self.user.id), 3)
+        with self.captureOnCommitCallbacks(execute=True):
+            mark_read(self.user.id, 5)
+        self.assertEqual(get_unread_count(self.user.id), 0)
+
+    def test_reconcile_repairs_drift_and_refreshes_the_cache(self):
+        self.notify(2)
+        get_unread_count(self.user.id)
+        UnreadCounter.objects.filter(user=self.user).update(unread=7)
+        other = make_user('other')
+        Notification.objects.filter(user=self.user).update(user=other)
+        Notification.objects.create(user=self.user, title="Kept", message='')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(reconcile(), 2)
+        self.assertEqual(get_unread_count(self.user.id), 1)
+        self.assertEqual(UnreadCounter.objects.get(user=other).unread, 2)
+        self.assertEqual(reconcile(), 0)
+
+
+# ==========================================
+# Feed (notifications/feed.py)
+# ==========================================
+class FeedTests(TestCase):
+    def setUp(self):
+        self.user = make_user('feed')
+        now = timezone.now()
+        # Several items share a timestamp, so the cursor has to break ties
+        stamps = [now - timedelta(minutes=n // 3) for n in range(9)]
+        for n, stamp in enumerate(stamps):
+            Notification.objects.create(user=self.user, title=f"Personal {n}", message='', created_at=stamp)
+            if n % 2 == 0:
+                broadcast = BroadcastNotification.objects.create(title=f"Broadcast {n}", message='', created_at=stamp)
+                BroadcastReceipt.objects.create(broadcast=broadcast, user=self.user)
+        Notification.objects.create(user=make_user('someone'), title="Not mine", message='')
+
+    def walk(self, limit):
+        titles, before = [], None
+        while True:
+            items, next_cursor = feed_page(self.user, before, limit)
+            titles += [item.title for item in items]
+            if next_cursor is None:
+                return titles
+            before = parse_cursor(next_cursor)
+
+    def test_pages_cover_the_feed_once_newest_first(self):
+        everything = self.walk(limit=100)
+        self.assertEqual(len(everything), 14)
+        self.assertNotIn("Not mine", everything)
+        for limit in (1, 3, 4):
+            with self.subTest(limit=limit):
+                self.assertEqual(self.walk(limit), everything)
+
+    def test_cursor_survives_an_unencoded_query_string(self):
+        receipt = BroadcastReceipt.objects.filter(user=self.user).first()
+        cursor = make_cursor(receipt)
+        # A "+" in the UTC offset arrives as a space when the cursor is not URL-encoded
+        self.assertEqual(parse_cursor(cursor.replace('+', ' ')), parse_cursor(cursor))
+        created_at, _, item_id = parse_cursor(cursor)
+        self.assertEqual((created_at, item_id), (receipt.created_at, receipt.broadcast_id))
+        with self.assertRaises(ValueError):
+            parse_cursor('yesterday,12')
+
+    def test_feed_view_pages_with_the_next_cursor(self):
+        self.client.force_login(self.user)
+        first = self.client.get(reverse('notifications:feed'), {'limit': 5}).json()
+        self.assertEqual(len(first['results']), 5)
+        second = self.client.get(reverse('notifications:feed'), {'limit': 5, 'before': first['next']}).json()
+        titles = [item['title'] for item in first['results'] + second['results']]
+        self.assertEqual(titles, self.walk(limit=100)[:10])
+        self.assertEqual(self.client.get(reverse('notifications:feed'), {'before': 'nonsense'}).status_code, 400)
@@ -4,6 +4,9 @@ from . import views
 app_name = 'notifications'
 
 urlpatterns = [
+    path('feed/', views.feed, name='feed'),
+    path('stream/', views.stream, name='stream'),
     path('mark-read/<int:notif_id>/', views.mark_as_read, name='mark_as_read'),
     path('mark-all-read/', views.mark_all_as_read, name='mark_all_as_read'),
+    path('broadcasts/mark-read/<int:receipt_id>/', views.mark_broadcast_as_read, name='mark_broadcast_as_read'),
 ]
@@ -1,3 +1,8 @@
+import string
+
+from django.core.cache import cache
+
+from .counters import UNREAD_CACHE_TIMEOUT, get_unread_count, recent_cache_key
 from .models import Notification
 
 def send_notification(user, title, message, link=None):
@@ -8,3 +13,64 @@ def send_notification(user, title, message, link=None):
         message=message,
         link=link
     )
+
+
+def personalize(message, application):
+    """
+    Fill a broadcast's {placeholders} from the reader's application (choice
+    fields use their display text, a missing roll number reads "N/A").
+    Placeholders that cannot be filled are left as they are.
+    """
+    fields = {field for _, field, _, _ in string.Formatter().parse(message) if field}
+    if not fields:
+        return message
+    values = {}
+    for field in fields:
+        if application is None or not field.isidentifier() or field.startswith('_'):
+            continue
+        display = getattr(application, f'get_{field}_display', None)
+        value = display() if display else getattr(application, field, None)
+        if field == 'roll_number':
+            value = value or "N/A"
+        if value is not None or hasattr(application, field):
+            values[field] = value
+    try:
+        return message.format_map(_KeepMissing(values))
+    except (ValueError, IndexError, AttributeError):
+        return message
+
+
+class _KeepMissing(dict):
+    def __missing__(self, key):
+        return '{' + key + '}'
+
+
+def recent_notifications(user, limit=10):
+    """Latest personal notifications and broadcasts for `user`, newest first."""
+    from .feed import feed_page
+
+    return feed_page(user, limit=limit)[0]
+
+
+def cached_recent_notifications(user):
+    """
+    recent_notifications() as plain dicts, cached per user until a
+    notification for them is created or read (see notifications.counters).
+    """
+    key = recent_cache_key(user.id)
+    items = cache.get(key)
+    if items is None:
+        from .feed import serialize
+
+        items = []
+        for item in recent_notifications(user):
+            entry = serialize(item)
+            entry['created_at'] = item.created_at
+            items.append(entry)
+        cache.set(key, items, UNREAD_CACHE_TIMEOUT)
+    return items
+
+
+def unread_count(user):
+    """Unread notifications and broadcasts (the cached counter, see notifications.counters)."""
+    return get_unread_count(user.id)
@@ -1,14 +1,25 @@
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
 from django.shortcuts import get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required
-from django.http import JsonResponse
-from .models import Notification
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from admissions.models import Application
+from . import live
+from .counters import get_unread_count, mark_read
+from .feed import FEED_MAX_PAGE_SIZE, FEED_PAGE_SIZE, feed_page, parse_cursor, serialize
+from .models import BroadcastReceipt, Notification
 
 @login_required
 def mark_as_read(request, notif_id):
     """Mark a specific notification as read."""
     notif = get_object_or_404(Notification, id=notif_id, user=request.user)
-    notif.is_read = True
-    notif.save()
+    with transaction.atomic():
+        if Notification.objects.filter(id=notif.id, is_read=False).update(is_read=True):
+            mark_read(request.user.id)
     if request.headers.get('x-requested-with') == 'XMLHttpRequest':
         return JsonResponse({'success': True})
     return redirect(notif.link or '/')
@@ -16,5 +27,99 @@ def mark_as_read(request, notif_id):
 @login_required
 def mark_all_as_read(request):
     """Mark all notifications for the logged-in user as read."""
-    Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
-    return JsonResponse({'success': True})
\ No newline at end of file
+    with transaction.atomic():
+        marked = Notification.objects.filter(user=request.user, is_read=False).update(is_read=True)
+        marked += BroadcastReceipt.objects.filter(user=request.user, is_read=False).update(is_read=True)
+        mark_read(request.user.id, marked)
+    return JsonResponse({'success': True})
+
+@login_required
+def mark_broadcast_as_read(request, receipt_id):
+    """Mark a broadcast as read for the logged-in user."""
+    receipt = get_object_or_404(BroadcastReceipt.objects.select_related('broadcast'), id=receipt_id, user=request.user)
+    with transaction.atomic():
+        if BroadcastReceipt.objects.filter(id=receipt.id, is_read=False).update(is_read=True):
+            mark_read(request.user.id)
+    if request.headers.get('x-requested-with') == 'XMLHttpRequest':
+        return JsonResponse({'success': True})
+    return redirect(receipt.link or '/')
+
+
+@login_required
+def feed(request):
+    """
+    JSON page of the user's notifications, newest first.
+    ?before=<cursor from the previous page's "next"> &limit=<1-50>
+    """
+    try:
+        before = parse_cursor(request.GET['before']) if request.GET.get('before') else None
+        limit = min(max(int(request.GET.get('limit', FEED_PAGE_SIZE)), 1), FEED_MAX_PAGE_SIZE)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid cursor or limit'}, status=400)
+
+    items, next_cursor = feed_page(request.user, before, limit)
+    return JsonResponse({
+        'results': [serialize(item) for item in items],
+        'next': next_cursor,
+        'unread_count': get_unread_count(request.user.id),
+    })
+
+
+# --------------------------
+# LIVE EVENTS (SSE)
+# --------------------------
+STREAM_RETRY_MS = 5000
+STREAM_WSGI_RETRY_MS = 20000
+STREAM_HEARTBEAT = 15
+# Streams end after this long and the browser reconnects, so a dropped
+# client never holds a connection for more than a few minutes
+STREAM_MAX_SECONDS = 5 * 60
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _snapshot(user):
+    application = Application.objects.filter(user=user).values('status', 'payment_status', 'roll_number').first()
+    return {'unread_count': get_unread_count(user.id), 'application': application}
+
+
+async def stream(request):
+    """
+    text/event-stream of the logged-in user's live events (see
+    notifications.live): a "snapshot" of the current state first, then
+    "notification" and "status" events as they happen.
+    """
+    user = await sync_to_async(lambda: request.user if request.user.is_authenticated else None)()
+    if user is None:
+        return HttpResponse(status=401)
+
+    if not isinstance(request, ASGIRequest):
+        # A sync worker cannot hold the stream open: send the state, reconnect later
+        snapshot = await sync_to_async(_snapshot)(user)
+        response = HttpResponse(f"retry: {STREAM_WSGI_RETRY_MS}\n\n" + _sse('snapshot', snapshot),
+                                content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        return response
+
+    async def events():
+        yield f"retry: {STREAM_RETRY_MS}\n\n"
+        async with live.subscribe(user.id) as next_message:
+            # Subscribed before reading the state, so nothing falls in between
+            yield _sse('snapshot', await sync_to_async(_snapshot)(user))
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + STREAM_MAX_SECONDS
+            while (remaining := deadline - loop.time()) > 0:
+                try:
+                    message = await asyncio.wait_for(next_message(), timeout=min(STREAM_HEARTBEAT, remaining))
+                except asyncio.TimeoutError:
+                    yield ": ping\n\n"
+                    continue
+                message = json.loads(message)
+                yield _sse(message['event'], message['data'])
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # let nginx pass events straight through
+    return response
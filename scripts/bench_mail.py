@@ -0,0 +1,82 @@
+"""
+Mail dispatcher benchmark.
+
+Starts the local SMTP sink and sends the same messages two ways:
+  * before: one connection per message (send_mail per applicant)
+  * after:  the pooled, batched dispatcher (admissions.mailer)
+and prints messages per second and connections used. --latency (ms per
+SMTP reply) approximates a remote server, where connection setup dominates.
+
+Usage:
+    python scripts/bench_mail.py [count] [--pool 2] [--batch 50] [--latency 0]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import django
+
+# 1. Setup Django Environment
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mcm_admission.settings')
+django.setup()
+
+# 2. Import app code (Must be after setup)
+from django.core.mail import EmailMessage, get_connection
+from admissions.mailer import MailDispatcher
+from smtp_sink import SMTPSink
+
+
+def make_messages(count):
+    return [
+        EmailMessage(
+            subject="🎓 Roll Number Slip - Military College Murree",
+            body=f"Dear Student {i},\n\nYour application has been verified successfully.\n" * 5,
+            from_email="Military College Murree <noreply@example.com>",
+            to=[f"student{i}@example.com"],
+        )
+        for i in range(count)
+    ]
+
+
+def report(label, sink, before, count, elapsed):
+    print(f"{label:<34} {count / elapsed:9.1f} msg/s   "
+          f"{sink.messages - before[0]:>6} delivered over {sink.connections - before[1]} connections")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    pool = int(args[args.index('--pool') + 1]) if '--pool' in args else 2
+    batch = int(args[args.index('--batch') + 1]) if '--batch' in args else 50
+    latency = float(args[args.index('--latency') + 1]) if '--latency' in args else 0
+    args = [a for i, a in enumerate(args) if not a.startswith('--') and (i == 0 or not args[i - 1].startswith('--'))]
+    count = int(args[0]) if args else 10000
+
+    sink = SMTPSink(('127.0.0.1', 0), latency_ms=latency).start()
+    smtp = dict(
+        backend='django.core.mail.backends.smtp.EmailBackend',
+        host='127.0.0.1', port=sink.port, username='', password='',
+        use_ssl=False, use_tls=False, timeout=10,
+    )
+    messages = make_messages(count)
+    print(f"Sending {count} messages to the local SMTP sink on port {sink.port}")
+
+    before = (sink.messages, sink.connections)
+    start = time.perf_counter()
+    for message in messages:
+        message.connection = get_connection(**smtp)
+        message.send()
+    report("before (connection per message)", sink, before, count, time.perf_counter() - start)
+
+    for message in messages:
+        message.connection = None
+    dispatcher = MailDispatcher(pool_size=pool, batch_size=batch, per_minute=0, per_day=0, **smtp)
+    before = (sink.messages, sink.connections)
+    start = time.perf_counter()
+    sent = dispatcher.send_messages(messages)
+    report(f"after (pool {pool}, batch {batch})", sink, before, sent, time.perf_counter() - start)
+    dispatcher.close()
+
+    print(dispatcher.stats())
@@ -0,0 +1,71 @@
+"""
+Roll slip rendering benchmark.
+
+Renders slips for unsaved Application instances (no database rows needed)
+and prints slips per second with a cold static layer (logo decoded and
+encoded on every slip, as before the cache existed) and with the cached one.
+
+Usage:
+    python scripts/bench_roll_slips.py [count] [--photo path/to/photo.jpg]
+"""
+import os
+import sys
+import time
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import django
+
+# 1. Setup Django Environment
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mcm_admission.settings')
+django.setup()
+
+# 2. Import app code (Must be after setup)
+from admissions.models import Application
+from admissions import utils
+
+
+def make_applications(count, photo=None):
+    apps = []
+    for i in range(count):
+        app = Application(
+            name=f"Student {i}",
+            father_name=f"Father {i}",
+            category=Application.CATEGORY_CHOICES[i % len(Application.CATEGORY_CHOICES)][0],
+            test_center=Application.TEST_CENTERS[i % len(Application.TEST_CENTERS)][0],
+            class_name='XI' if i % 2 else 'VIII',
+            roll_number=f"{'11' if i % 2 else '8'}-{i + 1:04d}",
+            dob=date(2012, 1, 1),
+        )
+        if photo:
+            app.photo.name = photo
+        apps.append(app)
+    return apps
+
+
+def bench(label, apps, cold):
+    size = 0
+    start = time.perf_counter()
+    for app in apps:
+        if cold:
+            utils.reset_roll_slip_cache()
+        size += len(utils.generate_roll_number_pdf(app))
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {len(apps) / elapsed:8.1f} slips/s   avg {size / len(apps) / 1024:6.1f} KB")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    photo = None
+    if '--photo' in args:
+        photo = args[args.index('--photo') + 1]
+        args = [a for a in args if a not in ('--photo', photo)]
+    count = int(args[0]) if args else 200
+
+    apps = make_applications(count, photo)
+    utils.generate_roll_number_pdf(apps[0])  # warm up imports/fonts
+
+    print(f"Rendering {count} roll slips")
+    bench("before (cold static layer)", apps, cold=True)
+    bench("after (cached static layer)", apps, cold=False)
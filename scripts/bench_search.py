@@ -0,0 +1,128 @@
+"""
+Applicant search benchmark.
+
+Inserts synthetic applications into the configured database (inside a
+transaction that is rolled back at the end), then times the admin search
+both ways and counts what each finds:
+  * before: OR'ed icontains over name, father_name, roll_number, form_b, father_cnic
+  * after:  admissions.search (exact _digits lookups for whole identifiers,
+            pg_trgm on PostgreSQL, FTS5 on SQLite otherwise)
+Each timing is the median of --repeat runs of a count plus the first page
+of 50, which is what the admin applicants table asks for.
+
+Usage:
+    python scripts/bench_search.py [count] [--repeat 5]
+"""
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import django
+
+# 1. Setup Django Environment
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mcm_admission.settings')
+django.setup()
+
+# 2. Import app code (Must be after setup)
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import Q
+from admissions.models import Application
+from admissions.search import refresh_search_columns, search_applications
+
+FIRST = ["Muhammad", "Ali", "Ahmed", "Hassan", "Usman", "Bilal", "Hamza", "Zain", "Saad", "Umar",
+         "Abdullah", "Ibrahim", "Haris", "Fahad", "Talha", "Danish", "Shahzaib", "Rehan", "Arsalan", "Waleed"]
+LAST = ["Khan", "Malik", "Butt", "Qureshi", "Chaudhry", "Abbasi", "Raja", "Awan", "Mughal", "Sheikh",
+        "Siddiqui", "Janjua", "Kayani", "Satti", "Niazi", "Bhatti", "Gondal", "Tarar", "Cheema", "Minhas"]
+
+
+def cnic(rng):
+    return f"{rng.randint(10000, 99999)}-{rng.randint(1000000, 9999999)}-{rng.randint(1, 9)}"
+
+
+def populate(count, batch=5000):
+    rng = random.Random(42)
+    User = get_user_model()
+    for start in range(0, count, batch):
+        size = min(batch, count - start)
+        users = User.objects.bulk_create([
+            User(username=f"bench_search_{start + i}", email=f"bench_search_{start + i}@example.com", password='!')
+            for i in range(size)
+        ])
+        apps = []
+        for i, user in enumerate(users):
+            n = start + i
+            app = Application(
+                user=user,
+                name=f"{rng.choice(FIRST)} {rng.choice(FIRST)} {rng.choice(LAST)}",
+                father_name=f"{rng.choice(FIRST)} {rng.choice(LAST)}",
+                father_cnic=cnic(rng),
+                form_b=cnic(rng),
+                roll_number=f"{'11' if n % 2 else '8'}-{900000 + n}",
+                mobile_no=f"03{rng.randint(0, 999999999):09d}",
+                class_name='XI' if n % 2 else 'VIII',
+            )
+            refresh_search_columns(app)
+            apps.append(app)
+        Application.objects.bulk_create(apps)
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE admissions_application")
+    return Application.objects.filter(user__username__startswith='bench_search_').order_by('id')
+
+
+def legacy(q):
+    return Application.objects.filter(
+        Q(name__icontains=q) | Q(father_name__icontains=q) | Q(roll_number__icontains=q)
+        | Q(form_b__icontains=q) | Q(father_cnic__icontains=q)
+    ).order_by('-submission_date')
+
+
+def timed(build, repeat):
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        qs = build()
+        total = qs.count()
+        list(qs[:50])
+        runs.append((time.perf_counter() - start) * 1000)
+    return statistics.median(runs), total
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    repeat = int(args[args.index('--repeat') + 1]) if '--repeat' in args else 5
+    args = [a for i, a in enumerate(args) if not a.startswith('--') and (i == 0 or not args[i - 1].startswith('--'))]
+    count = int(args[0]) if args else 100000
+
+    with transaction.atomic():
+        start = time.perf_counter()
+        rows = populate(count)
+        sample = rows[count // 3]
+        print(f"Inserted {count} applications in {time.perf_counter() - start:.1f}s ({connection.vendor})")
+
+        queries = [
+            ("common first name", "hamza"),
+            ("full name", sample.name),
+            ("father's name", sample.father_name.split()[-1]),
+            ("CNIC fragment", sample.father_cnic[:9]),
+            ("CNIC", sample.father_cnic),
+            ("CNIC, no dashes", sample.father_cnic.replace('-', '')),
+            ("Form-B", sample.form_b),
+            ("mobile", sample.mobile_no),
+            ("roll number", sample.roll_number),
+            ("no match", "qqqzzz"),
+        ]
+        # Multi-word queries match words in any field, so they can find more than the
+        # old whole-phrase match; CNICs without dashes and mobile numbers were not found before
+        print(f"{'query':<20} {'before':>16} {'after':>16}")
+        for label, q in queries:
+            before, before_total = timed(lambda: legacy(q), repeat)
+            after, after_total = timed(lambda: search_applications(Application.objects.all(), q), repeat)
+            print(f"{label:<20} {before_total:>6} {before:>7.1f} ms {after_total:>6} {after:>7.1f} ms")
+
+        transaction.set_rollback(True)
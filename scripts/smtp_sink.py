@@ -0,0 +1,104 @@
+"""
+Local SMTP stand-in for development and benchmarks.
+
+Accepts every message over plain SMTP (no TLS, no auth), counts it and
+throws it away, like `aiosmtpd`'s Sink handler. Point Django at it with
+
+    EMAIL_HOST=localhost EMAIL_PORT=1025 EMAIL_USE_SSL=False EMAIL_HOST_USER=''
+
+--latency adds a delay (ms) before every reply to mimic a remote server.
+
+Usage:
+    python scripts/smtp_sink.py [--port 1025] [--latency 0] [--print]
+"""
+import socketserver
+import sys
+import threading
+import time
+
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    # Replies are small writes; without this every command waits on delayed ACKs
+    disable_nagle_algorithm = True
+
+    def reply(self, *lines):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        self.wfile.write(b''.join(line.encode('ascii') + b'\r\n' for line in lines))
+
+    def handle(self):
+        self.reply('220 localhost SMTP sink ready')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('ascii', 'replace').strip().upper()
+            verb = command.split(' ', 1)[0]
+
+            if verb in ('EHLO', 'HELO'):
+                self.reply('250-localhost', '250-8BITMIME', '250 SMTPUTF8')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                size = 0
+                while True:
+                    data = self.rfile.readline()
+                    if not data or data == b'.\r\n':
+                        break
+                    size += len(data)
+                self.server.record(size)
+                self.reply('250 OK: queued')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            elif verb in ('MAIL', 'RCPT', 'RSET', 'NOOP'):
+                self.reply('250 OK')
+            else:
+                self.reply('502 Command not implemented')
+
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address=('127.0.0.1', 1025), verbose=False, latency_ms=0):
+        super().__init__(address, SMTPSinkHandler)
+        self.verbose = verbose
+        self.latency = latency_ms / 1000
+        self.messages = 0
+        self.bytes = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+
+    def process_request(self, request, client_address):
+        with self._lock:
+            self.connections += 1
+        super().process_request(request, client_address)
+
+    def record(self, size):
+        with self._lock:
+            self.messages += 1
+            self.bytes += size
+        if self.verbose:
+            print(f"message {self.messages} ({size} bytes)")
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        """Serve from a background thread (for use inside other scripts)."""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    port = int(args[args.index('--port') + 1]) if '--port' in args else 1025
+    latency = float(args[args.index('--latency') + 1]) if '--latency' in args else 0
+    sink = SMTPSink(('127.0.0.1', port), verbose='--print' in args, latency_ms=latency)
+    print(f"SMTP sink listening on 127.0.0.1:{sink.port} (Ctrl+C to stop)")
+    try:
+        sink.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n{sink.messages} messages over {sink.connections} connections")